@@ -1,38 +1,129 @@
-from owlready2 import *
-from nltk import *
-from nltk.corpus import wordnet
-from nltk.tokenize import word_tokenize, sent_tokenize
-from decimal import Decimal
+#Heavy dependencies (owlready2, nltk) are imported lazily on the code paths that need them,
+#so importing the identification core stays cheap - see Benchmarks.py importtime
+import os
+import re
 import string
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from DichotomousKey import compileKey, keyPath, loadKey, saveKey
+from IntervalIndex import buildIntervals
+from LruCache import MISSING, LruCache
+from Measurements import ATTRIBUTE_UNITS, attributeValues, extractMeasurements, parse_int
+from Metrics import Metrics
+from QuestionScheduler import bestQuestion, expectedRemaining
+from SentenceSplitter import splitSentences
+from SynonymMatcher import SynonymMatcher
+from TraitIndex import loadIndex
+from TraitMatrix import TraitMatrix, rankBitsets
+from Tracing import Tracer
 
 #Ontology-enabled Plant Identification System
 #Developed by Maxwell Alexander for Master's Capstone - University of Wisconsin - Milwaukee
 
-#Holders for the possibilities to be returned by the system
-currentPossibilities = []
-possibilitiesIn = []
-possibilitiesOut = []
-
-#booleans used to track whether a certain attribute has been considered 
-usedColor = False
-usedCluster = False
-usedPosition = False
-usedFlowerShape = False
-usedFlowerSymmetry = False
-usedLeafArrangement = False
-usedLeafDivision = False
-usedLeafMargin = False
-usedLeafLength = False
-usedLeafShape = False
-usedPetalLength = False
-usedPetalNumber = False
-'''usedPlantEnvironment = False'''
-usedPlantSize = False
-
-#Load the ontology from the .owl file and establish a reasoner to support queries
-onto_path.append(".")
-onto = get_ontology("file://Rubiaceae_of_WI.owl").load
+#Identification session carried from one turn to the next
+#Sessions are small and independent, so one loaded ontology index can serve any number of them
+#identify() never modifies a Session, it returns the updated one in its Result, so every Session is an
+#immutable snapshot and the chain of previous sessions is the undo stack, see undo() and retract()
+#The chain is cut at UNDO_DEPTH sessions, so a long-lived session does not grow with every turn
+class Session:
+    __slots__ = ("candidates", "guesses", "used", "constraints", "previous", "turns")
+
+    def __init__(self, candidates=None, guesses=0, used=0, constraints=(), previous=None):
+        #species bitset of the trait index still consistent with everything described so far, None for a new
+        #session; 0 when the description ruled out every species
+        self.candidates = candidates
+        #species bitset left after the last attribute that narrowed the candidates
+        self.guesses = guesses
+        #bitmask of the attributes already considered, see attributeBits
+        self.used = used
+        #(attribute name, species bitset it matched) for every attribute applied so far, in order; a described
+        #trait read once every species was ruled out has the frozenset of what it is matched by instead (its
+        #values, or its measurements for a measured attribute, see extractAttribute()), looked up only if
+        #retract() needs it
+        self.constraints = constraints
+        #Session before the last turn, None for a new session
+        self.previous = limitHistory(previous)
+        #number of turns that led to this session, undo() and retract() included
+        self.turns = previous.turns + 1 if previous is not None else 0
+
+    #Copy of this session with another previous session
+    def withPrevious(self, previous):
+        copy = Session.__new__(Session)
+        copy.candidates = self.candidates
+        copy.guesses = self.guesses
+        copy.used = self.used
+        copy.constraints = self.constraints
+        copy.previous = previous
+        copy.turns = self.turns
+        return copy
+
+#Sessions kept for undo() behind the current one
+UNDO_DEPTH = 10
+
+#A session as the previous session of a new one: when its chain is longer than UNDO_DEPTH sessions, the
+#newest UNDO_DEPTH are copied without the older ones, which may still be shared with other chains
+def limitHistory(session):
+    chain = []
+    node = session
+    while node is not None and len(chain) < UNDO_DEPTH:
+        chain.append(node)
+        node = node.previous
+    if node is None:
+        return session
+    previous = None
+    for node in reversed(chain):
+        previous = node.withPrevious(previous)
+    return previous
+
+#Everything produced by one identification turn
+#candidates - species names still possible
+#guesses - best guess at the species, the candidates left after the last narrowing step
+#traits - attribute name -> values extracted from the description
+#steps - (attribute name, species with the described trait, candidates after narrowing) in order applied
+#nextQuestion - what to ask the user next, None once resolved or when there is nothing left to ask
+#nextAttribute - name of the attribute nextQuestion asks about
+#resolved - True when at most one species is left
+#ranked - when no species is left, the closest partial matches to this turn's traits as (species, score)
+#session - Session to pass to the next call of identify()
+Result = namedtuple("Result", ["candidates", "guesses", "traits", "steps", "nextQuestion", "nextAttribute",
+                               "resolved", "ranked", "session"])
+
+#Load the compiled ontology index, from its snapshot when the .owl file is unchanged
+#The ontology never changes during a session, so every trait class is compiled to a species bitset once
 #sync_reasoner(infer_property_values = True)
+ONTOLOGY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Rubiaceae_of_WI.owl")
+index = None
+
+#Load the compiled index on first use rather than at import time
+def getIndex():
+    global index
+    if index is None:
+        index = loadIndex(ONTOLOGY_FILE)
+    return index
+
+#Switch to another ontology file, e.g. to compile its key: the index and everything derived from it
+#(intervals, trait matrix, answers, dichotomous key, memoised matches) are dropped and rebuilt on first use
+#The description and sentence caches are keyed by the ontology hash and are left as they are
+def setOntology(owlPath):
+    global ONTOLOGY_FILE, index, intervals, matrix, answers, dichotomousKey, describedMatches
+    ONTOLOGY_FILE = owlPath
+    index = None
+    intervals = None
+    matrix = None
+    answers = None
+    dichotomousKey = None
+    describedMatches = {}
+
+#Interval index of the numeric traits (leaf length, petal length, plant size), derived from the trait index
+intervals = None
+
+def getIntervals():
+    global intervals
+    if intervals is None:
+        intervals = buildIntervals(getIndex())
+    return intervals
 
 
 #not currently implemented - wordnet was not specific enough for botany terminology. Currently using a custom list of synonyms
@@ -40,23 +131,84 @@ onto = get_ontology("file://Rubiaceae_of_WI.owl").load
 syns = wordnet.synsets("WORDTOFIND")
 '''
 
-#dictionary to translate words to ints
-numbers = ['one',
-               'two',
-               'three',
-               'four',
-               'five',
-               'six',
-               'seven',
-               'eight',
-               'nine',
-               'ten',
-               'eleven',
-               'twelve',
-               'teen',
-               'twenty',
-               'thirty',
-               'forty']
+#Ontology trait classes for each value returned by the check* extractors
+colorClasses = {"blue" : "BlueFlower_Color",
+                "green" : "GreenFlower_Color",
+                "orange" : "OrangeFlower_Color",
+                "pink" : "PinkFlower_Color",
+                "purple" : "PurpleFlower_Color",
+                "red" : "RedFlower_Color",
+                "transparent" : "TransparentFlower_Color",
+                "white" : "WhiteFlower_Color",
+                "yellow" : "YellowFlower_Color"}
+
+clusterClasses = {"ball" : "BallFlower_Cluster",
+                  "few" : "FewFlower_Cluster",
+                  "loose" : "LooseFlower_Cluster",
+                  "spike" : "SpikeFlower_Cluster"}
+
+positionClasses = {"apical" : "Apical_at_TipFlower_Position",
+                   "axillary" : "Axillary_at_BaseFlower_Position"}
+
+flowerShapeClasses = {"bell" : "BellFlower_Shape",
+                      "rayed" : "RayedFlower_Shape"}
+
+symmetryClasses = {"radial" : "RadialFlower_Symmetry"}
+
+leafArrangementClasses = {"basal" : "BasalLeaf_Arrangement",
+                          "opposite" : "OppositeLeaf_Arrangement",
+                          "whorled" : "WhorledLeaf_Arrangement"}
+
+leafDivisionClasses = {"simple" : "Simple"}
+
+leafMarginClasses = {"hairy" : "Hairy"}
+
+leafShapeClasses = {"heart" : "Heart_RoundLeaf_Shape",
+                    "linear" : "LiinearLeaf_Shape",
+                    "widerMiddle" : "Wider_Near_MiddleLeaf_Shape",
+                    "widerTip" : "Wider_Near_TipLeaf_Shape"}
+
+petalNumberClasses = {3 : "ThreePetal_Number",
+                      4 : "FourPetal_Number",
+                      5 : "FivePetal_Number"}
+
+#Look up the species bitset for every extracted value that maps to an ontology class
+#classes is a dict of value -> class name
+#Returns None when nothing was found so that callers can tell "no match" from "matched, but no species"
+def queryClasses(values, classes):
+    if not values:
+        return None
+    found = [classes[x] for x in values if x in classes]
+    if not found:
+        return None
+    if tracer is not None:
+        tracer.count("queries")
+    return getIndex().anyOf(found)
+
+#Species x trait matrix for ranking partial matches, None when numpy is not installed
+matrix = None
+
+def getMatrix():
+    global matrix
+    if matrix is None:
+        try:
+            matrix = TraitMatrix(getIndex())
+        except ImportError:
+            matrix = False
+    return matrix or None
+
+#Species bitset compatible with any of the given measurements, None when nothing was measured
+#measurement is the interval index key, e.g. "Leaf_Length"; ranges match every species they overlap
+def queryIntervals(measurements, measurement):
+    if not measurements:
+        return None
+    lookup = getIntervals()[measurement]
+    if tracer is not None:
+        tracer.count("queries", len(measurements))
+    matched = 0
+    for m in measurements:
+        matched |= lookup.query(m.low, m.high)
+    return matched
 
 #Function to print a nicely-formatted list of species from the returned ontology queries
 def printFlowerList(inList):
@@ -66,397 +218,240 @@ def printFlowerList(inList):
         guess = guess.replace("_"," ")
         print("   " + guess)
 
-#Function to identify which questions have yet to be asked, and to return questions to ask the user    
-def askQuestions():
-    global usedColor
-    global usedCluster
-    global usedPosition
-    global usedFlowerShape
-    global usedFlowerSymmetry
-    global usedLeafArrangement
-    global usedLeafDivision
-    global usedLeafMargin
-    global usedLeafLength
-    global usedLeafShape
-    global usedPetalLength
-    global usedPetalNumber
-    global usedPlantEnvironment
-    global usedPlantSize
-    
-    print(onto().search(is_a = onto().LooseFlower_Cluster))
-    
-    if not usedColor:
-        print("\n   What color are the flowers?\n")
-    elif not usedCluster:
-        print("\n   How are the flowers clustered together?")
-        print("   Are they clustered together like a ball? A spike? Or are they loose / sparsely clustered?\n")
-    elif not usedPosition:
-        print("\n   How are the flowers positioned on the plant?\n")
-        print("   Are they apical (at the top of the plant)? Or axillary (at the bottom)?\n")
-    elif not usedLeafLength:
-        print("\n   How long (in cm) roughly are the plant's leaves?")
-    elif not usedFlowerShape:
-        print("\n   What shape are the flowers?\n")
-        print("   Do they look like a bell? Trumpet? Or more like a disc?\n")
-    elif not usedLeafShape:
-        print("\n   What shape are the plant's leaves?")
-        print("   Are they larger near the tip or the base? Are they round? Straight?\n")
-    elif not usedFlowerSymmetry:
-        print("\n   Is there any notable symmetry to the flowers?\n")
-    elif not usedPetalLength:
-        print("\n   How long (in mm) roughly are the petals on the flowers?\n")
-    elif not usedPetalNumber:
-        print("\n   How many petals are there on each flower?\n")   
-    elif not usedLeafArrangement:
-        print("\n   How are the leaves arranged on the stalk?")
-    elif not usedLeafDivision:
-        print("\n   Do the leaves have lobes, or are they 'simple' looking?")
-    elif not usedLeafMargin:
-        print("\n   Is there anything noticeable about the edges of the leaves?")  
-    elif not usedPlantSize:
-        print("\n   About how tall (in cm) is the plant?")
-    else:
-        print("\nI can't think of any more questions to ask... you should start over!")
-    '''if not usedPlantEnvironment:
-        print("   Do you know what environment the plant is growing in?")
-    '''
+#Questions to ask for each attribute, in the order they are asked
+questions = [("color", "\n   What color are the flowers?\n"),
+             ("cluster", "\n   How are the flowers clustered together?\n"
+                         "   Are they clustered together like a ball? A spike? Or are they loose / sparsely clustered?\n"),
+             ("position", "\n   How are the flowers positioned on the plant?\n\n"
+                          "   Are they apical (at the top of the plant)? Or axillary (at the bottom)?\n"),
+             ("leafLength", "\n   How long (in cm) roughly are the plant's leaves?"),
+             ("flowerShape", "\n   What shape are the flowers?\n\n"
+                             "   Do they look like a bell? Trumpet? Or more like a disc?\n"),
+             ("leafShape", "\n   What shape are the plant's leaves?\n"
+                           "   Are they larger near the tip or the base? Are they round? Straight?\n"),
+             ("flowerSymmetry", "\n   Is there any notable symmetry to the flowers?\n"),
+             ("petalLength", "\n   How long (in mm) roughly are the petals on the flowers?\n"),
+             ("petalNumber", "\n   How many petals are there on each flower?\n"),
+             ("leafArrangement", "\n   How are the leaves arranged on the stalk?"),
+             ("leafDivision", "\n   Do the leaves have lobes, or are they 'simple' looking?"),
+             ("leafMargin", "\n   Is there anything noticeable about the edges of the leaves?"),
+             ("plantSize", "\n   About how tall (in cm) is the plant?")]
+'''("plantEnvironment", "   Do you know what environment the plant is growing in?")'''
+
+questionText = dict(questions)
+
+#First attribute in the fixed order of questions that has not been considered yet
+#used is the session's bitmask of attributes already considered
+def fixedQuestionAttribute(used):
+    for attribute, question in questions:
+        if not used & attributeBits[attribute]:
+            return attribute
+    return None
+
+#Species bitset of every possible answer to each attribute, built from the trait index on first use
+answers = None
+
+def getAnswers():
+    global answers
+    if answers is None:
+        index = getIndex()
+        built = {}
+        for name, label, groupNames, extractor, classes in attributes:
+            if isinstance(classes, str):
+                built[name] = getIntervals()[classes].answers()
+            else:
+                built[name] = [index.speciesFor(c) for c in dict.fromkeys(classes.values())]
+        answers = built
+    return answers
+
+#Attribute the next question should ask about: the unused attribute expected to leave the fewest of
+#the candidates, ties broken by the fixed order of questions
+#Returns None when no unused attribute can narrow the candidates any further
+def nextQuestionAttribute(used, candidates=None):
+    if candidates is None:
+        candidates = getIndex().allSpecies
+    order = [attribute for attribute, question in questions if not used & attributeBits[attribute]]
+    return bestQuestion(getIndex(), candidates, order, getAnswers())
+
+#Compile the dichotomous key of the loaded ontology
+def compileOntologyKey():
+    index = getIndex()
+    order = [attribute for attribute, question in questions]
+    return compileKey(index, order, getAnswers(), index.ontologyHash)
+
+#Compiled dichotomous key, from its file when it matches the ontology and the answers, compiled (and saved) otherwise
+dichotomousKey = None
+
+def getKey():
+    global dichotomousKey
+    if dichotomousKey is None:
+        index = getIndex()
+        path = keyPath(ONTOLOGY_FILE)
+        dichotomousKey = loadKey(path, index.ontologyHash, getAnswers())
+        if dichotomousKey is None:
+            dichotomousKey = compileOntologyKey()
+            try:
+                saveKey(dichotomousKey, path)
+            except OSError:
+                pass
+    return dichotomousKey
+
+#Next attribute to ask about: the compiled key's question when the candidates are part of the key
+#(None at its leaves), otherwise the information-gain scheduler
+def plannedQuestionAttribute(used, candidates):
+    key = getKey()
+    if key.knows(candidates):
+        attribute = key.question(candidates)
+        if attribute is None or not used & attributeBits[attribute]:
+            return attribute
+    return nextQuestionAttribute(used, candidates)
+
+#Function to identify which questions have yet to be asked, and to return the next question to ask the user
+#Returns None when there is nothing left worth asking
+def askQuestions(used, candidates=None):
+    attribute = nextQuestionAttribute(used, candidates)
+    if attribute is None:
+        return None
+    return questionText[attribute]
+
+#Synonyms for every value of every descriptive attribute, compiled into one SynonymMatcher
+#("asymmetrical" for no flower symmetry and "complex" leaf division have no ontology class and are not listed)
+synonyms = {"color" : {"blue" : ["blue","aqua", "navy", "marine", "cornflower", "midnight", "royal"],
+                       "green" : ["green","lime", "forest", "moss", "olive", "sage"],
+                       "orange": ["orange","salmon", "coral", "sienna"],
+                       "pink" : ["pink", "orchid", "magenta", "grapefruit"],
+                       "purple": ["purple", "plum", "violet", "indigo"],
+                       "red": ["red","maroon", "scarlet", "vermillion"],
+                       "transparent":["transparent","clear","see-through","see through"],
+                       "white":["white","gray", "snow", "silver"],
+                       "yellow":["yellow", "goldenrod", "khaki", "wheat", "tan"]},
+            "cluster" : {"ball" : ["ball","round","sphere","circle"],
+                         "few" : ["few","solo","alone","apart","corumb","cyme"],
+                         "loose": ["loose","separate","panicle","thyrse"],
+                         "spike" : ["spike", "cone", "rod", "vertical","raceme"]},
+            "position" : {"apical" : ["apical","tip","on top"],
+                          "axillary" : ["axillary","at bottom", "bottom of"]},
+            "flowerShape" : {"bell" : ["bell","tubular","cup","saucer","trumpet","funnel"],
+                             "rayed" : ["rayed","flat","stellate","salverform","disc"]},
+            "flowerSymmetry" : {"radial" : ["radial"]},
+            "leafArrangement" : {"basal" : ["basal","bottom","ground","base"],
+                                 "opposite" : ["opposite","matched","symmetrical"],
+                                 "whorled" : ["whorled","circular","circle"]},
+            "leafDivision" : {"simple" : ["simple","unlobed"]},
+            "leafMargin" : {"hairy" : ["hairy","fuzzy",]},
+            "leafShape" : {"heart" : ["heart","round","cordate","sinuate","orbicular","reniform"],
+                           "linear" : ["linear","elliptic","sessile","lanceolate","oblong"],
+                           "widerMiddle":["middle","ovate","rhomboid"],
+                           "widerTip":["tip","obovate"]}}
+
+#Organ mentions, found by the synonym automaton alongside the synonyms as hits of the attribute "organ"
+#Fragments match anywhere in a word ("flor" in "inflorescence", "leaf" in "leaflets"), whole words only on
+#word boundaries; plant words only place measurements, see tagSentence()
+organFragments = {"flower": ["flower", "flor"],
+                  "leaf": ["leaf", "leaves"],
+                  "petal": ["petal"]}
+organWords = {"petal": ["corolla"],
+              "plant": ["plant", "stem", "tall", "height", "high"]}
+
+#Measured attribute each organ introduces, None for flowers
+organAttributes = {"flower": None, "leaf": "leafLength", "petal": "petalLength", "plant": "plantSize"}
+
+matcher = None
+
+#Build the synonym automaton on first use
+def getMatcher():
+    global matcher
+    if matcher is None:
+        matcher = SynonymMatcher(dict(synonyms, organ=organWords), fragments={"organ": organFragments})
+    return matcher
+
+#Values of one attribute found in the given sentences, one entry per synonym occurrence
+def synonymValues(sents, attribute):
+    found = []
+    for sent in sents:
+        for hit in getMatcher().scan(sent):
+            if hit.attribute == attribute:
+                found.append(hit.value)
+    return found
+
+#Measurements of one attribute in the given sentences, in the unit the ontology uses for it
+def measuredValues(sents, attribute):
+    found = []
+    for sent in sents:
+        found.extend(attributeValues(extractMeasurements(sent, attribute), attribute))
+    return found
+
+#How descriptions are split into sentences
+#"rules" is the rule-based splitter of SentenceSplitter.py, "nltk" is NLTK's punkt model (loaded on first use)
+SPLITTERS = ("rules", "nltk")
+sentenceSplitter = "rules"
 
-#Built-in NLTK sentence tokenize function
+#Split a description into sentences with the selected splitter
 def sentTokenize(text):
-    sents = sent_tokenize(text)
-    return sents
+    if sentenceSplitter == "nltk":
+        from nltk.tokenize import sent_tokenize
+        return sent_tokenize(text)
+    return splitSentences(text)
 
 #Check all flower-adjacent sentences to determine if any of the identified synonyms are present
 #Add appropriate ontology queries for each found color
 def checkFlowerColor(sents):
-    vals = ["blue","green","orange","pink","purple","red","transparent","white","yellow"]
-    
-    valDict = {"blue" : ["blue","aqua", "navy", "marine", "cornflower", "midnight", "royal"],
-                 "green" : ["green","lime", "forest", "moss", "olive", "sage"],
-                 "orange": ["orange","salmon", "coral", "sienna"],
-                 "pink" : ["pink", "orchid", "magenta", "grapefruit"],
-                 "purple": ["purple", "plum", "violet", "indigo"],
-                 "red": ["red","maroon", "scarlet", "vermillion"],
-                 "transparent":["transparent","clear","see-through","see through"],
-                 "white":["white","gray", "snow", "silver"],
-                 "yellow":["yellow", "goldenrod", "khaki", "wheat", "tan"]}
-    
-    toSearch = []
-    
-    for sent in sents:
-        for x in vals:
-            for syns in valDict[x]:
-                if syns in sent:
-                    toSearch.append(x)
-    
-    return toSearch
-
-#Function to parse number words to numbers 
-def parse_int(textnum, numwords={}):    
-    '''
-    Function collected from text2int package via github
-    '''
-    if textnum.isdigit():
-        return int(textnum)
-    # create our default word-lists
-    if not numwords:
-
-        # singles
-        units = [
-            "zero", "one", "two", "three", "four", "five", "six", "seven", "eight",
-            "nine", "ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen",
-            "sixteen", "seventeen", "eighteen", "nineteen",
-        ]
-
-        # tens
-        tens = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
-        
-        # larger scales
-        scales = ["hundred", "thousand", "million", "billion", "trillion"]
-        
-        # divisors
-        numwords["and"] = (1, 0)
-
-        # perform our loops and start the swap
-        for idx, word in enumerate(units):    numwords[word] = (1, idx)
-        for idx, word in enumerate(tens):     numwords[word] = (1, idx * 10)
-        for idx, word in enumerate(scales):   numwords[word] = (10 ** (idx * 3 or 2), 0)
-
-    # primary loop
-    current = result = 0
-    # loop while splitting to break into individual words
-    for word in textnum.replace("-"," ").split():
-        # if problem then fail-safe
-        if word not in numwords:
-            raise Exception("Illegal word: " + word)
-
-        # use the index by the multiplier
-        scale, increment = numwords[word]
-        current = current * scale + increment
-        
-        # if larger than 100 then push for a round 2
-        if scale > 100:
-            result += current
-            current = 0
-
-    # return the result plus the current
-    return result + current
+    return synonymValues(sents, "color")
 
 #Check all flower-adjacent sentences to determine if any of the identified synonyms are present
 #Add appropriate ontology queries for each found clustering
 def checkFlowerCluster(sents):
-    vals = ["ball","few","loose","spike"]
-    
-    valDict = {"ball" : ["ball","round","sphere","circle"],
-               "few" : ["few","solo","alone","apart","corumb","cyme"],
-               "loose": ["loose","separate","panicle","thyrse"],
-               "spike" : ["spike", "cone", "rod", "vertical","raceme"]}
-
-    toSearch = []
-    
-    for sent in sents:
-        for x in vals:
-            for syns in valDict[x]:
-                if syns in sent:
-                    toSearch.append(x)
-    
-    return toSearch
+    return synonymValues(sents, "cluster")
 
 #Check all flower-adjacent sentences to determine if any of the identified synonyms are present
 #Add appropriate ontology queries for each location found
 def checkFlowerPosition(sents):
-    
-    vals = ["apical","axillary"]
-    
-    valDict = {"apical" : ["apical","tip","on top"],
-               "axillary" : ["axillary","at bottom", "bottom of"]}
-
-    
-    toSearch = []
-    
-    for sent in sents:
-        for x in vals:
-            for syns in valDict[x]:
-                if syns in sent:
-                    toSearch.append(x)
-    
-    return toSearch
+    return synonymValues(sents, "position")
 
 #Check all flower-adjacent sentences to determine if any of the identified synonyms are present
 #Add appropriate ontology queries for each found shape
 def checkFlowerShape(sents):
-    vals = ["bell","rayed"]
-    
-    valDict = {"bell" : ["bell","tubular","cup","saucer","trumpet","funnel"],
-               "rayed" : ["rayed","flat","stellate","salverform","disc"]}
-
-    
-    toSearch = []
-    
-    for sent in sents:
-        for x in vals:
-            for syns in valDict[x]:
-                if syns in sent:
-                    toSearch.append(x)
-    
-    return toSearch
+    return synonymValues(sents, "flowerShape")
 
 
 #Check all flower-adjacent sentences to determine if any of the identified synonyms are present
 #Add appropriate ontology queries for each found symmetry
 def checkFlowerSymmetry(sents):
-    vals = ["radial","none"]
-    
-    valDict = {"radial" : ["radial"],
-               "none" : ["asymmetrical"]}
-
-    
-    toSearch = []
-    
-    for sent in sents:
-        for x in vals:
-            for syns in valDict[x]:
-                if syns in sent:
-                    toSearch.append(x)
-    
-    return toSearch
+    return synonymValues(sents, "flowerSymmetry")
 
 
 #Check all leaf-adjacent sentences to determine if any of the identified synonyms are present
 #Add appropriate ontology queries for each found arrangement
 def checkLeafArrangement(sents):
-    
-    vals = ["basal","opposite","whorled"]
-    
-    valDict = {"basal" : ["basal","bottom","ground","base"],
-               "opposite" : ["opposite","matched","symmetrical"],
-               "whorled" : ["whorled","circular","circle"]}
-
-    
-    toSearch = []
-    
-    for sent in sents:
-        for x in vals:
-            for syns in valDict[x]:
-                if syns in sent:
-                    toSearch.append(x)
-    
-    return toSearch
+    return synonymValues(sents, "leafArrangement")
 
 #Check all leaf-adjacent sentences to determine if any of the identified synonyms are present
 #Add appropriate ontology queries for each found division
 def checkLeafDivision(sents):
-    vals = ["simple"]
-    
-    valDict = {"simple" : ["simple","unlobed"],
-               "complex" : ["complex"]}
-
-    
-    toSearch = []
-    for sent in sents:
-        for x in vals:
-            for syns in valDict[x]:
-                if syns in sent:
-                    toSearch.append(x)
-    
-    return toSearch
+    return synonymValues(sents, "leafDivision")
 
 #Check all leaf-adjacent sentences to determine if any of the identified synonyms are present
 #Add appropriate ontology queries for each found margin type
 def checkLeafMargin(sents):
-    vals = ["hairy"]
-    
-    valDict = {"hairy" : ["hairy","fuzzy",]}
-    
-    toSearch = []
-    
-    for sent in sents:
-        for x in vals:
-            for syns in valDict[x]:
-                if syns in sent:
-                    toSearch.append(x)
-    
-    return toSearch
+    return synonymValues(sents, "leafMargin")
 
 
 #Check all leaf-adjacent sentences to determine if any length data is present
-#Add appropriate ontology queries for each found leaf length
+#Add appropriate ontology queries for each found leaf length (in cm)
 def checkLeafLength(sents):
-    vals = ["millimeter","inch","centimeter","cm ","mm "]
-    global numbers
-    toSearch = []
-    lastNum = 0
-    
-    for sent in sents:
-        words = sent.split()
-
-        for word in words:
-
-            if (not word.isalpha()) and (not word.isdigit()):
-                justDigs = ""
-                justLetters = ""
-                for x in word:
-                    if x.isdigit():
-                        justDigs = justDigs + x
-                    else:
-                        justLetters = justLetters + x
-                lastNum = justDigs        
-                if justLetters == "millimeter" or justLetters == "mm":
-                    lastNum = lastNum/10
-                elif justLetters == "inch" or justLetters == "inches":
-                    lastNum = lastNum*2.54
-                else:
-                    lastNum = lastNum
-               
-                toSearch.append(lastNum)
-                return toSearch
-                    
-            for eachNum in numbers:
-                if (eachNum == word) or (word.isdigit()):
-                    lastNum = parse_int(word)
-                    for x in vals:
-                        if x in sent:
-                            if x == "millimeter" or x == "mm ":
-                                lastNum = lastNum/10
-                            elif x == "inch":
-                                lastNum = lastNum*2.54
-                            else:
-                                lastNum = lastNum
-                                
-                            toSearch.append(lastNum)        
-    return toSearch
+    return measuredValues(sents, "leafLength")
 
 
 #Check all leaf-adjacent sentences to determine if any of the identified synonyms are present
 #Add appropriate ontology queries for each found shape
 def checkLeafShape(sents):
-    vals = ["heart","linear","widerMiddle","widerTip"]
-    
-    valDict = {"heart" : ["heart","round","cordate","sinuate","orbicular","reniform"],
-               "linear" : ["linear","elliptic","sessile","lanceolate","oblong"],
-               "widerMiddle":["middle","ovate","rhomboid"],
-               "widerTip":["tip","obovate"]}
-
-    toSearch = []
-    
-    for sent in sents:
-        for x in vals:
-            for syns in valDict[x]:
-                if syns in sent:
-                    toSearch.append(x)
-    
-    return toSearch
+    return synonymValues(sents, "leafShape")
 
 
 #Check all petal-adjacent sentences to determine if any length data is available
-#Add appropriate ontology queries for the appropriate petal length
+#Add appropriate ontology queries for the appropriate petal length (in mm)
 def checkPetalLength(sents):
-    vals = ["millimeter","inch","centimeter","cm ","mm "]
-    global numbers
-    toSearch = []
-    lastNum = 0
-    
-    for sent in sents:
-        words = sent.split()
-        for word in words:
-
-            if (not word.isalpha()) and (not word.isdigit()):
-                justDigs = ""
-                justLetters = ""
-                for x in word:
-                    if x.isdigit():
-                        justDigs = justDigs + x
-                    else:
-                        justLetters = justLetters + x
-                lastNum = justDigs        
-                if justLetters == "centimeters" or justLetters == "cm":
-                    lastNum = lastNum*10
-                elif justLetters == "inch" or justLetters == "inches":
-                    lastNum = lastNum*25.4
-                else:
-                    lastNum = lastNum
-
-               
-                toSearch.append(lastNum)
-
-                return toSearch
-                    
-            for eachNum in numbers:
-                if (eachNum == word) or (word.isdigit()):
-                    lastNum = parse_int(word)
-                    
-                    for x in vals:
-                        if x in sent:
-                            if x == "centimeters" or x == "cm ":
-                                lastNum = lastNum*10
-                            elif x == "inch":
-                                lastNum = lastNum*2.54
-                            else:
-                                lastNum = lastNum
-                                
-                            toSearch.append(lastNum)        
-
-    return toSearch
+    return measuredValues(sents, "petalLength")
 
 
 #Check all petal-adjacent sentences to determine if any of the identified number of petals are present
@@ -495,6 +490,8 @@ def checkPetalNumber(sents):
         sent = sent.replace('ten','10')
         
         sent = sent.split()
+        if not sent:
+            continue
         prevWord = sent[0]
         for word in sent:
 
@@ -507,7 +504,7 @@ def checkPetalNumber(sents):
             prevWord = word
 
           
-    if numPetals is not 0:
+    if numPetals != 0:
         return numPetals
     else:
         return None
@@ -532,78 +529,573 @@ def checkPlantEnvironment(sents):
 '''
 
 #Check sentences to determine if any plant size information is found
-#Add appropriate ontology queries for the appropriate size
+#Add appropriate ontology queries for the appropriate size (in cm)
 def checkPlantSize(sents):
-    vals = ["millimeter","inch","centimeter","cm ","mm "]
-    global numbers
-    toSearch = []
-    lastNum = 0
+    return measuredValues(sents, "plantSize")
     
-    for sent in sents:
-        words = sent.split()
-        for word in words:
-            
-            if (not word.isalpha()) and (not word.isdigit()):
-                justDigs = ""
-                justLetters = ""
-                for x in word:
-                    if x.isdigit():
-                        justDigs = justDigs + x
-                    else:
-                        justLetters = justLetters + x
-                lastNum = justDigs        
-                if justLetters == "millimeter" or justLetters == "mm":
-                    lastNum = lastNum/10
-                elif justLetters == "inch" or justLetters == "inches":
-                    lastNum = lastNum*2.54
-                else:
-                    lastNum = lastNum
-               
-                toSearch.append(lastNum)
-                return toSearch
-                    
-            for eachNum in numbers:
-                if (eachNum == word) or (word.isdigit()):
-                    lastNum = parse_int(word)
-                    
-                    for x in vals:
-                        if x in sent:
-                            if x == "millimeter" or x == "mm ":
-                                lastNum = lastNum/10
-                            elif x == "inch":
-                                lastNum = lastNum*2.54
-                            else:
-                                lastNum = lastNum
-                                
-                            toSearch.append(lastNum)        
 
-    return toSearch
-    
+#checkPetalNumber as a list of values like the other extractors
+def checkPetalNumbers(sents):
+    petalNumber = checkPetalNumber(sents)
+    if petalNumber:
+        return [int(petalNumber)]
+    return []
+
+#Every attribute the system considers, in the order they narrow the candidates:
+#name, how it is shown to the user, sentence groups it is read from, extractor,
+#and the ontology classes for its values (a dict, or for measured attributes the interval index key)
+attributes = [("color", "flower color", ("flower", "petal"), checkFlowerColor, colorClasses),
+              ("cluster", "cluster type", ("flower",), checkFlowerCluster, clusterClasses),
+              ("position", "flower position", ("flower",), checkFlowerPosition, positionClasses),
+              ("flowerShape", "flower shape", ("flower",), checkFlowerShape, flowerShapeClasses),
+              ("flowerSymmetry", "flower symmetry", ("flower",), checkFlowerSymmetry, symmetryClasses),
+              ("leafArrangement", "leaf arrangement", ("leaf",), checkLeafArrangement, leafArrangementClasses),
+              ("leafDivision", "leaf division", ("leaf",), checkLeafDivision, leafDivisionClasses),
+              ("leafMargin", "leaf margin", ("leaf",), checkLeafMargin, leafMarginClasses),
+              ("leafLength", "leaf length in cm", ("leaf",), checkLeafLength, "Leaf_Length"),
+              ("leafShape", "leaf shape", ("leaf",), checkLeafShape, leafShapeClasses),
+              ("petalLength", "petal length in mm", ("petal",), checkPetalLength, "Petal_Length"),
+              ("petalNumber", "petal number", ("petal",), checkPetalNumbers, petalNumberClasses),
+              ("plantSize", "plant size in cm", ("plant",), checkPlantSize, "Wildflower_Size")]
+
+#Bit of each attribute in Session.used
+attributeBits = {attribute[0]: 1 << i for i, attribute in enumerate(attributes)}
+
+#Sentence groups, extractor and ontology classes of each attribute
+attributeGroups = {attribute[0]: attribute[2] for attribute in attributes}
+attributeExtractors = {attribute[0]: attribute[3] for attribute in attributes}
+attributeClasses = {attribute[0]: attribute[4] for attribute in attributes}
+
+#Names of the attributes set in a Session.used bitmask
+def usedAttributes(used):
+    return [attribute[0] for attribute in attributes if used & attributeBits[attribute[0]]]
+
+#Relative importance of each attribute when ranking partial matches, 1.0 for attributes not listed
+attributeWeights = {}
+
+#Trait class -> weight for the traits read from a description (attribute name -> values, as in Result.traits)
+#Each attribute's weight is shared between the values described for it; a measured value is credited
+#half for the upper bound classes and half for the lower bound classes it agrees with
+def traitWeights(traits, weights=None):
+    if weights is None:
+        weights = attributeWeights
+    found = {}
+    for name, values in traits.items():
+        if not values:
+            continue
+        weight = weights.get(name, 1.0) / len(values)
+        classes = attributeClasses[name]
+        for value in values:
+            if isinstance(classes, str):
+                lookup = getIntervals().get(classes)
+                traitNames = lookup.bucketsFor(value * ATTRIBUTE_UNITS[name]) if lookup is not None else []
+                share = weight / 2
+            else:
+                traitNames = [classes[value]] if value in classes else []
+                share = weight
+            for traitName in traitNames:
+                found[traitName] = found.get(traitName, 0.0) + share
+    return found
+
+#The k species agreeing best with the traits as (species, score), best first
+#A score is the weighted fraction of the described attributes the species agrees with, 1.0 for all of them
+def rankSpecies(traits, weights=None, k=5):
+    if weights is None:
+        weights = attributeWeights
+    total = sum(weights.get(name, 1.0) for name, values in traits.items() if values)
+    if not total:
+        return []
+    query = traitWeights(traits, weights)
+    found = getMatrix()
+    if found is not None:
+        ranked = found.top(query, k)
+    else:
+        ranked = rankBitsets(getIndex(), query, k)
+    return [(name, score / total) for name, score in ranked]
+
+#Tracer installed by tracing(), None while the pipeline is not traced
+tracer = None
+
+#Trace every identification made inside the block, yields the Tracer with the span timings and counters
+#sink - called as sink(span name, seconds) for every span as it ends
+#profiler - a cProfile.Profile (or anything with enable() and disable()) run for the length of the block
+#  with tracing(profiler=cProfile.Profile()) as found: identify(text)
+#  print(found.report())
+@contextmanager
+def tracing(sink=None, profiler=None):
+    global tracer
+    previous = tracer
+    tracer = Tracer(sink)
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield tracer
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        tracer = previous
+
+#Punctuation turned into spaces, so that "ovate-lanceolate" and "white/yellow" are read as two words,
+#except for the decimal points, ranges and fractions handled below
+stripPunctuation = str.maketrans(string.punctuation.replace(".", "").replace("-", "").replace("/", ""),
+                                 " " * (len(string.punctuation) - 3))
+#".", "-" and "/" are kept only between digits, as in "2.5 cm", "2-5 cm" or "1/2 in"
+strayNumberPunctuation = re.compile(r"(?<!\d)[./-]|[./-](?!\d)")
+
+#Lower-case a sentence and replace its punctuation with single spaces
+def normalizeSentence(sent):
+    return " ".join(strayNumberPunctuation.sub(" ", sent.translate(stripPunctuation)).lower().split())
+
+#Split a description into lower-case sentences with punctuation removed
+#Sentences left empty, such as a bare "?", are dropped
+def normalizeSentences(text):
+    active = tracer
+    if active is None:
+        return [sent for sent in map(normalizeSentence, sentTokenize(text)) if sent]
+    started = active.start()
+    sents = sentTokenize(text)
+    started = active.end("tokenize", started)
+    sents = [sent for sent in map(normalizeSentence, sents) if sent]
+    active.end("normalize", started)
+    return sents
+
+#Tag the organ mentions and synonyms of a normalised sentence in one scan of the synonym automaton
+#Returns (groups, hits, organs):
+#groups - the parts of the plant the sentence mentions (flower, leaf, petal, in order of first mention, and
+#plant if a plant word is there too), or ("plant",) when it mentions no flower, leaf or petal
+#hits - (synonym hit, group of its organ context), the context of a hit being the flower, leaf or petal
+#mention its attribute is read from that it stands right in front of, else the last one before it, else the
+#first one after it, so "white flowers and opposite leaves" reads the color from the flowers and the
+#arrangement from the leaves; the group is "plant" when there is no such mention, and for the loser of
+#overlapping hits of different attributes ("bottom" and "bottom of"), the closer context winning, then the
+#longer hit
+#organs - (start, end, measured attribute) of every organ mention, plant words included, for placing
+#measurements, None when the sentence mentions no flower, leaf or petal
+def tagSentence(sent):
+    mentions = []
+    plantWords = []
+    synonymHits = []
+    #hits come in order of where they end, so two overlap only if one starts before the hit in front of it ends
+    overlapping = False
+    previousEnd = 0
+    for hit in getMatcher().scan(sent):
+        attribute, value, start, end = hit
+        if attribute != "organ":
+            if start < previousEnd:
+                overlapping = True
+            previousEnd = end
+            synonymHits.append(hit)
+        elif value == "plant":
+            plantWords.append((start, end, "plantSize"))
+        else:
+            mentions.append((start, end, value))
+    if not mentions:
+        return ("plant",), [(hit, "plant") for hit in synonymHits], None
+
+    groups = list(dict.fromkeys(mention[2] for mention in mentions))
+    if plantWords:
+        groups.append("plant")
+    #context of every hit as (rank, group): 0 for a mention right after the hit, 1 for one before it, 2 for one
+    #further after it, None for no context
+    contexts = []
+    for attribute, value, start, end in synonymHits:
+        readFrom = attributeGroups[attribute]
+        context = None
+        for mentionStart, mentionEnd, organ in mentions:
+            if organ not in readFrom:
+                continue
+            if mentionStart < end:
+                context = (1, organ)
+                continue
+            if mentionStart - end <= 1:
+                context = (0, organ)
+            elif context is None:
+                context = (2, organ)
+            break
+        contexts.append(context)
+    hits = []
+    for hit, context in zip(synonymHits, contexts):
+        if overlapping and context is not None:
+            rank = (context[0], hit.start - hit.end)
+            for other, otherContext in zip(synonymHits, contexts):
+                if (otherContext is not None and other.attribute != hit.attribute and other.start < hit.end
+                        and hit.start < other.end and (otherContext[0], other.start - other.end) < rank):
+                    context = None
+                    break
+        hits.append((hit, "plant" if context is None else context[1]))
+    organs = [(start, end, organAttributes[organ]) for start, end, organ in mentions]
+    if plantWords:
+        organs = sorted(organs + plantWords)
+    return tuple(groups), hits, organs
+
+#Attributes read from the sentences of each group, in table order
+groupAttributes = {}
+for attribute in attributes:
+    for groupName in attribute[2]:
+        groupAttributes.setdefault(groupName, []).append(attribute[0])
+
+#Attributes read from a sentence mentioning the given groups, in table order
+#Memoised: there are only a few combinations of groups
+groupReaders = {}
+
+def sentenceReaders(groups):
+    readers = groupReaders.get(groups)
+    if readers is None:
+        readers = [attribute[0] for attribute in attributes if any(g in attribute[2] for g in groups)]
+        groupReaders[groups] = readers
+    return readers
+
+#Species bitset matched by the described values of an attribute with ontology classes
+#Memoised for the life of the loaded index: the lexicon has a small fixed set of values, so this stays small
+describedMatches = {}
+
+def describedMatch(name, values):
+    key = (name, frozenset(values))
+    if key not in describedMatches:
+        describedMatches[key] = queryClasses(values, attributeClasses[name])
+    return describedMatches[key]
+
+#Everything up to the ontology queries is deterministic for a given text and ontology, so it is cached at
+#two levels: whole descriptions (sentence splitting and normalisation) and single normalised sentences
+#(organ and synonym tagging and extractor outputs), which also catches near-identical descriptions
+#Both caches are bounded LRU caches whose entries expire after CACHE_TTL seconds, see cacheStats()
+DESCRIPTION_CACHE_SIZE = 4096
+SENTENCE_CACHE_SIZE = 16384
+CACHE_TTL = 3600.0
+
+#(ontology hash, sentence splitter, description with whitespace collapsed) -> tuple of normalised sentences
+descriptionCache = LruCache(DESCRIPTION_CACHE_SIZE, CACHE_TTL)
+#(ontology hash, normalised sentence) -> (groups, synonym hits, organs, {attribute: extractor output})
+sentenceCache = LruCache(SENTENCE_CACHE_SIZE, CACHE_TTL)
+
+#normalizeSentences() through the description cache
+def describeSentences(text):
+    key = (getIndex().ontologyHash, sentenceSplitter, " ".join(text.split()))
+    sentences = descriptionCache.get(key)
+    if sentences is MISSING:
+        sentences = tuple(normalizeSentences(text))
+        descriptionCache.put(key, sentences)
+    return sentences
+
+#tagSentence() of a normalised sentence, and the extractor outputs computed for it so far
+def sentenceFacts(sent):
+    key = (getIndex().ontologyHash, sent)
+    facts = sentenceCache.get(key)
+    if facts is MISSING:
+        facts = tagSentence(sent) + ({},)
+        sentenceCache.put(key, facts)
+    return facts
+
+#Extractor output of an attribute for one sentence: its measurements for measured attributes, its values otherwise
+#organs - the organ mentions of tagSentence(); measurements are placed by the nearest of them, and without
+#any every measurement of the sentence is taken for the attribute
+def extractOutput(sent, name, organs=None):
+    if isinstance(attributeClasses[name], str):
+        if organs is None:
+            return extractMeasurements(sent, name)
+        return [m for m in extractMeasurements(sent, None, organs) if m.attribute == name]
+    return attributeExtractors[name]([sent])
+
+#extractOutput() through the sentence cache
+#The measurements of a sentence with organ mentions are extracted once and shared by the measured attributes
+def sentenceOutput(sent, name):
+    groups, hits, organs, outputs = sentenceFacts(sent)
+    if name not in outputs:
+        if organs is not None and isinstance(attributeClasses[name], str):
+            if None not in outputs:
+                outputs[None] = extractMeasurements(sent, None, organs)
+            outputs[name] = [m for m in outputs[None] if m.attribute == name]
+        else:
+            outputs[name] = extractOutput(sent, name)
+    return outputs[name]
+
+#Hit counters of both caches
+def cacheStats():
+    return {"descriptions": descriptionCache.stats(), "sentences": sentenceCache.stats()}
+
+#Values of one attribute in the given sentences, and what they are matched by: the measurements of a measured
+#attribute, the values that have an ontology class otherwise (empty when there is nothing to match)
+#Sentences are read one at a time through the sentence cache, and the values found in each are combined
+def extractAttribute(name, sents):
+    classes = attributeClasses[name]
+    if name in synonyms:
+        values = [hit.value for sent in sents for hit, group in sentenceFacts(sent)[1] if hit.attribute == name]
+    elif isinstance(classes, str):
+        measurements = [m for sent in sents for m in sentenceOutput(sent, name)]
+        return attributeValues(measurements, name), measurements
+    else:
+        values = [value for sent in sents for value in sentenceOutput(sent, name)]
+    return values, [value for value in values if value in classes]
+
+#Species bitset matched by the second part of extractAttribute()'s output, None if it is empty
+def matchAttribute(name, matchedBy):
+    if not matchedBy:
+        return None
+    classes = attributeClasses[name]
+    if isinstance(classes, str):
+        return queryIntervals(matchedBy, classes)
+    return describedMatch(name, matchedBy)
+
+#Values of one attribute in the given sentences and the species bitset they match, None if nothing matched
+def readAttribute(name, sents):
+    active = tracer
+    if active is not None:
+        started = active.start()
+    values, matchedBy = extractAttribute(name, sents)
+    if active is not None:
+        started = active.end("extract:" + name, started)
+    matched = matchAttribute(name, matchedBy)
+    if active is not None:
+        active.end("query:" + name, started)
+    return values, matched
+
+#Answer to a question of the compiled key: the branch of the answer is found with no ontology queries
+#Returns (values, species bitset of the branch), or None when the candidates are not at a node of the key
+#asking about this attribute, or when the answer matches none of its branches, and identify() falls back
+#to reading the attribute like any other
+def followKey(sentences, candidates, used, answering):
+    key = getKey()
+    if used & attributeBits[answering] or key.question(candidates) != answering:
+        return None
+    values, matched = readAttribute(answering, sentences)
+    if matched is None or key.follow(candidates, answering, matched) is None:
+        return None
+    return values, matched
+
+#Work done and avoided by the query planner of identify() since start-up
+#queries - ontology and interval index lookups made, queriesSkipped - lookups left out because every species
+#was already ruled out, extractorCalls - attributes read by their own extractor
+plannerCounters = {"queries": 0, "queriesSkipped": 0, "extractorCalls": 0}
+
+#Latency, turns-to-resolution, attribute hit and empty-result metrics of every identify() call since start-up
+metrics = Metrics([attribute[0] for attribute in attributes])
+
+#Number of turns that led to a session, undo() and retract() included
+def sessionTurns(session):
+    return session.turns if session is not None else 0
+
+#Load everything identify() otherwise loads on first use: the index, the synonym automaton, the interval index,
+#the compiled key, the trait matrix and the sentence splitter, so that a server's first request does not pay for it
+def warmUp():
+    getIndex()
+    getMatcher()
+    getIntervals()
+    getKey()
+    getMatrix()
+    normalizeSentences("Warm up.")
+
+#Headless identification API: apply one description to the session from the previous turn
+#answering names the attribute the text answers (Result.nextAttribute of the previous turn), so that
+#a bare answer such as "white" is also read by that attribute's extractor
+#No printing or input happens here, the caller decides how to present the Result
+#Described traits are applied most selective first, and once no species is left the remaining lookups are
+#skipped, see plannerCounters; every trait described is still read and reported in Result.traits
+#Each stage is timed when a Tracer is installed, see tracing(), and every call is recorded in metrics
+def identify(text, session=None, answering=None):
+    active = tracer
+    if active is not None:
+        traced = active.start()
+    started = time.perf_counter()
+    result = identifyTurn(text, session, answering)
+    metrics.recordIdentify(time.perf_counter() - started, result)
+    #a session is resolved on the turn that first leaves a single species
+    if result.resolved and len(result.candidates) == 1 and (session is None or session.candidates is None
+                                                            or getIndex().count(session.candidates) != 1):
+        metrics.recordResolution(sessionTurns(result.session))
+    if active is not None:
+        active.end("identify", traced)
+    return result
+
+#One identification turn, see identify()
+def identifyTurn(text, session=None, answering=None):
+    active = tracer
+    if session is None:
+        session = Session()
+    index = getIndex()
+
+    sentences = describeSentences(text)
+    candidates = session.candidates
+    guesses = session.guesses
+    used = session.used
+    constraints = session.constraints
+    if candidates is None:
+        candidates = index.allSpecies
+        guesses = 0
+
+    traits = {}
+    steps = []
+
+    def apply(name, values, matched):
+        nonlocal candidates, guesses, used, constraints
+        #narrow the candidates with a single bitwise AND
+        used |= attributeBits[name]
+        constraints = constraints + ((name, matched),)
+        traits[name] = list(dict.fromkeys(values))
+        guesses = candidates & matched
+        if active is not None:
+            eliminated = index.count(candidates) - index.count(guesses)
+            active.count("candidatesEliminated", eliminated)
+            active.count("eliminated:" + name, eliminated)
+        candidates = guesses
+        steps.append((name, index.names(matched), index.names(candidates)))
+
+    #an answer to a question of the compiled key is applied first, then the rest of the text is read as usual
+    if answering is not None:
+        followed = followKey(sentences, candidates, used, answering)
+        if followed is not None:
+            apply(answering, *followed)
+
+    #a turn only looks at its own new sentences: each one is tagged by a single scan of the synonym automaton,
+    #each synonym is read by its attribute only if the organ mention nearest to it is one that attribute is
+    #read from, and only the attributes read from the organs mentioned (and, for an answer, from the groups of
+    #the attribute asked about) see the sentence, so attributes the text says nothing about are never
+    #visited however many are still unused; a sentence of an answer that mentions no flower, leaf or petal,
+    #such as "3 cm" or "white", is read by the attribute asked about only
+    if active is not None:
+        started = active.start()
+    answerReaders = []
+    if answering is not None:
+        for groupName in attributeGroups[answering]:
+            answerReaders = answerReaders + [name for name in groupAttributes[groupName] if name not in answerReaders]
+    describedValues = {}
+    sentsByAttribute = {}
+    for sent in sentences:
+        groups, hits, organs, outputs = sentenceFacts(sent)
+        hitReaders = answerReaders
+        if answering is not None and organs is None:
+            readers = hitReaders = [answering]
+        else:
+            readers = sentenceReaders(groups)
+            if answerReaders:
+                readers = readers + [name for name in answerReaders if name not in readers]
+        for name in readers:
+            if name not in synonyms and not used & attributeBits[name]:
+                sentsByAttribute.setdefault(name, []).append(sent)
+        for hit, group in hits:
+            if ((hit.attribute in groupAttributes[group] or hit.attribute in hitReaders)
+                    and not used & attributeBits[hit.attribute]):
+                describedValues.setdefault(hit.attribute, []).append(hit.value)
+    if active is not None:
+        started = active.end("route", started)
+
+    #plan: constraints already read by the automaton, most selective first, then the attributes that need
+    #their own extractor, those expected to leave the fewest candidates first
+    described = []
+    for name, values in describedValues.items():
+        classes = attributeClasses[name]
+        found = [classes[x] for x in dict.fromkeys(values) if x in classes]
+        if found:
+            described.append((sum(index.traitCounts.get(c, 0) for c in found), attributeBits[name], name, values))
+    described.sort()
+    extracted = list(sentsByAttribute.items())
+    if active is not None:
+        started = active.end("plan", started)
+
+    #a single species left can still be ruled out by the rest of the description, so every constraint is
+    #applied until none is left; after that nothing can change the candidates and the lookups are left out
+    for estimate, position, name, values in described:
+        if not candidates:
+            plannerCounters["queriesSkipped"] += 1
+            traits[name] = list(dict.fromkeys(values))
+            used |= attributeBits[name]
+            constraints = constraints + ((name, frozenset(values)),)
+            continue
+        plannerCounters["queries"] += 1
+        if active is not None:
+            queryStarted = active.start()
+        matched = describedMatch(name, values)
+        if active is not None:
+            active.end("query:" + name, queryStarted)
+        apply(name, values, matched)
+
+    answers = getAnswers()
+    extracted.sort(key=lambda entry: expectedRemaining(index, candidates, answers[entry[0]]))
+    for name, sents in extracted:
+        plannerCounters["extractorCalls"] += 1
+        if not candidates:
+            values, matchedBy = extractAttribute(name, sents)
+            if matchedBy:
+                plannerCounters["queriesSkipped"] += 1
+                traits[name] = list(dict.fromkeys(values))
+                used |= attributeBits[name]
+                constraints = constraints + ((name, frozenset(matchedBy)),)
+            continue
+        values, matched = readAttribute(name, sents)
+        if matched is None:
+            continue
+        plannerCounters["queries"] += 1
+        apply(name, values, matched)
+    if active is not None:
+        active.end("narrow", started)
+
+    resolved = index.count(candidates) <= 1
+    if active is not None:
+        started = active.start()
+    ranked = []
+    if not candidates:
+        ranked = rankSpecies(traits)
+        if active is not None:
+            started = active.end("rank", started)
+    nextAttribute = None
+    nextQuestion = None
+    if not resolved:
+        nextAttribute = plannedQuestionAttribute(used, candidates)
+        if nextAttribute is not None:
+            nextQuestion = questionText[nextAttribute]
+        if active is not None:
+            active.end("question", started)
+
+    return Result(index.names(candidates), index.names(guesses), traits, steps, nextQuestion, nextAttribute,
+                  resolved, ranked, Session(candidates, guesses, used, constraints, session))
+
+#Result describing a session as it stands, for undo() and retract()
+def sessionResult(session):
+    index = getIndex()
+    candidates = session.candidates
+    if candidates is None:
+        candidates = index.allSpecies
+    resolved = index.count(candidates) <= 1
+    nextAttribute = None
+    nextQuestion = None
+    if not resolved:
+        nextAttribute = plannedQuestionAttribute(session.used, candidates)
+        if nextAttribute is not None:
+            nextQuestion = questionText[nextAttribute]
+    return Result(index.names(candidates), index.names(session.guesses), {}, [], nextQuestion, nextAttribute,
+                  resolved, [], session)
+
+#Step back to the session before its last turn
+def undo(session):
+    if session is None or session.previous is None:
+        return sessionResult(Session())
+    return sessionResult(session.previous)
+
+#Take back everything one attribute contributed, e.g. a mis-described trait, keeping every other constraint
+#The candidates are the intersection of the remaining constraints' stored bitsets, so nothing is
+#re-extracted or re-queried; a corrected value can then be given with identify(text, session, attribute)
+def retract(session, attribute):
+    index = getIndex()
+    constraints = tuple(c for c in session.constraints if c[0] != attribute)
+    if len(constraints) == len(session.constraints):
+        return sessionResult(session)
+    if not constraints:
+        return sessionResult(Session(None, 0, session.used & ~attributeBits[attribute], constraints, session))
+    candidates = index.allSpecies
+    for name, matched in constraints:
+        if isinstance(matched, frozenset):
+            matched = matchAttribute(name, matched)
+        candidates &= matched
+    return sessionResult(Session(candidates, candidates, session.used & ~attributeBits[attribute], constraints,
+                                 session))
 
 #Main function for the program, launches and runs interface with the user
+#A thin console wrapper around identify()
 def interface():
-    global currentPossibilities
-    global possibilitiesOut
-    global possibilitiesIn
-    
-    global usedColor
-    global usedCluster
-    global usedPosition
-    global usedFlowerShape
-    global usedFlowerSymmetry
-    global usedLeafArrangement
-    global usedLeafDivision
-    global usedLeafMargin
-    global usedLeafLength
-    global usedLeafShape
-    global usedPetalLength
-    global usedPetalNumber
-    global usedPlantEnvironment
-    global usedPlantSize
-    
-    
+    labels = {name: label for name, label, groupNames, extractor, classes in attributes}
+    session = Session()
+    answering = None
     resolved = False
-    
+
     print()
     print()
     print()
@@ -619,8 +1111,8 @@ def interface():
     print("---------")
     print("---------")
     print("------")
-    print("---")    
-    
+    print("---")
+
     print()
     print()
     print("This system uses your description of a wildflower to identify which Wisconsin-native member of the Rubiaceae family - if any - it is.")
@@ -628,690 +1120,69 @@ def interface():
     print()
     print()
     print("Please provide a description of the plant, including details on the appearance and orientation of its leaves and flowers,\n as well as general information on the plant itself:")
-    
+    print("(Type 'undo' to take back your last answer, or 'retract' and a trait such as 'retract flower color' to take back one trait.)")
+
+    #attribute names and labels accepted by 'retract'
+    retractNames = {}
+    for name, label in labels.items():
+        retractNames[name.lower()] = name
+        retractNames[label] = name
+        retractNames[label.replace(" in cm", "").replace(" in mm", "")] = name
+
     while not resolved:
         userText = input("")
         print()
-        sentences = sentTokenize(userText)
-        strippedSent = []
-        for x in sentences:
-            x = x.translate(str.maketrans('', '', string.punctuation))
-            strippedSent.append(x.lower())
-        sentences = strippedSent
-        
-        
-        flowerSents = []
-        petalSents = []
-        plantSents = []
-        leafSents = []
-        
-        for sent in sentences:
-            if "flower" in sent or "flor" in sent:
-                flowerSents.append(sent)
-            
-            elif "leaf" in sent:
-                leafSents.append(sent)
-                
-            elif "leaves" in sent:
-                leafSents.append(sent)
-                
-            elif "petal" in sent:
-                petalSents.append(sent)
-                
-            else:
-                plantSents.append(sent)
-        
-                
-        '''
-        "blue","green","orange","pink","purple","red","transparent","white","yellow"
-        '''
-        
-        if usedColor is False:
-            
-            flowerColors = checkFlowerColor(flowerSents)
-            petalColors = checkFlowerColor(petalSents)
-            flowerColors = flowerColors + petalColors
-            
-            colorQueryResults = []
-            if ("blue") in flowerColors:
-                colorQueryResults.append(onto().search(is_a = onto().BlueFlower_Color))
-            if ("green") in flowerColors:
-                colorQueryResults.append(onto().search(is_a = onto().GreenFlower_Color))    
-            if ("orange") in flowerColors:
-                colorQueryResults.append(onto().search(is_a = onto().OrangeFlower_Color))
-            if ("pink") in flowerColors:
-                colorQueryResults.append(onto().search(is_a = onto().PinkFlower_Color))
-            if ("purple") in flowerColors:
-                colorQueryResults.append(onto().search(is_a = onto().PurpleFlower_Color))
-            if ("red") in flowerColors:
-                colorQueryResults.append(onto().search(is_a = onto().RedFlower_Color))
-            if ("transparent") in flowerColors:
-                colorQueryResults.append(onto().search(is_a = onto().TransparentFlower_Color))
-            if ("white") in flowerColors:
-                colorQueryResults.append(onto().search(is_a = onto().WhiteFlower_Color))
-            if ("yellow") in flowerColors:
-                colorQueryResults.append(onto().search(is_a = onto().YellowFlower_Color))
-            
-            if len(colorQueryResults) > 0:
-                print("Flower colors:")
-                print(flowerColors) 
-                print("Flowers retrieved from ontology by color:")
-                printFlowerList(colorQueryResults)
-                print()
-        
-        if usedCluster is False:
-            
-            flowerClusters = checkFlowerCluster(flowerSents)
-            
-            clusterQueryResults = []
-            if ("ball") in flowerClusters:
-                clusterQueryResults.append(onto().search(is_a = onto().BallFlower_Cluster))
-            if ("few") in flowerClusters:
-                clusterQueryResults.append(onto().search(is_a = onto().FewFlower_Cluster))    
-            if ("loose") in flowerClusters:
-                clusterQueryResults.append(onto().search(is_a = onto().LooseFlower_Cluster))
-            if ("spike") in flowerClusters:
-                clusterQueryResults.append(onto().search(is_a = onto().SpikeFlower_Cluster))
-            
-            if len(clusterQueryResults) > 0:
-                print("Flower clusters:")
-                print(flowerClusters)
-                print("Flowers retrieved from ontology by cluster type:")
-                printFlowerList(clusterQueryResults)
-                print()
-        
-        if usedPosition is False:
-            
-            flowerPosition = checkFlowerPosition(flowerSents)
-            
-            positionQueryResults = []
-            if ("apical") in flowerPosition:
-                positionQueryResults.append(onto().search(is_a = onto().Apical_at_TipFlower_Position))
-            if ("axillary") in flowerPosition:
-                positionQueryResults.append(onto().search(is_a = onto().Axillary_at_BaseFlower_Position))
-                
-            if len(positionQueryResults) > 0:
-                print("Flower position:")
-                print(flowerPosition)
-                print("Flowers retrieved from ontology by flower position:")
-                printFlowerList(positionQueryResults)
-                print()
-        
-        if usedFlowerShape is False:
-            
-            flowerShape = checkFlowerShape(flowerSents)
-            
-            shapeQueryResults = []
-            if ("bell") in flowerShape:
-                shapeQueryResults.append(onto().search(is_a = onto().BellFlower_Shape))
-            if ("rayed") in flowerShape:
-                shapeQueryResults.append(onto().search(is_a = onto().RayedFlower_Shape))
-            
-            if len(shapeQueryResults) > 0:
-                print("Flower shape:")
-                print(flowerShape)
-                print("Flowers retrieved from ontology by flower shape:")
-                printFlowerList(shapeQueryResults)
-                print()
-        
-        if usedFlowerSymmetry is False:
-            
-            flowerSymmetry = checkFlowerSymmetry(flowerSents)
-            
-            symmetryQueryResults = []
-            if ("radial") in flowerSymmetry:
-                symmetryQueryResults.append(onto().search(is_a = onto().RadialFlower_Symmetry))
-                
-            if len(symmetryQueryResults) > 0:
-                print("Flower symmetry:")
-                print(flowerSymmetry)
-                print("Flowers retrieved from ontology by flower symmetry:")
-                printFlowerList(symmetryQueryResults)
-                print()
-        
-        if usedLeafArrangement is False:
-            
-            leafArrangement = checkLeafArrangement(leafSents)
-            
-            leafArrangementQueryResults = []
-            if ("basal") in leafArrangement:
-                leafArrangementQueryResults.append(onto().search(is_a = onto().BasalLeaf_Arrangement))
-            if ("opposite") in leafArrangement:
-                leafArrangementQueryResults.append(onto().search(is_a = onto().OppositeLeaf_Arrangement))
-            if ("whorled") in leafArrangement:
-                leafArrangementQueryResults.append(onto().search(is_a = onto().WhorledLeaf_Arrangement))
-            
-            if len(leafArrangementQueryResults) > 0:
-                print("Leaf arrangement:")
-                print(leafArrangement)
-                print("Flowers retrieved from ontology by leaf arrangement:")
-                printFlowerList(leafArrangementQueryResults)
-                print()
-        
-        if usedLeafDivision is False:
-            
-            leafDivision = checkLeafDivision(leafSents)
-            
-            leafDivisionQueryResults = []
-            if ("simple") in leafDivision:
-                leafDivisionQueryResults.append(onto().search(is_a = onto().Simple))
-            
-            if len(leafDivisionQueryResults) > 0:
-                print("Leaf division:")
-                print(leafDivision)
-                print("Flowers retrieved from ontology by leaf division:")
-                printFlowerList(leafDivisionQueryResults)
-                print()
-        
-        if usedLeafMargin is False:
-            leafMargin = checkLeafMargin(leafSents)
-            leafMarginQueryResults = []
-            if ("simple") in leafMargin:
-                leafDivisionQueryResults.append(onto().search(is_a = onto().Hairy))
-            
-            if len(leafMarginQueryResults) > 0:
-                print("Leaf margin:")
-                print(leafMargin)
-                print("Flowers retrieved from ontology by leaf margin:")
-                printFlowerList(leafMarginQueryResults)
-                print()
-        
-        if usedLeafLength is False:
-            leafLength = checkLeafLength(leafSents)
-            leafLengthQueryResults = []
-            if leafLength:
-                leafLength = float(leafLength[0])
-                if leafLength <= 10:
-                    if leafLength <= 5:
-                        if leafLength >= 1:
-                            leafLengthQueryResults.append(onto().search(is_a = onto().FiveLeaf_MaxLengthInCM))
-                            leafLengthQueryResults.append(onto().search(is_a = onto().OneLeaf_MinLengthInCM))
-                        else:
-                            leafLengthQueryResults.append(onto().search(is_a = onto().FiveLeaf_MaxLengthInCM))
-                            leafLengthQueryResults.append(onto().search(is_a = onto().ZeroLeaf_MinLengthInCM))
-                    else:
-                        if leafLength >= 1:
-                            leafLengthQueryResults.append(onto().search(is_a = onto().TenLeaf_MaxLengthInCM))
-                            leafLengthQueryResults.append(onto().search(is_a = onto().OneLeaf_MinLengthInCM))
-                        else:
-                            leafLengthQueryResults.append(onto().search(is_a = onto().TenLeaf_MaxLengthInCM))
-                            leafLengthQueryResults.append(onto().search(is_a = onto().ZeroLeaf_MinLengthInCM))
-            
-            if len(leafLengthQueryResults) > 0:
-                print("Leaf length in cm:")
-                print(leafLength)
-                print("Flowers retrieved from ontology by leaf length:")
-                printFlowerList(leafLengthQueryResults)
-                print()
-        
-        if usedLeafShape is False:
-            leafShape = checkLeafShape(leafSents)
-            leafShapeQueryResults = []
-            if ("heart") in leafShape:
-                leafShapeQueryResults.append(onto().search(is_a = onto().Heart_RoundLeaf_Shape))
-            if ("linear") in leafShape:
-                leafShapeQueryResults.append(onto().search(is_a = onto().LiinearLeaf_Shape))
-            if ("widerMiddle") in leafShape:
-                leafShapeQueryResults.append(onto().search(is_a = onto().Wider_Near_MiddleLeaf_Shape))
-            if ("widerTip") in leafShape:
-                leafShapeQueryResults.append(onto().search(is_a = onto().Wider_Near_TipLeaf_Shape))
-            
-            if len(leafShapeQueryResults) > 0:
-                print("Leaf shape:")
-                print(leafShape)
-                print("Flowers retrieved from ontology by leaf shape:")
-                printFlowerList(leafShapeQueryResults)
-                print()
-        
-        if usedPetalLength is False:
-            petalLength = checkPetalLength(petalSents)
-            petalLengthQueryResults = []
-            if petalLength:
-                petalLength = float(petalLength[0])
-                if petalLength <= 3:
-                    petalLengthQueryResults.append(onto().search(is_a = onto().ThreePetal_MaxLengthInMM))
-                elif petalLength <= 10:
-                    petalLengthQueryResults.append(onto().search(is_a = onto().TenPetal_MaxLengthInMM))
-                elif petalLength <= 20:
-                    petalLengthQueryResults.append(onto().search(is_a = onto().TwentyPetal_MaxLengthInMM))
-                elif petalLength <= 30:
-                    petalLengthQueryResults.append(onto().search(is_a = onto().ThirtyPetal_MaxLengthInMM))
-            
-            if len(petalLengthQueryResults) > 0:
-                print("Petal length in mm:")
-                print(petalLength)
-                print("Flowers retrieved from ontology by petal length:")
-                printFlowerList(petalLengthQueryResults)
-                print()
-        
-        if usedPetalNumber is False:
-            petalNumber = checkPetalNumber(petalSents)
-            petalNumberQueryResults = []
-            if(petalNumber):
-                petalNumber = int(petalNumber)
-                
-                if petalNumber == 3:
-                    petalNumberQueryResults.append(onto().search(is_a = onto().ThreePetal_Number))
-                elif petalNumber == 4:
-                    petalNumberQueryResults.append(onto().search(is_a = onto().FourPetal_Number))
-                elif petalNumber == 5:
-                    petalNumberQueryResults.append(onto().search(is_a = onto().FivePetal_Number))
-                    
-            if len(petalNumberQueryResults) > 0:
-                print("Petal number:")
-                print(petalNumber)
-                
-                print("Flowers retrieved from ontology by petal number:")
-                printFlowerList(petalNumberQueryResults)
-                print()
-        
-        '''
-        if usedPlantEnvironment is False:
-            
-            plantEnvironment = checkPlantEnvironment(plantSents)
-            plantEnvironmentQueryResults = []
-            if ("creeping") in plantEnvironment:
-                plantEnvironmentQueryResults.append(onto().search(is_a = onto().Land_Creeping))
-            if ("erect") in plantEnvironment:
-                plantEnvironmentQueryResults.append(onto().search(is_a = onto().Land_Erect))
-            
-            if len(plantEnvironmentQueryResults) > 0:
-                
-                print("Plant environment:")
-                print(plantEnvironment)
-                
-                print("Flowers retrieved from ontology by plant environment:")
-                printFlowerList(plantEnvironmentQueryResults)
-                print()
-        
-        '''
-        if usedPlantSize is False:
-            
-            plantSize = checkPlantSize(plantSents)
-            
-            
-            plantSizeQueryResults = []
-            if plantSize:
-                plantSize = float(plantSize[0])
-                if plantSize <= 200:
-                    if plantSize <= 10:
-                        plantSizeQueryResults.append(onto().search(is_a = onto().TenWildflower_MaxSizeInCM))
-                    
-                    if plantSize <= 30:
-                        plantSizeQueryResults.append(onto().search(is_a = onto().ThirtyWildflower_MaxSizeInCM))
-                    
-                    if plantSize <= 50:
-                        plantSizeQueryResults.append(onto().search(is_a = onto().FiftyWildflower_MaxSizeInCM))
-                    
-                    
-                    if plantSize <= 70:
-                        plantSizeQueryResults.append(onto().search(is_a = onto().SeventyWildflower_MaxSizeInCM))
-                    
-                    
-                    if plantSize <= 100:
-                        plantSizeQueryResults.append(onto().search(is_a = onto().OneHundredWildflower_MaxSizeInCM))
-                    if plantSize <= 200:
-                        plantSizeQueryResults.append(onto().search(is_a = onto().TwoHundredWildflower_MaxSizeInCM))
-                        
-                if plantSize >= 1:
-                    if plantSize >= 1:
-                        plantSizeQueryResults.append(onto().search(is_a = onto().OneWildflower_MinSizeInCM))
-                    
-                    if plantSize >= 10:
-                        plantSizeQueryResults.append(onto().search(is_a = onto().TenWildflower_MinSizeInCM))
-                    
-                    if plantSize >= 30:
-                        plantSizeQueryResults.append(onto().search(is_a = onto().ThirtyWildflower_MinSizeInCM))
-                    
-                    if plantSize >= 100:
-                        plantSizeQueryResults.append(onto().search(is_a = onto().OneHundredWildflower_MinSizeInCM))
-                                   
-            if len(plantSizeQueryResults) > 0:
-                print("Plant size in cm:")
-                print(plantSize)
-                
-                print("Flowers retrieved from ontology by plant size:")
-                printFlowerList(plantSizeQueryResults)
-                print()
-        
-        if len(possibilitiesIn) < 1:
-            wildflowers = onto().search(is_a = onto().Wildflower)
-            print(wildflowers)
-            listOfResults = []
-            listOfResults.append(wildflowers)
-            outputSet = listOfResults[0]
-            possibilitiesIn = outputSet
-            possibilitiesOut = []
-        
-        if colorQueryResults and not usedColor:
-            usedColor = True
-            tempList = []
-            print(tempList)
-            if any(isinstance(i, list) for i in colorQueryResults):
-                tempList = [item for sublist in colorQueryResults for item in sublist]
-            else:
-                tempList = colorQueryResults   
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering flower color:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()
-                
-        if clusterQueryResults and not usedCluster:
-            usedCluster = True
-            tempList = []
-            if any(isinstance(i, list) for i in clusterQueryResults):
-                tempList = [item for sublist in clusterQueryResults for item in sublist]
-            else:
-                tempList = clusterQueryResults
-            
-            
-            print(tempList)    
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering cluster type:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()
-            
-            
-                
-        if positionQueryResults and not usedPosition:
-            usedPosition = True
-            tempList = []
-            if any(isinstance(i, list) for i in positionQueryResults):
-                tempList = [item for sublist in positionQueryResults for item in sublist]
-            else:
-                tempList = positionQueryResults
-            
-            print(tempList)    
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering flower position:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()
-            
-        
-        
-        if shapeQueryResults and not usedFlowerShape:
-            usedFlowerShape = True
-            tempList = []
-            if any(isinstance(i, list) for i in shapeQueryResults):
-                tempList = [item for sublist in shapeQueryResults for item in sublist]
-            else:
-                tempList = shapeQueryResults
-            
-            print(tempList)    
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering flower shape:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()  
-        
-        
-        if symmetryQueryResults and not usedFlowerSymmetry:
-            
-            usedFlowerSymmetry = True
-            tempList = []
-            if any(isinstance(i, list) for i in symmetryQueryResults):
-                tempList = [item for sublist in symmetryQueryResults for item in sublist]
-            else:
-                tempList = symmetryQueryResults
-            print(tempList)    
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering flower symmetry:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()
-        
-        
-        if leafArrangementQueryResults and not usedLeafArrangement:
-            
-            usedLeafArrangement = True
-            tempList = []
-            if any(isinstance(i, list) for i in leafArrangementQueryResults):
-                tempList = [item for sublist in leafArrangementQueryResults for item in sublist]
-            else:
-                tempList = leafArrangementQueryResults
-            print(tempList)    
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering leaf arrangement:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()
-        
-        
-        if leafDivisionQueryResults and not usedLeafDivision:
-            
-            usedLeafDivision = True
-            tempList = []
-            if any(isinstance(i, list) for i in leafDivisionQueryResults):
-                tempList = [item for sublist in leafDivisionQueryResults for item in sublist]
-            else:
-                tempList = leafDivisionQueryResults
-            print(tempList)    
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering leaf division:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()
-        
-        
-        if leafMarginQueryResults and not usedLeafMargin:
-            
-            usedLeafMargin = True
-            tempList = []
-            if any(isinstance(i, list) for i in leafMarginQueryResults):
-                tempList = [item for sublist in leafMarginQueryResults for item in sublist]
-            else:
-                tempList = leafMarginQueryResults
-            print(tempList)    
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering leaf margin:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()
-        
-        
-        if leafLengthQueryResults and not usedLeafLength:
-            
-            usedLeafLength = True
-            tempList = []
-            if any(isinstance(i, list) for i in leafLengthQueryResults):
-                tempList = [item for sublist in leafLengthQueryResults for item in sublist]
-            else:
-                tempList = leafLengthQueryResults
-            print(tempList)    
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering leaf length:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()
-        
-        
-        if leafShapeQueryResults and not usedLeafShape:
+        command = userText.strip().lower()
+        if command == "undo":
+            result = undo(session)
+        elif command.startswith("retract ") and command[len("retract "):].strip() in retractNames:
+            result = retract(session, retractNames[command[len("retract "):].strip()])
+        else:
+            result = identify(userText, session, answering)
+        session = result.session
+        answering = result.nextAttribute
 
-            usedLeafShape = True
-            tempList = []
-            if any(isinstance(i, list) for i in leafShapeQueryResults):
-                tempList = [item for sublist in leafShapeQueryResults for item in sublist]
-            else:
-                tempList = leafShapeQueryResults
-            print(tempList)   
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering leaf shape:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
+        for name, matched, remaining in result.steps:
+            label = labels[name]
+            print(label[0].upper() + label[1:] + ":")
+            print(result.traits[name])
+            print("Flowers retrieved from ontology by " + label + ":")
+            printFlowerList(matched)
+            print("Current list of possibilities after considering " + label + ":")
+            printFlowerList(remaining)
             print()
-        
-        
-        if petalLengthQueryResults and not usedPetalLength:
 
-            usedPetalLength = True                
-            tempList = []
-            if any(isinstance(i, list) for i in petalLengthQueryResults):
-                tempList = [item for sublist in petalLengthQueryResults for item in sublist]
-            else:
-                tempList = petalLengthQueryResults
-            print(tempList)    
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering petal length:")
-            printFlowerList(possibilitiesOut)
-            print(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()
-        
-        
-        if petalNumberQueryResults and not usedPetalNumber:
-            
-            usedPetalNumber = True                
-            tempList = []
-            if any(isinstance(i, list) for i in petalNumberQueryResults):
-                tempList = [item for sublist in petalNumberQueryResults for item in sublist]
-            else:
-                tempList = petalNumberQueryResults
-            print(tempList)    
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering petal number:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()
-        
-        '''
-        if plantEnvironmentQueryResults and not usedPlantEnvironment:
-            
-            usedPlantEnvironment = True
-            tempList = []
-            if any(isinstance(i, list) for i in plantEnvironmentQueryResults):
-                tempList = [item for sublist in plantEnvironmentQueryResults for item in sublist]
-            else:
-                tempList = plantEnvironmentQueryResults
-            print(tempList)    
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering plant environment:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()
-        
-        '''
-        if plantSizeQueryResults and not usedPlantSize:
-            
-            usedPlantSize = True    
-            tempList = []
-            if any(isinstance(i, list) for i in plantSizeQueryResults):
-                tempList = [item for sublist in plantSizeQueryResults for item in sublist]
-            else:
-                tempList = plantSizeQueryResults
-            print(tempList)    
-            possibilities = possibilitiesIn
-            possibilitiesOut = []
-            for x in tempList:
-                if x in possibilities:
-                    possibilitiesOut.append(x)
-            print("Current list of possibilities after considering plant size:")
-            printFlowerList(possibilitiesOut)
-            possibilitiesIn = possibilitiesOut
-            print()
-        
-        '''    
-        colorSet = set(colorQueryResults)
-        clusterSet = set(clusterQueryResults)
-        positionSet = set(positionQueryResults)
-        shapeSet = (shapeQueryResults)
-        symmetrySet = (symmetryQueryResults)  
-        leafArrangementSet = set(leafArrangementQueryResults)
-        leafDivisionSet = set(leafDivisionQueryResults)
-        leafMarginSet = set(leafMarginQueryResults)
-        leafLengthSet = set(leafLengthQueryResults)
-        leafShapeSet = set(leafShapeQueryResults)
-        petalLengthSet = set(petalLengthQueryResults)
-        petalNumberSet = set(petalNumberQueryResults)
-        plantEnvironmentSet = set(plantEnvironmentQueryResults)
-        plantSizeSet = set(plantSizeQueryResults)
-        '''
-        guessList = []
-        
-        for x in possibilitiesOut:
-            guessList.append(x)
-        
-        currentPossibilities = possibilitiesIn
-            
         print("------------------------------------------------------------------------------------------")
         print()
         print("Best guess at plant species:")
-        printFlowerList(guessList)
+        printFlowerList(result.guesses)
         print()
         print("------------------------------------------------------------------------------------------")
-        
-        if len(currentPossibilities) > 1:
-            resolved = False
+
+        resolved = result.resolved
+        if not resolved:
             print()
             print("It looks like we don't quite have a match just yet.")
             print("Let's take a look at some additional info that will help us zero in on the correct species.")
-            
-            askQuestions()
+
+            if result.nextQuestion is not None:
+                print(result.nextQuestion)
+            else:
+                print("\nI can't think of any more questions to ask... you should start over!")
             print()
-            
+
         else:
-            resolved = True
-            
-            if len(guessList) > 0:
+            if len(result.guesses) > 0:
                 print("Looks like we found a matching species! Thank you for using this identification system.")
             else:
                 print("There doesn't seem to be a matching species for the combination of characteristics you provided.")
+                if result.ranked:
+                    print("These species come closest (share of your description they agree with):")
+                    for name, score in result.ranked:
+                        print("   " + name.replace("_", " ") + " - " + str(round(score * 100)) + "%")
                 print("Please try identification again.")
-            
-interface()
 
-input('Press ENTER to exit')
+if __name__ == "__main__":
+    interface()
+
+    input('Press ENTER to exit')
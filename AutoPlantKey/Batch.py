@@ -0,0 +1,231 @@
+#Batch identification of many descriptions at once
+#Reads descriptions from a JSONL, CSV or plain text file (or stdin) and writes one JSON result per line,
+#in input order. Descriptions are identified by a pool of worker processes; the ontology index, synonym
+#automaton and sentence tokenizer are loaded once before the workers are forked, so the workers share
+#them copy-on-write instead of each loading its own. Where fork is not available (Windows) the workers
+#are started the default way and each loads them once when it starts
+#Run from this directory: python Batch.py [input] [--format jsonl|csv|text] [--output results.jsonl] [--workers N]
+#
+#Pipeline mode (--stream) reads an unbounded stream, typically stdin, and writes each result as soon as it
+#and every result before it are ready; at most --window records are in flight at a time, so memory stays
+#flat however long the stream runs: producer | python Batch.py --stream | consumer
+#Each record is sent to the workers on its own, so on input that is all there at once pipeline mode has a
+#lower throughput than batch mode; see Benchmarks.py pipeline
+#
+#JSONL lines are objects with a "text" member (or "description") and an optional "id"
+#CSV files need a "text" or "description" column, and may have an "id" column
+#Plain text files hold one description per line
+#Records without an id are numbered from 1 in input order
+
+import argparse
+import collections
+import csv
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import AutoPlantKey
+
+FORMATS = ("jsonl", "csv", "text")
+TEXT_FIELDS = ("text", "description")
+
+
+#Format of an input file from its extension, JSONL for stdin and unknown extensions
+def guessFormat(path):
+    extension = os.path.splitext(path or "")[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension == ".txt":
+        return "text"
+    return "jsonl"
+
+
+#Records of an input stream as (id, text, error) in input order
+def readRecords(stream, inputFormat):
+    if inputFormat == "csv":
+        rows = csv.DictReader(stream)
+        for number, row in enumerate(rows, 1):
+            yield recordFields(row, number)
+        return
+
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if inputFormat == "text":
+            yield number, line, None
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield number, None, "line is not valid JSON"
+            continue
+        if not isinstance(data, dict):
+            yield number, None, "line is not a JSON object"
+            continue
+        yield recordFields(data, number)
+
+
+def recordFields(data, number):
+    recordId = data.get("id") or number
+    for field in TEXT_FIELDS:
+        if isinstance(data.get(field), str) and data[field].strip():
+            return recordId, data[field], None
+    return recordId, None, "record has no \"text\" or \"description\""
+
+
+#Identify one record in a worker process
+def identifyRecord(record):
+    recordId, text, error = record
+    if error is not None:
+        return {"id": recordId, "error": error}
+    try:
+        result = AutoPlantKey.identify(text)
+    except Exception as e:
+        return {"id": recordId, "error": "%s: %s" % (type(e).__name__, e)}
+    return {"id": recordId,
+            "candidates": result.candidates,
+            "guesses": result.guesses,
+            "traits": result.traits,
+            "resolved": result.resolved,
+            "question": " ".join(result.nextQuestion.split()) if result.nextQuestion is not None else None,
+            "questionAttribute": result.nextAttribute,
+            "ranked": [{"species": name, "score": round(score, 4)} for name, score in result.ranked]}
+
+
+#Result line of one record, serialised in the worker so the parent process only writes lines out
+def identifyLine(record):
+    return json.dumps(identifyRecord(record)) + "\n"
+
+
+#Initializer of a worker that is not forked: it starts from a fresh interpreter, so the settings of the
+#parent process are passed in and everything identify() needs is loaded before the first record
+def startWorker(splitter):
+    AutoPlantKey.sentenceSplitter = splitter
+    AutoPlantKey.warmUp()
+
+
+#Pool of workers, forked from this process when the platform can, so they inherit what AutoPlantKey.warmUp()
+#loaded and the sentence splitter selected
+def workerPool(workers):
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork").Pool(workers)
+    return multiprocessing.Pool(workers, initializer=startWorker, initargs=(AutoPlantKey.sentenceSplitter,))
+
+
+#Identify every record of the input and write the results, returns (records, seconds)
+def runBatch(inStream, outStream, inputFormat, workers, chunkSize):
+    AutoPlantKey.warmUp()
+    records = readRecords(inStream, inputFormat)
+    count = 0
+    t0 = time.perf_counter()
+    if workers <= 1:
+        for line in map(identifyLine, records):
+            outStream.write(line)
+            count += 1
+    else:
+        with workerPool(workers) as pool:
+            for line in pool.imap(identifyLine, records, chunkSize):
+                outStream.write(line)
+                count += 1
+    outStream.flush()
+    return count, time.perf_counter() - t0
+
+
+#Pipeline mode: identify records as they arrive with at most window of them in flight, writing and
+#flushing every result in input order, returns (records, seconds)
+#Unlike Pool.imap, which reads ahead as far as the pipe to the workers holds and sends records in chunks that
+#wait for the rest of their records to arrive, records are only read when there is room and are sent at once
+#Results are written from the pool's completion callbacks, so they go out as soon as they are ready even
+#while the main thread is blocked waiting for the next input record
+def runPipeline(inStream, outStream, inputFormat, workers, window):
+    AutoPlantKey.warmUp()
+    records = readRecords(inStream, inputFormat)
+    count = 0
+    t0 = time.perf_counter()
+    if workers <= 1:
+        for record in records:
+            outStream.write(identifyLine(record))
+            outStream.flush()
+            count += 1
+        return count, time.perf_counter() - t0
+
+    #one [result line or None] slot per record in flight, in input order
+    pending = collections.deque()
+    changed = threading.Condition()
+
+    #write out every finished result at the head of the window, called with changed held
+    def drain():
+        nonlocal count
+        written = False
+        while pending and pending[0][0] is not None:
+            outStream.write(pending.popleft()[0])
+            count += 1
+            written = True
+        if written:
+            outStream.flush()
+            changed.notify_all()
+
+    def finished(slot, line):
+        with changed:
+            slot[0] = line
+            drain()
+
+    def failed(slot, recordId, error):
+        finished(slot, json.dumps({"id": recordId, "error": "%s: %s" % (type(error).__name__, error)}) + "\n")
+
+    with workerPool(workers) as pool:
+        for record in records:
+            slot = [None]
+            with changed:
+                #wait only when the window is full
+                while len(pending) >= window:
+                    changed.wait()
+                pending.append(slot)
+            pool.apply_async(identifyLine, (record,), callback=functools.partial(finished, slot),
+                             error_callback=functools.partial(failed, slot, record[0]))
+        with changed:
+            while pending:
+                changed.wait()
+    return count, time.perf_counter() - t0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AutoPlantKey batch identification")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL, CSV or text file, - for stdin")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="input format, from the extension by default")
+    parser.add_argument("--output", default="-", help="JSONL file for the results, - for stdout")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=64, help="records sent to a worker at a time")
+    parser.add_argument("--stream", action="store_true", help="pipeline mode: write results as records arrive")
+    parser.add_argument("--window", type=int, default=256, help="records in flight at a time in pipeline mode")
+    parser.add_argument("--splitter", choices=AutoPlantKey.SPLITTERS, default=AutoPlantKey.sentenceSplitter,
+                        help="how descriptions are split into sentences")
+    args = parser.parse_args(argv)
+    AutoPlantKey.sentenceSplitter = args.splitter
+
+    inputFormat = args.format or guessFormat(None if args.input == "-" else args.input)
+    inStream = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    outStream = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        if args.stream:
+            count, elapsed = runPipeline(inStream, outStream, inputFormat, args.workers, max(1, args.window))
+        else:
+            count, elapsed = runBatch(inStream, outStream, inputFormat, args.workers, args.chunk_size)
+    finally:
+        if inStream is not sys.stdin:
+            inStream.close()
+        if outStream is not sys.stdout:
+            outStream.close()
+
+    print("%d records in %.2f s with %d workers: %.0f records/s"
+          % (count, elapsed, max(1, args.workers), count / elapsed if elapsed else 0.0), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,924 @@
+#Performance benchmarks for the plant identification system
+#Run from this directory: python Benchmarks.py <benchmark> [options]
+#Each benchmark prints its measurements and exits non-zero when it is over its budget
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+#Budgets for a cold start of the identification core in a fresh interpreter
+#import - "import AutoPlantKey", must not pull in owlready2 / nltk
+#ready - import plus loading the compiled ontology index from its snapshot
+IMPORT_BUDGET_MS = 25
+READY_BUDGET_MS = 50
+
+#Script run in a fresh interpreter for every import-time sample
+IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import AutoPlantKey
+t1 = time.perf_counter()
+AutoPlantKey.getIndex()
+t2 = time.perf_counter()
+heavy = sorted(m for m in ("owlready2", "nltk") if m in sys.modules)
+print(json.dumps({"importMs": (t1 - t0) * 1000, "readyMs": (t2 - t0) * 1000, "heavy": heavy}))
+"""
+
+
+#Time cold imports of AutoPlantKey, each in a new interpreter so nothing is already in sys.modules
+#The first run is a warm-up that writes the bytecode cache and ontology snapshot
+def benchImportTime(args):
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    samples = []
+    for i in range(args.runs + 1):
+        out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=HERE, env=env,
+                             check=True, capture_output=True, text=True).stdout
+        if i > 0:
+            samples.append(json.loads(out.strip().splitlines()[-1]))
+
+    importMs = statistics.median(s["importMs"] for s in samples)
+    readyMs = statistics.median(s["readyMs"] for s in samples)
+    heavy = sorted(set(m for s in samples for m in s["heavy"]))
+
+    print("cold import of AutoPlantKey: median %.1f ms (budget %d ms)" % (importMs, args.import_budget))
+    print("import + compiled index:     median %.1f ms (budget %d ms)" % (readyMs, args.ready_budget))
+
+    failed = False
+    if heavy:
+        print("FAIL: heavy dependencies imported eagerly: " + ", ".join(heavy))
+        failed = True
+    if importMs > args.import_budget:
+        print("FAIL: import time over budget")
+        failed = True
+    if readyMs > args.ready_budget:
+        print("FAIL: start-up time over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+#Per-session memory cost: allocate many live sessions against one shared index
+#Every session is built turn by turn like identify() builds it: each turn applies one or two unused
+#attributes (none once all are used), adding their answer bitsets (shared, like the memoised lookups) to the constraints and narrowing the
+#candidates, and links the session of the previous turn for undo, so the cost includes the undo chain
+def benchSessions(args):
+    import AutoPlantKey
+
+    index = AutoPlantKey.getIndex()
+    answers = AutoPlantKey.getAnswers()
+    names = [attribute[0] for attribute in AutoPlantKey.attributes]
+    rng = random.Random(args.seed)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    sessions = {}
+    for i in range(args.sessions):
+        session = AutoPlantKey.Session()
+        candidates = index.allSpecies
+        for turn in range(args.turns):
+            constraints = session.constraints
+            used = session.used
+            unused = [name for name in names if not used & AutoPlantKey.attributeBits[name]]
+            for name in rng.sample(unused, min(len(unused), rng.randint(1, 2))):
+                matched = rng.choice(answers[name])
+                constraints = constraints + ((name, matched),)
+                used |= AutoPlantKey.attributeBits[name]
+                candidates &= matched
+            session = AutoPlantKey.Session(candidates, candidates, used, constraints, session)
+        sessions[i] = session
+    elapsed = time.perf_counter() - t0
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    perSession = (after - before) / args.sessions
+    print("%d sessions of %d turns over %d species (undo depth %d): %.1f bytes/session including the session "
+          "table, %.2f us per turn" % (args.sessions, args.turns, len(index.species), AutoPlantKey.UNDO_DEPTH,
+                                       perSession, elapsed / args.sessions / max(1, args.turns) * 1e6))
+    if perSession > args.budget:
+        print("FAIL: per-session memory over budget of %d bytes" % args.budget)
+        return 1
+    return 0
+
+
+#Per-character cost of the measurement extractor over batches of growing descriptions
+#The cost per character should stay flat as descriptions get longer
+def benchMeasurements(args):
+    from Measurements import extractBatch
+
+    sentence = ("Leaves opposite, about 2.5 to 4 cm long; petals four mm, white. "
+                "The plant is one hundred and twenty centimeters tall, stems 2 ft. ")
+    print("%10s %12s %14s" % ("chars", "us/text", "ns/char"))
+    for repeat in (1, 4, 16, 64):
+        texts = [sentence * repeat] * args.batch
+        t0 = time.perf_counter()
+        extractBatch(texts)
+        elapsed = time.perf_counter() - t0
+        chars = len(texts[0])
+        print("%10d %12.1f %14.1f" % (chars, elapsed / args.batch * 1e6, elapsed / (args.batch * chars) * 1e9))
+    return 0
+
+
+#Play one identification of a species by answering every question truthfully, starting from no description
+#chooser(used, candidates) picks the attribute to ask; the simulated user gives the first answer that
+#applies to the species, or an answer that matches nothing in the ontology if none does
+#Returns the number of questions asked and whether the species was singled out
+def simulateTurns(AutoPlantKey, speciesBit, chooser):
+    index = AutoPlantKey.getIndex()
+    answers = AutoPlantKey.getAnswers()
+    candidates = index.allSpecies
+    used = 0
+    turns = 0
+    while index.count(candidates) > 1:
+        attribute = chooser(used, candidates)
+        if attribute is None:
+            break
+        turns += 1
+        used |= AutoPlantKey.attributeBits[attribute]
+        for bits in answers[attribute]:
+            if bits & speciesBit:
+                candidates &= bits
+                break
+    return turns, candidates == speciesBit
+
+
+#Turns to resolution for every species of the ontology: fixed question order, the information-gain
+#scheduler and the compiled dichotomous key (which falls back to the scheduler off the key)
+def benchTurns(args):
+    import AutoPlantKey
+
+    index = AutoPlantKey.getIndex()
+    choosers = [("fixed order", lambda used, candidates: AutoPlantKey.fixedQuestionAttribute(used)),
+                ("information gain", AutoPlantKey.nextQuestionAttribute),
+                ("dichotomous key", AutoPlantKey.plannedQuestionAttribute)]
+    print("%-18s %8s %8s %10s %12s" % ("scheduler", "mean", "worst", "resolved", "us/question"))
+    results = {}
+    for name, chooser in choosers:
+        t0 = time.perf_counter()
+        played = [simulateTurns(AutoPlantKey, 1 << i, chooser) for i in range(len(index.species))]
+        elapsed = time.perf_counter() - t0
+        turns = [t for t, resolved in played]
+        results[name] = statistics.mean(turns)
+        print("%-18s %8.2f %8d %6d/%-3d %12.1f" % (name, statistics.mean(turns), max(turns),
+                                                  sum(resolved for t, resolved in played), len(played),
+                                                  elapsed / max(1, sum(turns)) * 1e6))
+    key = AutoPlantKey.compileOntologyKey()
+    print("dichotomous key: depth %d, %d nodes, compiled in %.1f ms"
+          % (key.depth(), key.nodeCount(), key.buildSeconds * 1000))
+    if results["information gain"] > results["fixed order"]:
+        print("FAIL: the scheduler needs more turns than the fixed order")
+        return 1
+    return 0
+
+
+#Ranking cost over synthetic floras: one species x trait matrix-vector product per description
+#Each synthetic species gets a random set of traits; the description names a handful of them
+def benchScoring(args):
+    from TraitIndex import TraitIndex
+    from TraitMatrix import TraitMatrix
+
+    rng = random.Random(args.seed)
+    traitNames = ["Trait%d" % i for i in range(args.traits)]
+    print("%10s %8s %12s %12s" % ("species", "traits", "build ms", "us/rank"))
+    for speciesCount in args.species:
+        traitBits = {name: rng.getrandbits(speciesCount) for name in traitNames}
+        index = TraitIndex(["Species%d" % i for i in range(speciesCount)], traitBits)
+        t0 = time.perf_counter()
+        matrix = TraitMatrix(index)
+        built = time.perf_counter() - t0
+
+        queries = [{name: 1.0 for name in rng.sample(traitNames, 6)} for i in range(args.queries)]
+        t0 = time.perf_counter()
+        for query in queries:
+            matrix.top(query, args.k)
+        elapsed = time.perf_counter() - t0
+        print("%10d %8d %12.1f %12.1f" % (speciesCount, args.traits, built * 1000, elapsed / args.queries * 1e6))
+    return 0
+
+
+#Cost of one narrowing step as the flora grows, for three candidate representations:
+#list - the original interface() loop: flatten the query results of every matched value (a species once per
+#matching synonym) into a list and keep those that are "in" the list of possibilities
+#frozenset - frozensets of interned species IDs
+#bitset - integer bitsets, as used by the trait index and sessions
+#Each step narrows half of the flora by the union of the species of three matched values
+def benchCandidates(args):
+    from Bitsets import bitsetOf, popcount
+
+    rng = random.Random(args.seed)
+    print("%10s %14s %14s %14s" % ("species", "list us", "frozenset us", "bitset us"))
+    for speciesCount in args.species:
+        names = ["Species%d" % i for i in range(speciesCount)]
+        possibleIds = rng.sample(range(speciesCount), speciesCount // 2)
+        valueIds = [rng.sample(range(speciesCount), max(1, speciesCount // 4)) for i in range(3)]
+
+        possibleNames = [names[i] for i in possibleIds]
+        valueNames = [[names[i] for i in ids] for ids in valueIds]
+        possibleSet = frozenset(possibleIds)
+        valueSets = [frozenset(ids) for ids in valueIds]
+        possibleBits = bitsetOf(possibleIds)
+        valueBits = [bitsetOf(ids) for ids in valueIds]
+
+        def narrowList():
+            tempList = []
+            for found in valueNames:
+                tempList.extend(found)
+            return [x for x in tempList if x in possibleNames]
+
+        def narrowFrozenset():
+            matched = frozenset()
+            for found in valueSets:
+                matched = matched | found
+            return possibleSet & matched
+
+        def narrowBitset():
+            matched = 0
+            for found in valueBits:
+                matched |= found
+            return possibleBits & matched
+
+        timings = []
+        for name, narrow in (("list", narrowList), ("frozenset", narrowFrozenset), ("bitset", narrowBitset)):
+            if name == "list" and speciesCount > args.list_max:
+                timings.append(None)
+                continue
+            #repeat until the time budget is spent, so the quadratic list approach stays bearable
+            repeats = 0
+            t0 = time.perf_counter()
+            while repeats < args.repeats and (repeats == 0 or time.perf_counter() - t0 < args.seconds):
+                narrow()
+                repeats += 1
+            timings.append((time.perf_counter() - t0) / repeats * 1e6)
+
+        if len(narrowFrozenset()) != popcount(narrowBitset()):
+            print("FAIL: frozenset and bitset narrowing disagree")
+            return 1
+        print("%10d %14s %14.1f %14.1f" % (speciesCount, "%.1f" % timings[0] if timings[0] is not None else "skipped",
+                                           timings[1], timings[2]))
+    return 0
+
+
+#Work the query planner of identify() does and skips over a set of descriptions
+def benchPlanner(args):
+    import AutoPlantKey
+
+    AutoPlantKey.getKey()
+    AutoPlantKey.normalizeSentences("Warm up.")
+    texts = LOAD_DESCRIPTIONS + PLANNER_DESCRIPTIONS
+    t0 = time.perf_counter()
+    for i in range(args.repeats):
+        for text in texts:
+            AutoPlantKey.identify(text)
+    elapsed = time.perf_counter() - t0
+
+    counters = AutoPlantKey.plannerCounters
+    runs = args.repeats * len(texts)
+    queries = counters["queries"] + counters["queriesSkipped"]
+    print("%d descriptions, %.1f us each" % (runs, elapsed / runs * 1e6))
+    print("queries:    %d made, %d skipped (%.0f%%)" % (counters["queries"], counters["queriesSkipped"],
+                                                       100.0 * counters["queriesSkipped"] / max(1, queries)))
+    print("extractors: %d called" % counters["extractorCalls"])
+    return 0
+
+
+#Per-turn cost of identify() as a session grows and as the new text of a turn grows
+#Turns add sentences that mention no attribute, so every attribute stays unused and the session never resolves;
+#the cost of a turn should depend only on the length of its own text
+def benchIncremental(args):
+    import AutoPlantKey
+
+    AutoPlantKey.getKey()
+    AutoPlantKey.normalizeSentences("Warm up.")
+    filler = "The plant was found near the river in late summer. "
+
+    print("%8s %12s" % ("turn", "us/turn"))
+    session = AutoPlantKey.identify("Small white flowers.").session
+    timings = []
+    for turn in range(1, args.turns + 1):
+        t0 = time.perf_counter()
+        for i in range(args.repeats):
+            result = AutoPlantKey.identify(filler, session, "color")
+        timings.append((time.perf_counter() - t0) / args.repeats)
+        session = result.session
+        if turn in (1, 10, 100) or turn == args.turns:
+            print("%8d %12.1f" % (turn, timings[-1] * 1e6))
+
+    print("%8s %12s %12s" % ("sentences", "us/turn", "us/sentence"))
+    for sentenceCount in (1, 4, 16, 64):
+        text = filler * sentenceCount
+        t0 = time.perf_counter()
+        for i in range(args.repeats):
+            AutoPlantKey.identify(text, session)
+        elapsed = (time.perf_counter() - t0) / args.repeats
+        print("%8d %12.1f %12.1f" % (sentenceCount, elapsed * 1e6, elapsed / sentenceCount * 1e6))
+    return 0
+
+
+#Description and sentence cache hit rates on traffic with repeated and near-identical descriptions
+#Descriptions are drawn with a skew from a pool built from the sample sentences, and about half of them get a
+#sentence of their own (a unique note) added so only the sentence cache can serve them in full
+def benchCache(args):
+    import AutoPlantKey
+
+    rng = random.Random(args.seed)
+    AutoPlantKey.getKey()
+    AutoPlantKey.normalizeSentences("Warm up.")
+    sentences = [s.strip() + "." for text in LOAD_DESCRIPTIONS + PLANNER_DESCRIPTIONS for s in text.split(".") if s.strip()]
+    pool = [" ".join(rng.sample(sentences, rng.randint(1, 3))) for i in range(args.pool)]
+    weights = [1.0 / (i + 1) for i in range(len(pool))]
+    traffic = []
+    for i in range(args.requests):
+        text = rng.choices(pool, weights)[0]
+        if rng.random() < 0.5:
+            text += " Seen on plot %d." % i
+        traffic.append(text)
+
+    print("%-10s %12s %16s %14s" % ("caches", "us/request", "description hit", "sentence hit"))
+    timings = {}
+    for label, size in (("disabled", 0), ("enabled", None)):
+        AutoPlantKey.descriptionCache = AutoPlantKey.LruCache(size if size is not None else AutoPlantKey.DESCRIPTION_CACHE_SIZE,
+                                                             AutoPlantKey.CACHE_TTL)
+        AutoPlantKey.sentenceCache = AutoPlantKey.LruCache(size if size is not None else AutoPlantKey.SENTENCE_CACHE_SIZE,
+                                                          AutoPlantKey.CACHE_TTL)
+        t0 = time.perf_counter()
+        for text in traffic:
+            AutoPlantKey.identify(text)
+        timings[label] = (time.perf_counter() - t0) / len(traffic)
+        stats = AutoPlantKey.cacheStats()
+        print("%-10s %12.1f %15.1f%% %13.1f%%" % (label, timings[label] * 1e6, stats["descriptions"]["hitRate"] * 100,
+                                                   stats["sentences"]["hitRate"] * 100))
+    print("speed-up: %.2fx" % (timings["disabled"] / timings["enabled"]))
+    return 0
+
+
+#Budgets for the synthetic corpus: p95 of identify() with the caches disabled, and the share of descriptions
+#whose species is still among the candidates
+SYNTHETIC_P95_BUDGET_MS = 2.0
+SYNTHETIC_ACCURACY_BUDGET = 0.8
+
+#Stages of the pipeline timed by the synthetic benchmark, in the order they run
+SYNTHETIC_STAGES = ["tokenize", "normalize", "tag", "extractors", "narrowing", "identify"]
+
+
+#The whole pipeline over a synthetic corpus generated from the ontology, see SyntheticDescriptions.py
+#Each description is taken through the stages one after another: sentence splitting, normalisation, tagging
+#of organs and synonyms, the extractors of the organs each sentence mentions, and narrowing - identify()
+#with everything before it cached, which leaves the planner, the ontology queries and the next question.
+#identify() is also timed end to end with both caches disabled, for the throughput and the accuracy
+def benchSynthetic(args):
+    import AutoPlantKey
+    from SyntheticDescriptions import generateDescriptions
+
+    AutoPlantKey.getKey()
+    AutoPlantKey.normalizeSentences("Warm up.")
+    AutoPlantKey.getMatcher()
+    corpus = list(generateDescriptions(None, args.per_species, args.seed))
+    savedCaches = (AutoPlantKey.descriptionCache, AutoPlantKey.sentenceCache)
+    timings = {stage: [] for stage in SYNTHETIC_STAGES}
+    found = exact = empty = 0
+    clock = time.perf_counter
+    try:
+        for record in corpus:
+            text = record["text"]
+            t0 = clock()
+            sents = AutoPlantKey.sentTokenize(text)
+            t1 = clock()
+            sents = [AutoPlantKey.normalizeSentence(sent) for sent in sents]
+            t2 = clock()
+            facts = [AutoPlantKey.tagSentence(sent) for sent in sents]
+            t3 = clock()
+            for sent, (groups, hits, organs) in zip(sents, facts):
+                for name in AutoPlantKey.sentenceReaders(groups):
+                    if name not in AutoPlantKey.synonyms:
+                        AutoPlantKey.extractOutput(sent, name, organs)
+            t4 = clock()
+            for stage, elapsed in zip(SYNTHETIC_STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3)):
+                timings[stage].append(elapsed)
+
+            AutoPlantKey.descriptionCache = AutoPlantKey.LruCache(AutoPlantKey.DESCRIPTION_CACHE_SIZE)
+            AutoPlantKey.sentenceCache = AutoPlantKey.LruCache(AutoPlantKey.SENTENCE_CACHE_SIZE)
+            AutoPlantKey.identify(text)
+            t0 = clock()
+            AutoPlantKey.identify(text)
+            timings["narrowing"].append(clock() - t0)
+
+            AutoPlantKey.descriptionCache = AutoPlantKey.LruCache(0)
+            AutoPlantKey.sentenceCache = AutoPlantKey.LruCache(0)
+            t0 = clock()
+            result = AutoPlantKey.identify(text)
+            timings["identify"].append(clock() - t0)
+            found += record["species"] in result.candidates
+            exact += result.candidates == [record["species"]]
+            empty += not result.candidates
+    finally:
+        AutoPlantKey.descriptionCache, AutoPlantKey.sentenceCache = savedCaches
+
+    total = sum(timings["identify"])
+    print("%d descriptions of %d species: %.0f descriptions/s end to end, caches disabled"
+          % (len(corpus), len(AutoPlantKey.getIndex().species), len(corpus) / total if total else 0.0))
+    print("%-12s %10s %10s %10s" % ("stage", "p50 us", "p95 us", "p99 us"))
+    for stage in SYNTHETIC_STAGES:
+        values = sorted(timings[stage])
+        print("%-12s %10.1f %10.1f %10.1f" % (stage, percentile(values, 0.5) * 1e6, percentile(values, 0.95) * 1e6,
+                                             percentile(values, 0.99) * 1e6))
+    count = max(1, len(corpus))
+    print("species among the candidates: %.1f%%, singled out: %.1f%%, no candidates: %.1f%%"
+          % (100.0 * found / count, 100.0 * exact / count, 100.0 * empty / count))
+
+    failed = False
+    p95 = percentile(sorted(timings["identify"]), 0.95) * 1000
+    if p95 > args.p95_budget:
+        print("FAIL: identify() p95 of %.2f ms over budget of %.2f ms" % (p95, args.p95_budget))
+        failed = True
+    if found / count < args.min_accuracy:
+        print("FAIL: accuracy under budget of %.1f%%" % (args.min_accuracy * 100))
+        failed = True
+    return 1 if failed else 0
+
+
+#Where the time of identify() goes on the synthetic corpus, from the spans and counters of AutoPlantKey.tracing()
+#The corpus is identified with and without tracing (caches disabled both times) to show what tracing costs,
+#and with --profile the traced run is also profiled with cProfile
+def benchTrace(args):
+    import cProfile
+    import pstats
+    import AutoPlantKey
+    from SyntheticDescriptions import generateDescriptions
+
+    AutoPlantKey.getKey()
+    AutoPlantKey.normalizeSentences("Warm up.")
+    texts = [record["text"] for record in generateDescriptions(None, args.per_species, args.seed)]
+    savedCaches = (AutoPlantKey.descriptionCache, AutoPlantKey.sentenceCache)
+    AutoPlantKey.descriptionCache = AutoPlantKey.LruCache(0)
+    AutoPlantKey.sentenceCache = AutoPlantKey.LruCache(0)
+    profiler = cProfile.Profile() if args.profile else None
+    try:
+        t0 = time.perf_counter()
+        for text in texts:
+            AutoPlantKey.identify(text)
+        untraced = time.perf_counter() - t0
+        with AutoPlantKey.tracing(profiler=profiler) as tracer:
+            t0 = time.perf_counter()
+            for text in texts:
+                AutoPlantKey.identify(text)
+            traced = time.perf_counter() - t0
+    finally:
+        AutoPlantKey.descriptionCache, AutoPlantKey.sentenceCache = savedCaches
+
+    print(tracer.report())
+    print()
+    print("%d descriptions: %.1f us each untraced, %.1f us traced%s"
+          % (len(texts), untraced / len(texts) * 1e6, traced / len(texts) * 1e6,
+             " and profiled" if profiler is not None else ""))
+    if profiler is not None:
+        print()
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(args.profile)
+    return 0
+
+
+#Budget for recording one event in the always-on metrics, in microseconds
+METRICS_BUDGET_US = 1.0
+
+
+#Cost of the always-on metrics: recording one identify() call (latency histogram, empty-result and attribute
+#hit counters), recording one resolution (turns histogram), and rendering the Prometheus text and JSON
+def benchMetrics(args):
+    import AutoPlantKey
+    from Metrics import Metrics
+
+    AutoPlantKey.getKey()
+    AutoPlantKey.normalizeSentences("Warm up.")
+    results = [AutoPlantKey.identify(text) for text in LOAD_DESCRIPTIONS + PLANNER_DESCRIPTIONS]
+    metrics = Metrics(AutoPlantKey.attributeBits)
+    rng = random.Random(args.seed)
+    latencies = [rng.uniform(0.00005, 0.05) for i in range(1024)]
+    events = [(latencies[i % len(latencies)], results[i % len(results)]) for i in range(args.events)]
+
+    t0 = time.perf_counter()
+    for seconds, result in events:
+        metrics.recordIdentify(seconds, result)
+    identifyUs = (time.perf_counter() - t0) / args.events * 1e6
+    t0 = time.perf_counter()
+    for i in range(args.events):
+        metrics.recordResolution(i % 12 + 1)
+    resolutionUs = (time.perf_counter() - t0) / args.events * 1e6
+    t0 = time.perf_counter()
+    text = metrics.prometheusText(AutoPlantKey.cacheStats())
+    textMs = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    json.dumps(metrics.snapshot(AutoPlantKey.cacheStats()))
+    jsonMs = (time.perf_counter() - t0) * 1000
+
+    print("record identify():   %.3f us/event (budget %.1f us)" % (identifyUs, args.budget))
+    print("record resolution:   %.3f us/event" % resolutionUs)
+    print("Prometheus text:     %.2f ms, %d lines" % (textMs, text.count("\n")))
+    print("JSON snapshot:       %.2f ms" % jsonMs)
+    if max(identifyUs, resolutionUs) > args.budget:
+        print("FAIL: recording an event over budget")
+        return 1
+    return 0
+
+
+#Sentence splitters on the synthetic corpus: the rule-based splitter against NLTK punkt
+#Reports descriptions split per second by each, the share of descriptions both split into the same sentences,
+#and the share of descriptions whose species stays among the candidates when identify() uses each splitter
+#punkt needs the nltk "punkt" data; without it only the rule-based splitter is measured
+def benchSplitter(args):
+    import AutoPlantKey
+    from SentenceSplitter import splitSentences
+    from SyntheticDescriptions import generateDescriptions
+
+    corpus = list(generateDescriptions(None, args.per_species, args.seed))
+    texts = [record["text"] for record in corpus]
+    splitters = [("rules", splitSentences)]
+    try:
+        from nltk.tokenize import sent_tokenize
+        sent_tokenize("Load the model. Then split.")
+        splitters.append(("nltk", sent_tokenize))
+    except (ImportError, LookupError) as e:
+        print("NLTK punkt unavailable (%s), measuring the rule-based splitter only" % type(e).__name__)
+
+    AutoPlantKey.getKey()
+    savedSplitter = AutoPlantKey.sentenceSplitter
+    print("%-8s %16s %12s" % ("splitter", "descriptions/s", "accuracy"))
+    splits = {}
+    try:
+        for name, split in splitters:
+            t0 = time.perf_counter()
+            for i in range(args.repeats):
+                splits[name] = [split(text) for text in texts]
+            elapsed = (time.perf_counter() - t0) / args.repeats
+            AutoPlantKey.sentenceSplitter = name
+            found = sum(record["species"] in AutoPlantKey.identify(record["text"]).candidates for record in corpus)
+            print("%-8s %16.0f %11.1f%%" % (name, len(texts) / elapsed, 100.0 * found / len(corpus)))
+    finally:
+        AutoPlantKey.sentenceSplitter = savedSplitter
+
+    if "nltk" in splits:
+        differ = [(text, rules, punkt) for text, rules, punkt in zip(texts, splits["rules"], splits["nltk"]) if rules != punkt]
+        print("agreement with punkt: %.1f%% of %d descriptions" % (100.0 * (1 - len(differ) / len(texts)), len(texts)))
+        for text, rules, punkt in differ[:args.show]:
+            print("  rules: %s" % rules)
+            print("  punkt: %s" % punkt)
+    return 0
+
+
+#Longer descriptions mentioning many attributes, for the planner benchmark
+PLANNER_DESCRIPTIONS = ["Purple flowers. Leaves whorled and hairy, 3 cm long. Plant 150 cm tall.",
+                        "White flowers with 4 petals, petals 3 mm long. Leaves in whorls of six, linear, 2 cm. "
+                        "The plant is 50 cm tall.",
+                        "Loose clusters of yellow bell shaped flowers at the tip. Leaves opposite, lance shaped."]
+
+
+#Descriptions the load generator sends, one per session, followed by answers to its questions
+LOAD_DESCRIPTIONS = ["The flowers are white and clustered loosely. The leaves are whorled.",
+                     "Small blue flowers on top of the stem. Leaves opposite and ovate.",
+                     "Yellow flowers in a spike. Whorled leaves about 3 cm long.",
+                     "The plant is about 20 cm tall. Flowers pink, bell shaped.",
+                     "Leaves 8 cm long with a hairy margin. White flowers at the tip."]
+LOAD_ANSWERS = ["white", "loose", "apical", "3 cm", "bell", "linear", "radial", "4 mm", "4 petals",
+                "whorled", "simple", "hairy", "30 cm"]
+
+
+def percentile(sortedValues, fraction):
+    if not sortedValues:
+        return 0.0
+    return sortedValues[min(len(sortedValues) - 1, int(fraction * len(sortedValues)))]
+
+
+#One keep-alive HTTP/1.1 connection sending JSON requests
+class HttpClient:
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, payload=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.writer.write(("%s %s HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\n"
+                           "Content-Length: %d\r\n\r\n" % (method, path, self.host, len(body))).encode("latin-1") + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        data = await self.reader.readexactly(length)
+        return status, json.loads(data) if data else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+#A simulated user: start a session with a description, then answer questions until resolved
+async def loadWorker(host, port, deadline, rng, latencies, errors, maxTurns):
+    client = HttpClient(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            status, data = await client.request("POST", "/sessions", {"text": rng.choice(LOAD_DESCRIPTIONS)})
+            latencies.append(time.perf_counter() - t0)
+            if status != 201:
+                errors.append(status)
+                continue
+            sessionId = data["session"]
+            turns = 0
+            while not data.get("resolved") and data.get("question") and turns < maxTurns:
+                t0 = time.perf_counter()
+                status, data = await client.request("POST", "/sessions/%s/answer" % sessionId,
+                                                    {"text": rng.choice(LOAD_ANSWERS)})
+                latencies.append(time.perf_counter() - t0)
+                turns += 1
+                if status != 200:
+                    errors.append(status)
+                    break
+            await client.request("DELETE", "/sessions/" + sessionId)
+    finally:
+        client.close()
+
+
+async def runLoad(host, port, concurrency, duration, seed, maxTurns):
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + duration
+    t0 = time.perf_counter()
+    await asyncio.gather(*[loadWorker(host, port, deadline, random.Random(seed + i), latencies, errors, maxTurns)
+                           for i in range(concurrency)])
+    return latencies, errors, time.perf_counter() - t0
+
+
+#Throughput of the batch CLI for each number of workers, over a synthetic corpus written as JSONL
+#Both caches are disabled, so forked workers gain nothing from what the parent already identified; records/s
+#can only grow with the workers up to the number of CPUs, which is printed with the results
+def benchBatch(args):
+    import io
+    import AutoPlantKey
+    import Batch
+    from SyntheticDescriptions import generateDescriptions
+
+    lines = "".join(json.dumps({"id": record["id"], "text": record["text"]}) + "\n"
+                    for record in generateDescriptions(None, args.per_species, args.seed))
+    savedCaches = (AutoPlantKey.descriptionCache, AutoPlantKey.sentenceCache)
+    AutoPlantKey.descriptionCache = AutoPlantKey.LruCache(0)
+    AutoPlantKey.sentenceCache = AutoPlantKey.LruCache(0)
+    expected = None
+    try:
+        print("%d CPUs" % (os.cpu_count() or 1))
+        print("%8s %10s %12s" % ("workers", "records", "records/s"))
+        for workers in args.workers:
+            output = io.StringIO()
+            count, elapsed = Batch.runBatch(io.StringIO(lines), output, "jsonl", workers, args.chunk_size)
+            print("%8d %10d %12.0f" % (workers, count, count / elapsed if elapsed else 0.0))
+            if expected is None:
+                expected = output.getvalue()
+            elif output.getvalue() != expected:
+                print("FAIL: results with %d workers differ from the results with %d" % (workers, args.workers[0]))
+                return 1
+    finally:
+        AutoPlantKey.descriptionCache, AutoPlantKey.sentenceCache = savedCaches
+    return 0
+
+
+#Output stream for benchPipeline(): notes when each result line is written, and how many records had been
+#read by then
+class TimedOutput:
+
+    def __init__(self, readTimes):
+        self.readTimes = readTimes
+        self.times = []
+        self.inFlight = 0
+
+    def write(self, line):
+        self.times.append(time.perf_counter())
+        self.inFlight = max(self.inFlight, len(self.readTimes) - len(self.times))
+
+    def flush(self):
+        pass
+
+
+#Pipeline mode (--stream) against batch mode on the same synthetic JSONL records
+#Pipeline mode is for live streams: records arrive over time and each result should go out as soon as it is
+#ready. Batch mode (Pool.imap) sends records to the workers in chunks, so a record waits for the rest of its
+#chunk to arrive, and reads ahead as far as the pipe to the workers holds; pipeline mode sends every record
+#on its own, at the cost of more messages per record. For each mode: records/s on input that is all there at
+#once, and on input arriving at --rate records/s the time from reading a record to writing its result and
+#the most records read but not yet written
+def benchPipeline(args):
+    import AutoPlantKey
+    import Batch
+    from SyntheticDescriptions import generateDescriptions
+
+    corpus = [json.dumps({"id": record["id"], "text": record["text"]}) + "\n"
+              for record in generateDescriptions(None, args.per_species, args.seed)]
+    savedCaches = (AutoPlantKey.descriptionCache, AutoPlantKey.sentenceCache)
+    AutoPlantKey.descriptionCache = AutoPlantKey.LruCache(0)
+    AutoPlantKey.sentenceCache = AutoPlantKey.LruCache(0)
+
+    #records at the given rate, all at once without one; returns (records/s, sorted latencies, most in flight)
+    def run(stream, count, rate=None):
+        readTimes = []
+
+        def timedInput():
+            started = time.perf_counter()
+            for i in range(count):
+                if rate is not None:
+                    delay = started + i / rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                readTimes.append(time.perf_counter())
+                yield corpus[i % len(corpus)]
+
+        output = TimedOutput(readTimes)
+        if stream:
+            written, elapsed = Batch.runPipeline(timedInput(), output, "jsonl", args.workers, args.window)
+        else:
+            written, elapsed = Batch.runBatch(timedInput(), output, "jsonl", args.workers, args.chunk_size)
+        latencies = sorted(done - read for read, done in zip(readTimes, output.times))
+        return written / elapsed if elapsed else 0.0, latencies, output.inFlight
+
+    try:
+        print("%d workers, %d CPUs; paced input: %d records at %.0f records/s"
+              % (args.workers, os.cpu_count() or 1, args.paced_records, args.rate))
+        print("%-9s %12s %14s %14s %10s" % ("mode", "records/s", "paced p50", "paced p99", "in flight"))
+        for label, stream in (("batch", False), ("pipeline", True)):
+            throughput = run(stream, args.records)[0]
+            paced, latencies, inFlight = run(stream, args.paced_records, args.rate)
+            print("%-9s %12.0f %11.1f ms %11.1f ms %10d" % (label, throughput, percentile(latencies, 0.5) * 1000,
+                                                          percentile(latencies, 0.99) * 1000, inFlight))
+    finally:
+        AutoPlantKey.descriptionCache, AutoPlantKey.sentenceCache = savedCaches
+    return 0
+
+
+#Local load generator for Service.py: starts the service in its own process (or targets --port)
+#and reports request throughput and latency percentiles
+def benchService(args):
+    server = None
+    port = args.port
+    if port is None:
+        server = subprocess.Popen([sys.executable, "Service.py", "--port", "0", "--ttl", str(args.ttl)],
+                                  cwd=HERE, stdout=subprocess.PIPE, text=True)
+        line = server.stdout.readline()
+        if not line:
+            print("FAIL: service did not start")
+            return 1
+        port = int(line.rsplit(":", 1)[1])
+    try:
+        latencies, errors, elapsed = asyncio.run(runLoad(args.host, port, args.concurrency, args.duration,
+                                                         args.seed, args.max_turns))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    print("%d requests from %d concurrent clients in %.1f s: %.0f req/s, %d errors"
+          % (len(latencies), args.concurrency, elapsed, len(latencies) / elapsed, len(errors)))
+    print("latency ms: p50 %.2f  p90 %.2f  p99 %.2f  max %.2f"
+          % tuple(x * 1000 for x in (percentile(latencies, 0.5), percentile(latencies, 0.9),
+                                     percentile(latencies, 0.99), latencies[-1] if latencies else 0.0)))
+    if errors:
+        return 1
+    if args.p99_budget is not None and percentile(latencies, 0.99) * 1000 > args.p99_budget:
+        print("FAIL: p99 latency over budget of %.1f ms" % args.p99_budget)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AutoPlantKey performance benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = sub.add_parser("importtime", help="cold import / start-up time of the identification core")
+    p.add_argument("--runs", type=int, default=7)
+    p.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_MS)
+    p.add_argument("--ready-budget", type=float, default=READY_BUDGET_MS)
+    p.set_defaults(func=benchImportTime)
+
+    p = sub.add_parser("sessions", help="memory cost of concurrent identification sessions")
+    p.add_argument("--sessions", type=int, default=20000)
+    p.add_argument("--turns", type=int, default=6)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--budget", type=float, default=4096)
+    p.set_defaults(func=benchSessions)
+
+    p = sub.add_parser("measurements", help="per-character cost of measurement extraction")
+    p.add_argument("--batch", type=int, default=500)
+    p.set_defaults(func=benchMeasurements)
+
+    p = sub.add_parser("turns", help="questions needed to single out each species of the ontology")
+    p.set_defaults(func=benchTurns)
+
+    p = sub.add_parser("scoring", help="cost of ranking partial matches over synthetic floras")
+    p.add_argument("--species", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    p.add_argument("--traits", type=int, default=200)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=benchScoring)
+
+    p = sub.add_parser("candidates", help="cost of narrowing candidates: lists, frozensets and bitsets")
+    p.add_argument("--species", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    p.add_argument("--repeats", type=int, default=200)
+    p.add_argument("--seconds", type=float, default=0.5, help="time spent on each representation and flora")
+    p.add_argument("--list-max", type=int, default=10000, help="largest flora timed with the list approach")
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=benchCandidates)
+
+    p = sub.add_parser("planner", help="lookups the identify() planner makes and skips")
+    p.add_argument("--repeats", type=int, default=200)
+    p.set_defaults(func=benchPlanner)
+
+    p = sub.add_parser("incremental", help="per-turn cost against session length and new text length")
+    p.add_argument("--turns", type=int, default=100)
+    p.add_argument("--repeats", type=int, default=50)
+    p.set_defaults(func=benchIncremental)
+
+    p = sub.add_parser("cache", help="hit rates and speed-up of the description and sentence caches")
+    p.add_argument("--pool", type=int, default=200)
+    p.add_argument("--requests", type=int, default=20000)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=benchCache)
+
+    p = sub.add_parser("synthetic", help="throughput, stage latencies and accuracy over a synthetic corpus")
+    p.add_argument("--per-species", type=int, default=50, help="descriptions generated for every species")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--p95-budget", type=float, default=SYNTHETIC_P95_BUDGET_MS, help="ms, for identify() end to end")
+    p.add_argument("--min-accuracy", type=float, default=SYNTHETIC_ACCURACY_BUDGET,
+                   help="share of descriptions whose species must stay among the candidates")
+    p.set_defaults(func=benchSynthetic)
+
+    p = sub.add_parser("trace", help="time spent in each stage of identify(), from the tracing spans")
+    p.add_argument("--per-species", type=int, default=50, help="descriptions generated for every species")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--profile", type=int, default=0, help="also profile with cProfile and show this many functions")
+    p.set_defaults(func=benchTrace)
+
+    p = sub.add_parser("metrics", help="cost of recording and exporting the runtime metrics")
+    p.add_argument("--events", type=int, default=200000)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--budget", type=float, default=METRICS_BUDGET_US, help="us per recorded event")
+    p.set_defaults(func=benchMetrics)
+
+    p = sub.add_parser("splitter", help="rule-based sentence splitter against NLTK punkt on the synthetic corpus")
+    p.add_argument("--per-species", type=int, default=50, help="descriptions generated for every species")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeats", type=int, default=5)
+    p.add_argument("--show", type=int, default=3, help="descriptions the splitters disagree on to print")
+    p.set_defaults(func=benchSplitter)
+
+    p = sub.add_parser("batch", help="throughput of the batch CLI against the number of workers")
+    p.add_argument("--per-species", type=int, default=100, help="descriptions generated for every species")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    p.add_argument("--chunk-size", type=int, default=64)
+    p.set_defaults(func=benchBatch)
+
+    p = sub.add_parser("pipeline", help="throughput and result latency of pipeline mode against batch mode")
+    p.add_argument("--records", type=int, default=5000, help="records for the throughput run")
+    p.add_argument("--paced-records", type=int, default=1000, help="records for the paced run")
+    p.add_argument("--rate", type=float, default=200, help="records/s of the paced run")
+    p.add_argument("--per-species", type=int, default=50, help="descriptions generated for every species")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--workers", type=int, default=2)
+    p.add_argument("--window", type=int, default=256)
+    p.add_argument("--chunk-size", type=int, default=64)
+    p.set_defaults(func=benchPipeline)
+
+    p = sub.add_parser("service", help="throughput and latency of the HTTP identification service")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=None, help="target a running service instead of starting one")
+    p.add_argument("--concurrency", type=int, default=32)
+    p.add_argument("--duration", type=float, default=10)
+    p.add_argument("--max-turns", type=int, default=6)
+    p.add_argument("--ttl", type=float, default=60)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--p99-budget", type=float, default=None, help="fail if p99 latency exceeds this many ms")
+    p.set_defaults(func=benchService)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
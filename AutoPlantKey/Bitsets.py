@@ -0,0 +1,33 @@
+#Candidate species sets as integer bitsets over the species IDs of a TraitIndex
+#Bit i is set when species i is still a candidate, so narrowing by a trait is one AND and widening is one OR,
+#each costing one machine word per 64 species, and a species is never held twice however many synonyms of
+#the same value matched it
+#Sessions, the dichotomous key and the trait index all hold the bare int; these are the helpers they share
+
+#Number of set bits, int.bit_count() where the interpreter has it
+if hasattr(int, "bit_count"):
+    def popcount(bits):
+        return bits.bit_count()
+else:
+    def popcount(bits):
+        return bin(bits).count("1")
+
+
+#Bitset of the given species IDs
+def bitsetOf(ids):
+    bits = 0
+    for i in ids:
+        bits |= 1 << i
+    return bits
+
+
+#Species IDs set in a bitset, in increasing order
+#Reads the binary digits once instead of shifting the whole int for every species
+def memberIds(bits):
+    digits = bin(bits)[:1:-1]
+    ids = []
+    i = digits.find("1")
+    while i >= 0:
+        ids.append(i)
+        i = digits.find("1", i + 1)
+    return ids
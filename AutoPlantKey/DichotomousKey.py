@@ -0,0 +1,167 @@
+#Offline compiler for a dichotomous key over the trait classes of the ontology
+#The species and their traits never change between releases of the ontology, so the whole question
+#flow can be decided ahead of time: the key maps a set of remaining candidates to the attribute to ask
+#and, for every answer, the candidates left after it. Walking it costs one dict lookup per question
+#Build step (run from this directory): python DichotomousKey.py [Rubiaceae_of_WI.owl ...]
+
+import os
+import pickle
+import sys
+import time
+
+KEY_VERSION = 1
+KEY_EXTENSION = ".key"
+
+
+#Compiled key
+#nodes - candidates bitset -> (attribute, {answer bitset: candidates bitset after that answer}), or None for
+#the leaves: one species, or species the key does not tell apart, where there is nothing left worth asking
+class DichotomousKey:
+
+    def __init__(self, root, nodes, answers=None, ontologyHash=None, buildSeconds=0.0):
+        self.root = root
+        self.nodes = nodes
+        #answers the key was compiled from, see AutoPlantKey.getAnswers
+        self.answers = answers
+        self.ontologyHash = ontologyHash
+        self.buildSeconds = buildSeconds
+
+    #True when the candidates are a node or a leaf of the key
+    def knows(self, candidates):
+        return candidates in self.nodes
+
+    #Attribute to ask about for the candidates, None at a leaf or when they are not part of the key
+    def question(self, candidates):
+        node = self.nodes.get(candidates)
+        if node is None:
+            return None
+        return node[0]
+
+    #Candidates after answering the question of a node, None when the answer matches no branch
+    def follow(self, candidates, attribute, answerBits):
+        node = self.nodes.get(candidates)
+        if node is None or node[0] != attribute:
+            return None
+        return node[1].get(answerBits)
+
+    #Longest chain of questions from the root
+    def depth(self):
+        depths = {}
+
+        def walk(candidates):
+            if self.nodes.get(candidates) is None:
+                return 0
+            if candidates not in depths:
+                depths[candidates] = 1 + max(walk(child) for child in self.nodes[candidates][1].values())
+            return depths[candidates]
+
+        return walk(self.root)
+
+    def nodeCount(self):
+        return sum(1 for node in self.nodes.values() if node is not None)
+
+
+#Compile a minimal-depth key by exhaustive search over the candidate sets reachable from the root
+#An attribute may split a set of candidates only if every answer leaves fewer candidates
+#The key singles out as many species as possible first (a species with none of the answers of a question
+#drops off the key there), then has the least depth, then the fewest nodes, then follows the order of attributes
+#order - attribute names in the order used to break ties
+#answersByAttribute - attribute name -> list of answer bitsets, see AutoPlantKey.getAnswers
+def compileKey(index, order, answersByAttribute, ontologyHash=None):
+    t0 = time.perf_counter()
+    #candidates bitset -> (species not singled out, depth, node count, singled out species bitset, node or None)
+    best = {}
+
+    def solve(candidates):
+        found = best.get(candidates)
+        if found is not None:
+            return found
+        count = index.count(candidates)
+        found = (count if count > 1 else 0, 0, 0, candidates if count == 1 else 0, None)
+        if count > 1:
+            for attribute in order:
+                branches = {}
+                for bits in answersByAttribute[attribute]:
+                    child = candidates & bits
+                    if child:
+                        branches[bits] = child
+                if not branches or candidates in branches.values():
+                    continue
+                depth = 0
+                nodes = 1
+                resolved = 0
+                for child in set(branches.values()):
+                    childFound = solve(child)
+                    depth = max(depth, childFound[1])
+                    nodes += childFound[2]
+                    resolved |= childFound[3]
+                score = (count - index.count(resolved), depth + 1, nodes)
+                if found[4] is None or score < found[:3]:
+                    found = score + (resolved, (attribute, branches))
+        best[candidates] = found
+        return found
+
+    solve(index.allSpecies)
+
+    #keep only the nodes and leaves reachable through the chosen questions
+    nodes = {}
+    stack = [index.allSpecies]
+    while stack:
+        candidates = stack.pop()
+        if candidates in nodes:
+            continue
+        node = best[candidates][4]
+        nodes[candidates] = node
+        if node is not None:
+            stack.extend(node[1].values())
+    return DichotomousKey(index.allSpecies, nodes, answersByAttribute, ontologyHash, time.perf_counter() - t0)
+
+
+def keyPath(owlPath):
+    return os.path.splitext(owlPath)[0] + KEY_EXTENSION
+
+
+#Write the compiled key, atomically like the index snapshot
+def saveKey(key, path):
+    data = {"version": KEY_VERSION,
+            "ontologyHash": key.ontologyHash,
+            "root": key.root,
+            "nodes": key.nodes,
+            "answers": key.answers,
+            "buildSeconds": key.buildSeconds}
+    tmpPath = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmpPath, "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpPath, path)
+
+
+#Read a compiled key, returns None if it is missing, unreadable, from another layout version or
+#compiled from a different ontology or different answers
+def loadKey(path, ontologyHash=None, answers=None):
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        return None
+
+    if not isinstance(data, dict) or data.get("version") != KEY_VERSION:
+        return None
+    if ontologyHash is not None and data.get("ontologyHash") != ontologyHash:
+        return None
+    if answers is not None and data.get("answers") != answers:
+        return None
+
+    return DichotomousKey(data["root"], data["nodes"], data["answers"], data["ontologyHash"], data["buildSeconds"])
+
+
+#Build step: python DichotomousKey.py [Rubiaceae_of_WI.owl ...]
+if __name__ == "__main__":
+    import AutoPlantKey
+
+    owlPaths = sys.argv[1:] or [AutoPlantKey.ONTOLOGY_FILE]
+    for owlPath in owlPaths:
+        AutoPlantKey.setOntology(owlPath)
+        key = AutoPlantKey.compileOntologyKey()
+        saveKey(key, keyPath(owlPath))
+        print("%s: depth %d, %d nodes, built in %.1f ms -> %s" % (owlPath, key.depth(), key.nodeCount(),
+                                                                 key.buildSeconds * 1000, keyPath(owlPath)))
@@ -0,0 +1,129 @@
+#Interval index for the numeric traits of the ontology
+#Numeric traits are bucket classes such as FiveLeaf_MaxLengthInCM (a subclass of Leaf_MaxLengthInCM)
+#or OneHundredWildflower_MinSizeInCM; their names are parsed at load time into a [min, max] interval
+#per species and measurement, so new threshold classes need no code change
+#Compatible species for a measured value or range are found with two binary searches and one AND
+
+import re
+from bisect import bisect_left, bisect_right
+
+from Bitsets import memberIds
+from Measurements import parse_int
+
+#Bound classes directly under the trait root, e.g. Leaf_MaxLengthInCM or Wildflower_MinSizeInCM
+BOUND_CLASS = re.compile(r"^(?P<organ>[A-Za-z]+)_(?P<bound>Max|Min)(?P<dimension>[A-Za-z]+?)In(?P<unit>CM|MM)$")
+
+#Millimetres per unit used in bound class names
+UNIT_MM = {"CM": 10.0, "MM": 1.0}
+
+INFINITY = float("inf")
+
+
+#Number in front of a bucket class name: digits ("4Petal_...") or CamelCase words ("OneHundredWildflower_...")
+def parseBucketNumber(prefix):
+    if prefix.isdigit():
+        return float(prefix)
+    words = re.findall(r"[A-Z][a-z]*", prefix)
+    if not words or "".join(words) != prefix:
+        return None
+    try:
+        return float(parse_int(" ".join(w.lower() for w in words)))
+    except Exception:
+        return None
+
+
+#Species intervals for one measurement, e.g. leaf length
+#Species without a lower bound start at 0, species without an upper bound have no upper limit,
+#so a species the ontology has no data for can never be ruled out by a measurement
+class MeasurementIntervals:
+
+    def __init__(self, name, intervals, buckets=()):
+        #intervals - list of (min, max, species bit), bounds in millimetres
+        #buckets - list of (bucket class name, "Min" or "Max", bound in millimetres) the intervals came from
+        self.name = name
+        self.intervals = list(intervals)
+        self.buckets = list(buckets)
+        byMin = sorted((low, bit) for low, high, bit in intervals)
+        byMax = sorted((high, bit) for low, high, bit in intervals)
+        self.mins = [low for low, bit in byMin]
+        self.maxs = [high for high, bit in byMax]
+
+        #minPrefix[i] - species among the first i by lower bound
+        self.minPrefix = [0]
+        for low, bit in byMin:
+            self.minPrefix.append(self.minPrefix[-1] | bit)
+        #maxSuffix[i] - species from the i-th by upper bound onwards
+        self.maxSuffix = [0] * (len(byMax) + 1)
+        for i in range(len(byMax) - 1, -1, -1):
+            self.maxSuffix[i] = self.maxSuffix[i + 1] | byMax[i][1]
+
+    #Bitset of the species whose interval overlaps [low, high] (a single value when high is None)
+    def query(self, low, high=None):
+        if high is None:
+            high = low
+        startedBy = self.minPrefix[bisect_right(self.mins, high)]
+        notEndedBy = self.maxSuffix[bisect_left(self.maxs, low)]
+        return startedBy & notEndedBy
+
+    #Bucket classes a value or range agrees with: upper bounds at or above it and lower bounds at or below it
+    def bucketsFor(self, low, high=None):
+        if high is None:
+            high = low
+        return [name for name, bound, value in self.buckets
+                if (bound == "Max" and value >= low) or (bound == "Min" and value <= high)]
+
+    #Species bitset for every distinguishable answer: each bound, each gap between consecutive bounds
+    #and the values above the highest bound, in increasing order of value
+    def answers(self):
+        bounds = sorted(set(b for b in self.mins + self.maxs if b != INFINITY))
+        points = []
+        for i, bound in enumerate(bounds):
+            points.append(bound)
+            if i + 1 < len(bounds):
+                points.append((bound + bounds[i + 1]) / 2)
+        if bounds:
+            points.append(bounds[-1] * 2 + 1)
+        found = []
+        for point in points:
+            bits = self.query(point)
+            if bits and bits not in found:
+                found.append(bits)
+        return found
+
+
+#Derive the interval index of every measurement from a compiled TraitIndex
+#Returns measurement name (organ_dimension, e.g. "Leaf_Length", "Wildflower_Size") -> MeasurementIntervals
+def buildIntervals(index):
+    #measurement -> species ID -> [min, max]
+    bounds = {}
+    #measurement -> [(bucket class, "Min" or "Max", bound)]
+    buckets = {}
+    for trait, bits in index.traitBits.items():
+        for parent in index.closure.get(trait, ()):
+            match = BOUND_CLASS.match(parent)
+            if match is None or not trait.endswith(parent) or trait == parent:
+                continue
+            value = parseBucketNumber(trait[:-len(parent)])
+            if value is None:
+                continue
+            value *= UNIT_MM[match.group("unit")]
+            measurement = match.group("organ") + "_" + match.group("dimension")
+            speciesBounds = bounds.setdefault(measurement, {})
+            buckets.setdefault(measurement, []).append((trait, match.group("bound"), value))
+
+            for speciesId in memberIds(bits):
+                low, high = speciesBounds.get(speciesId, (0.0, INFINITY))
+                if match.group("bound") == "Min":
+                    low = max(low, value)
+                else:
+                    high = min(high, value)
+                speciesBounds[speciesId] = (low, high)
+
+    intervals = {}
+    for measurement, speciesBounds in bounds.items():
+        entries = []
+        for speciesId in range(len(index.species)):
+            low, high = speciesBounds.get(speciesId, (0.0, INFINITY))
+            entries.append((low, high, 1 << speciesId))
+        intervals[measurement] = MeasurementIntervals(measurement, entries, sorted(buckets[measurement]))
+    return intervals
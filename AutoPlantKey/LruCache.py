@@ -0,0 +1,59 @@
+#Bounded least-recently-used cache with optional time-to-live and hit-rate counters
+
+import time
+from collections import OrderedDict
+
+#Returned by get() for keys that are not cached, so that None can be cached like any other value
+MISSING = object()
+
+
+class LruCache:
+
+    #maxSize - entries kept at most, 0 disables the cache; ttl - seconds an entry stays valid, None for no limit
+    def __init__(self, maxSize, ttl=None, clock=time.monotonic):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.clock = clock
+        #key -> [value, time stored]
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=MISSING):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        if self.ttl is not None and self.clock() - entry[1] > self.ttl:
+            del self.entries[key]
+            self.expired += 1
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        if self.maxSize <= 0:
+            return
+        self.entries[key] = [value, self.clock()]
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+            self.evicted += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {"size": len(self.entries), "maxSize": self.maxSize, "hits": self.hits, "misses": self.misses,
+                "hitRate": round(self.hitRate(), 4), "evicted": self.evicted, "expired": self.expired}
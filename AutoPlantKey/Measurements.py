@@ -0,0 +1,173 @@
+#Measurement extraction engine for leaf length, petal length and plant size
+#One compiled pattern finds every measurement (a number or number words, an optional range and a unit)
+#and every organ word in a single left-to-right pass; each measurement is then assigned to the
+#attribute of the nearest organ word, and all values are normalised to millimetres with one table lookup
+
+import re
+from collections import namedtuple
+
+#One measurement found in a text
+#value - the measurement (midpoint for ranges) in millimetres, low / high - the range in millimetres
+#unit - the unit as written, attribute - leafLength, petalLength, plantSize or None if no organ was found
+#start / end - offsets of the measurement in the text
+Measurement = namedtuple("Measurement", ["value", "low", "high", "unit", "attribute", "start", "end"])
+
+#Millimetres per unit, keyed by every spelling the pattern accepts
+UNIT_FACTORS = {"mm": 1.0, "millimeter": 1.0, "millimeters": 1.0, "millimetre": 1.0, "millimetres": 1.0,
+                "cm": 10.0, "centimeter": 10.0, "centimeters": 10.0, "centimetre": 10.0, "centimetres": 10.0,
+                "m": 1000.0, "meter": 1000.0, "meters": 1000.0, "metre": 1000.0, "metres": 1000.0,
+                "in": 25.4, "inch": 25.4, "inches": 25.4,
+                "ft": 304.8, "foot": 304.8, "feet": 304.8}
+
+#Millimetres per unit each attribute is expressed in by the ontology
+ATTRIBUTE_UNITS = {"leafLength": 10.0, "petalLength": 1.0, "plantSize": 10.0}
+
+#Organ words and the measured attribute they introduce
+ORGANS = {"leaf": "leafLength", "leaves": "leafLength", "leaflet": "leafLength", "leaflets": "leafLength",
+          "petal": "petalLength", "petals": "petalLength", "corolla": "petalLength",
+          "plant": "plantSize", "plants": "plantSize", "stem": "plantSize", "stems": "plantSize",
+          "tall": "plantSize", "height": "plantSize", "high": "plantSize"}
+
+NUMBER_WORDS = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+                "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen",
+                "nineteen", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety",
+                "hundred", "thousand"]
+
+
+#Function to parse number words to numbers
+def parse_int(textnum, numwords={}):
+    '''
+    Function collected from text2int package via github
+    '''
+    if textnum.isdigit():
+        return int(textnum)
+    # create our default word-lists
+    if not numwords:
+
+        # singles
+        units = [
+            "zero", "one", "two", "three", "four", "five", "six", "seven", "eight",
+            "nine", "ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen",
+            "sixteen", "seventeen", "eighteen", "nineteen",
+        ]
+
+        # tens
+        tens = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+
+        # larger scales
+        scales = ["hundred", "thousand", "million", "billion", "trillion"]
+
+        # divisors
+        numwords["and"] = (1, 0)
+
+        # perform our loops and start the swap
+        for idx, word in enumerate(units):    numwords[word] = (1, idx)
+        for idx, word in enumerate(tens):     numwords[word] = (1, idx * 10)
+        for idx, word in enumerate(scales):   numwords[word] = (10 ** (idx * 3 or 2), 0)
+
+    # primary loop
+    current = result = 0
+    # loop while splitting to break into individual words
+    for word in textnum.replace("-"," ").split():
+        # if problem then fail-safe
+        if word not in numwords:
+            raise Exception("Illegal word: " + word)
+
+        # use the index by the multiplier
+        scale, increment = numwords[word]
+        current = current * scale + increment
+
+        # if larger than 100 then push for a round 2
+        if scale > 100:
+            result += current
+            current = 0
+
+    # return the result plus the current
+    return result + current
+
+
+#Numbers are digits with an optional decimal part, fractions ("1/2") and mixed numbers ("1 1/2"), or number words
+#Ranges are separated by "to", a hyphen or an en or em dash
+def compilePattern():
+    words = "|".join(sorted(NUMBER_WORDS, key=len, reverse=True))
+    digits = r"\d+(?:\.\d+|/[1-9]\d*|\s+\d+/[1-9]\d*)?"
+    number = r"(?:%s|(?:%s)(?:[ -](?:%s|and(?= )))*)" % (digits, words, words)
+    units = "|".join(sorted((u for u in UNIT_FACTORS if u != "in"), key=len, reverse=True))
+    #a bare "in" is only read as inches when it ends the sentence or is followed by a dimension word
+    unit = r"(?:%s|in(?=\s+(?:long|tall|high|wide|across)\b|\s*$))" % units
+    organs = "|".join(sorted(ORGANS, key=len, reverse=True))
+    return re.compile(r"\b(?P<low>%s)(?:\s*(?:[-\u2013\u2014]|to)\s*(?P<high>%s))?\s*(?P<unit>%s)\b"
+                      r"|\b(?P<organ>%s)\b"
+                      % (number, number, unit, organs))
+
+pattern = None
+
+#Compile the pattern on first use, it is large enough to show up in import time
+def getPattern():
+    global pattern
+    if pattern is None:
+        pattern = compilePattern()
+    return pattern
+
+
+def parseNumber(token):
+    if not token[0].isdigit():
+        return float(parse_int(token))
+    if "/" not in token:
+        return float(token)
+    parts = token.split()
+    numerator, denominator = parts[-1].split("/")
+    return float(numerator) / float(denominator) + (float(parts[0]) if len(parts) > 1 else 0.0)
+
+
+#Every measurement in a text, in the order they appear
+#attribute - assign every measurement to this attribute instead of the nearest organ word
+#organs - (start, end, attribute or None) of the organ mentions the caller found in the text, in text order,
+#used instead of the organ words of the pattern; a measurement nearest an organ with no attribute gets None
+def extractMeasurements(text, attribute=None, organs=None):
+    raw = []
+    organWords = []
+    for match in getPattern().finditer(text.lower()):
+        if match.group("organ"):
+            organWords.append((match.start(), match.end(), ORGANS[match.group("organ")]))
+            continue
+        low = parseNumber(match.group("low"))
+        high = parseNumber(match.group("high")) if match.group("high") else low
+        raw.append((min(low, high), max(low, high), match.group("unit"), match.start(), match.end()))
+
+    if organs is None:
+        organs = organWords
+
+    #normalise every value with one factor lookup per measurement
+    factors = [UNIT_FACTORS[r[2]] for r in raw]
+    lows = [r[0] * f for r, f in zip(raw, factors)]
+    highs = [r[1] * f for r, f in zip(raw, factors)]
+
+    #measurements and organ words are both in text order, so the nearest organ of every
+    #measurement is found by walking the two lists side by side
+    out = []
+    nextOrgan = 0
+    for (low, high, unit, start, end), lowMM, highMM in zip(raw, lows, highs):
+        while nextOrgan < len(organs) and organs[nextOrgan][1] <= start:
+            nextOrgan += 1
+        measured = attribute
+        if measured is None:
+            before = organs[nextOrgan - 1] if nextOrgan > 0 else None
+            after = organs[nextOrgan] if nextOrgan < len(organs) else None
+            if before is not None and (after is None or start - before[1] <= after[0] - end):
+                measured = before[2]
+            elif after is not None:
+                measured = after[2]
+        out.append(Measurement((lowMM + highMM) / 2, lowMM, highMM, unit, measured, start, end))
+    return out
+
+
+#Extract a batch of descriptions, one list of measurements per description
+def extractBatch(texts, attribute=None):
+    return [extractMeasurements(text, attribute) for text in texts]
+
+
+#Values of the measurements of one attribute, converted to the unit the ontology uses for it
+def attributeValues(measurements, attribute):
+    scale = ATTRIBUTE_UNITS[attribute]
+    return [m.value / scale for m in measurements if m.attribute == attribute]
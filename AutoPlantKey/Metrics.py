@@ -0,0 +1,162 @@
+#Runtime metrics of the identification pipeline: latency and turn histograms, hit rates and cache ratios
+#Metrics are always on, so recording an event is a bisect and a few integer increments on plain attributes,
+#well under a microsecond (see Benchmarks.py metrics); the increments are not atomic across threads, which
+#only matters for a threaded caller and then costs at most a lost count
+#Metrics are pulled in the Prometheus text exposition format (Service.py GET /metrics) or as JSON
+
+import time
+from bisect import bisect_left
+
+#Prefix of every exported metric name
+METRIC_PREFIX = "autoplantkey_"
+
+#Upper bounds of the identify() latency buckets, in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+#Upper bounds of the turns-to-resolution buckets
+TURN_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+
+
+#Histogram over fixed buckets
+#counts[i] is the number of values in (bounds[i - 1], bounds[i]], the last count is for values above every bound
+class Histogram:
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def count(self):
+        return sum(self.counts)
+
+    #(upper bound, values at or below it) for every bucket, ending with (inf, all values), as Prometheus has them
+    def cumulative(self):
+        found = []
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            found.append((bound, total))
+        return found
+
+    #Upper bound of the bucket holding the given quantile, an estimate good to one bucket
+    def quantile(self, fraction):
+        total = self.count()
+        if not total:
+            return 0.0
+        for bound, below in self.cumulative():
+            if below >= fraction * total:
+                return bound
+        return float("inf")
+
+
+#Every metric of one process
+#attributes - attribute names, in the order they are exported
+class Metrics:
+
+    def __init__(self, attributes, clock=time.time):
+        self.clock = clock
+        self.started = clock()
+        self.identifySeconds = Histogram(LATENCY_BUCKETS)
+        self.turnsToResolution = Histogram(TURN_BUCKETS)
+        self.identifications = 0
+        self.emptyResults = 0
+        #attribute name -> identifications in which its extractor found a value that was applied
+        self.attributeHits = dict.fromkeys(attributes, 0)
+
+    #One identify() call: its latency and Result
+    def recordIdentify(self, seconds, result):
+        self.identifications += 1
+        self.identifySeconds.observe(seconds)
+        if not result.candidates:
+            self.emptyResults += 1
+        hits = self.attributeHits
+        for name in result.traits:
+            hits[name] += 1
+
+    #A session singled out its species after this many turns
+    def recordResolution(self, turns):
+        self.turnsToResolution.observe(turns)
+
+    #Share of identifications in which each attribute was found
+    def attributeHitRates(self):
+        total = self.identifications
+        return {name: hits / total if total else 0.0 for name, hits in self.attributeHits.items()}
+
+    def emptyResultRate(self):
+        return self.emptyResults / self.identifications if self.identifications else 0.0
+
+    #Everything as plain data for JSON, caches is the cache name -> LruCache.stats() of AutoPlantKey.cacheStats()
+    def snapshot(self, caches=None):
+        histograms = {}
+        for name, histogram in (("identifySeconds", self.identifySeconds), ("turnsToResolution", self.turnsToResolution)):
+            histograms[name] = {"count": histogram.count(), "sum": histogram.sum,
+                                "p50": histogram.quantile(0.5), "p95": histogram.quantile(0.95),
+                                "p99": histogram.quantile(0.99),
+                                "buckets": [["+Inf" if bound == float("inf") else bound, below]
+                                            for bound, below in histogram.cumulative()]}
+        return {"uptimeSeconds": round(self.clock() - self.started, 3),
+                "identifications": self.identifications,
+                "emptyResults": self.emptyResults,
+                "emptyResultRate": round(self.emptyResultRate(), 4),
+                "attributeHitRates": {name: round(rate, 4) for name, rate in self.attributeHitRates().items()},
+                "histograms": histograms,
+                "caches": {name: {"hits": stats["hits"], "misses": stats["misses"], "hitRate": stats["hitRate"]}
+                           for name, stats in (caches or {}).items()}}
+
+    #Prometheus text exposition format
+    #caches as for snapshot(), gauges - extra name -> (help, value) gauges of the caller, e.g. live sessions
+    def prometheusText(self, caches=None, gauges=None):
+        lines = []
+
+        def metric(name, kind, helpText, samples):
+            lines.append("# HELP %s%s %s" % (METRIC_PREFIX, name, helpText))
+            lines.append("# TYPE %s%s %s" % (METRIC_PREFIX, name, kind))
+            for suffix, labels, value in samples:
+                labelText = ",".join('%s="%s"' % label for label in labels)
+                lines.append("%s%s%s%s %s" % (METRIC_PREFIX, name, suffix, "{%s}" % labelText if labelText else "",
+                                              formatValue(value)))
+
+        def histogramSamples(histogram):
+            samples = [("_bucket", [("le", formatValue(bound))], below) for bound, below in histogram.cumulative()]
+            return samples + [("_sum", [], histogram.sum), ("_count", [], histogram.count())]
+
+        metric("identify_seconds", "histogram", "Latency of identify() calls.",
+               histogramSamples(self.identifySeconds))
+        metric("turns_to_resolution", "histogram", "Turns a session took to single out one species.",
+               histogramSamples(self.turnsToResolution))
+        metric("identifications_total", "counter", "identify() calls.", [("", [], self.identifications)])
+        metric("empty_results_total", "counter", "identify() calls that left no candidate species.",
+               [("", [], self.emptyResults)])
+        metric("empty_result_ratio", "gauge", "Share of identify() calls that left no candidate species.",
+               [("", [], self.emptyResultRate())])
+        metric("attribute_hits_total", "counter",
+               "identify() calls in which a value of an attribute was found and applied.",
+               [("", [("attribute", name)], hits) for name, hits in self.attributeHits.items()])
+        metric("attribute_hit_ratio", "gauge",
+               "Share of identify() calls in which a value of an attribute was found and applied.",
+               [("", [("attribute", name)], rate) for name, rate in self.attributeHitRates().items()])
+        if caches:
+            metric("cache_hits_total", "counter", "Cache lookups that found an entry.",
+                   [("", [("cache", name)], stats["hits"]) for name, stats in caches.items()])
+            metric("cache_misses_total", "counter", "Cache lookups that found no entry.",
+                   [("", [("cache", name)], stats["misses"]) for name, stats in caches.items()])
+            metric("cache_hit_ratio", "gauge", "Share of cache lookups that found an entry.",
+                   [("", [("cache", name)], stats["hitRate"]) for name, stats in caches.items()])
+        for name, (helpText, value) in (gauges or {}).items():
+            metric(name, "gauge", helpText, [("", [], value)])
+        metric("uptime_seconds", "gauge", "Seconds since the metrics were started.",
+               [("", [], self.clock() - self.started)])
+        return "\n".join(lines) + "\n"
+
+
+#A sample value as Prometheus writes it
+def formatValue(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
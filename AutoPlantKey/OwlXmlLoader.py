@@ -0,0 +1,88 @@
+#Streaming OWL/XML reader for the plant identification ontology
+#Reads Declaration, SubClassOf and rdfs:label AnnotationAssertion axioms in a single iterparse pass
+#and returns the plain class graph, without building an owlready2 quadstore
+#Every top-level axiom is discarded as soon as it has been read, so parser memory stays bounded
+#no matter how large the ontology is - only the class graph itself is kept
+
+import xml.etree.ElementTree as ElementTree
+
+OWL_NS = "{http://www.w3.org/2002/07/owl#}"
+
+DECLARATION = OWL_NS + "Declaration"
+SUB_CLASS_OF = OWL_NS + "SubClassOf"
+ANNOTATION_ASSERTION = OWL_NS + "AnnotationAssertion"
+CLASS = OWL_NS + "Class"
+ANNOTATION_PROPERTY = OWL_NS + "AnnotationProperty"
+IRI = OWL_NS + "IRI"
+LITERAL = OWL_NS + "Literal"
+
+LABEL_IRIS = ("rdfs:label", "http://www.w3.org/2000/01/rdf-schema#label")
+
+
+#Short class name from an IRI="#Name", abbreviatedIRI="prefix:Name" or full IRI
+def iriName(iri):
+    if iri is None:
+        return None
+    for sep in ("#", "/", ":"):
+        if sep in iri:
+            iri = iri.rsplit(sep, 1)[1]
+    return iri or None
+
+
+def elementName(elem):
+    return iriName(elem.get("IRI") or elem.get("abbreviatedIRI"))
+
+
+#Parse an OWL/XML file and return (classes, parents, labels)
+#classes - every named class declared or used in a SubClassOf axiom, in file order
+#parents - class name -> list of its direct named superclasses
+#labels - class name -> rdfs:label (labels of properties and individuals are dropped)
+#SubClassOf axioms with anonymous class expressions on either side are skipped, as are
+#DisjointClasses and every other axiom type since they are not needed to answer trait queries
+def parseOwlXml(path):
+    classes = {}
+    parents = {}
+    labels = {}
+
+    depth = 0
+    root = None
+    for event, elem in ElementTree.iterparse(path, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+
+        depth -= 1
+        #only whole top-level axioms (direct children of <Ontology>) are handled
+        if depth != 1:
+            continue
+
+        tag = elem.tag
+        if tag == DECLARATION:
+            for child in elem:
+                if child.tag == CLASS:
+                    classes.setdefault(elementName(child), None)
+
+        elif tag == SUB_CLASS_OF:
+            children = list(elem)
+            if len(children) == 2 and children[0].tag == CLASS and children[1].tag == CLASS:
+                sub = elementName(children[0])
+                sup = elementName(children[1])
+                classes.setdefault(sub, None)
+                classes.setdefault(sup, None)
+                parents.setdefault(sub, []).append(sup)
+
+        elif tag == ANNOTATION_ASSERTION:
+            prop = elem.find(ANNOTATION_PROPERTY)
+            subject = elem.find(IRI)
+            literal = elem.find(LITERAL)
+            if (prop is not None and subject is not None and literal is not None
+                    and (prop.get("abbreviatedIRI") or prop.get("IRI")) in LABEL_IRIS):
+                labels.setdefault(iriName(subject.text), literal.text or "")
+
+        #drop the axiom from the tree so the parsed document never accumulates
+        root.clear()
+
+    labels = {name: label for name, label in labels.items() if name in classes}
+    return list(classes), parents, labels
@@ -0,0 +1,40 @@
+#Information-gain question scheduler
+#Instead of asking attributes in a fixed order, ask the one expected to leave the fewest candidates
+#Every possible answer to an attribute is a species bitset of the trait index, so scoring an attribute
+#for the current candidates is one AND and one popcount per answer
+
+#Expected number of candidates left after asking about an attribute
+#answers - species bitset for every answer the attribute can get
+#Each candidate is taken as equally likely to be the plant described, and a candidate with several
+#answers (e.g. white or yellow flowers) is counted under each of them
+#Candidates with none of the answers cannot be narrowed by the attribute, so they leave every candidate
+def expectedRemaining(index, candidates, answers):
+    total = index.count(candidates)
+    covered = 0
+    weight = 0
+    remaining = 0
+    for bits in answers:
+        n = index.count(candidates & bits)
+        weight += n
+        remaining += n * n
+        covered |= bits
+    unknown = index.count(candidates & ~covered)
+    weight += unknown
+    remaining += unknown * total
+    if not weight:
+        return total
+    return remaining / weight
+
+#Most discriminating attribute for the candidates, None when no attribute can narrow them
+#order - attribute names still to ask, in the order used to break ties
+#answersByAttribute - attribute name -> list of answer bitsets
+def bestQuestion(index, candidates, order, answersByAttribute):
+    total = index.count(candidates)
+    best = None
+    bestScore = total
+    for attribute in order:
+        score = expectedRemaining(index, candidates, answersByAttribute[attribute])
+        if score < bestScore:
+            best = attribute
+            bestScore = score
+    return best
@@ -0,0 +1,91 @@
+#Rule-based sentence splitter for plant descriptions
+#Descriptions are short and full of abbreviations ("ca. 3 cm", "approx.", "G. aparine") and decimals
+#("2.5 cm"), which a general-purpose model either gets wrong or needs to be loaded from disk for.
+#This splitter finds every sentence-ending mark in one regular expression pass and decides each
+#full stop from the word in front of it and the first character after it:
+#  - a decimal point is never an end, the mark must be followed by whitespace or the end of the text
+#  - abbreviations that never end a sentence ("ca.", "approx.", "e.g.", "var.") and initials ("G.") never do
+#  - a unit after a number ("3 cm.") always ends one, whatever the case of the next word and even with no
+#    space after it ("Leaves 3 cm.Flowers white."), so a measurement stays with its organ
+#  - other abbreviations that often end a sentence ("etc.", "diam.", a unit with no number) end one only
+#    when the next word starts with a capital letter
+#  - every other full stop, "!" and "?" ends a sentence
+
+import re
+
+#Abbreviations that are never the end of a sentence, lower case and without their final full stop
+ABBREVIATIONS = frozenset(["ca", "c", "approx", "appr", "circa", "e.g", "i.e", "eg", "ie", "cf", "viz", "vs",
+                           "var", "subsp", "ssp", "f", "fig", "figs", "mt", "st", "dr", "mr", "mrs",
+                           "ms", "prof", "esp", "incl", "resp"])
+
+#Units, which end a sentence after a number, e.g. "Leaves 3 cm. flowers white.", and otherwise are read like
+#the abbreviations below
+UNITS = frozenset(["mm", "cm", "dm", "m", "in", "ft", "km"])
+
+#Abbreviations that end a sentence when the next word is capitalised, e.g. "Flowers white etc. Leaves opposite."
+SENTENCE_ABBREVIATIONS = frozenset(["diam", "max", "min", "avg", "sp", "spp", "etc", "al"])
+
+#Sentence-ending marks with any closing quotes or brackets, followed by whitespace or the end of the text,
+#or a single mark right in front of a letter, which only ends a sentence after a unit ("3 cm.Flowers")
+#Both start with the mark, so the pattern keeps the fast scan for its first character
+STOP = re.compile(r"[.!?](?:[.!?]*[\"')\]]*(?:\s+|$)|(?=[A-Za-z]))")
+
+#Word right before a full stop, possibly with inner full stops ("e.g")
+WORD = re.compile(r"[A-Za-z]+(?:\.[A-Za-z]+)*$")
+
+#Number right before a word, with at most one space in between ("3 cm", "3cm")
+NUMBER_BEFORE = re.compile(r"\d\s?$")
+
+#Longest abbreviation looked for in front of a full stop
+WORD_WINDOW = 12
+
+
+#True when the full stop after word ends a sentence, next is the first character after it (None at the end)
+#measured - the word follows a number, as in "3 cm."
+def endsSentence(word, next, measured=False):
+    if next is None:
+        return True
+    lower = word.lower()
+    if lower in UNITS:
+        return measured or next.isupper()
+    if lower in ABBREVIATIONS:
+        return False
+    if len(word) == 1 and word.isupper():
+        return False
+    if lower in SENTENCE_ABBREVIATIONS:
+        return next.isupper()
+    return True
+
+
+#Sentences of a text, stripped of surrounding whitespace, in order
+#Only a lone full stop can belong to an abbreviation; the word in front of it is read from a short window,
+#so the cost stays linear in the length of the text
+def splitSentences(text):
+    sentences = []
+    start = 0
+    length = len(text)
+    for match in STOP.finditer(text):
+        stop = match.start()
+        end = match.end()
+        #attached to the next word: the match ends neither in whitespace nor at the end of the text
+        attached = end < length and not text[end - 1].isspace()
+        if text[stop] == "." and (stop + 1 == length or text[stop + 1] not in ".!?"):
+            word = WORD.search(text, max(0, stop - WORD_WINDOW), stop)
+            #a word running on past the window is longer than any abbreviation
+            if word is not None and (word.start() == 0 or not text[word.start() - 1].isalpha()):
+                measured = (word.group().lower() in UNITS
+                            and NUMBER_BEFORE.search(text, max(0, word.start() - 2), word.start()) is not None)
+                if attached and not measured:
+                    continue
+                if not endsSentence(word.group(), text[end] if end < length else None, measured):
+                    continue
+            elif attached:
+                continue
+        sentence = text[start:end].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = end
+    rest = text[start:].strip()
+    if rest:
+        sentences.append(rest)
+    return sentences
@@ -0,0 +1,380 @@
+#asyncio HTTP identification service
+#One process loads the ontology index once and serves any number of identification sessions from memory
+#Run from this directory: python Service.py [--host 127.0.0.1] [--port 8080] [--ttl 900]
+#                                          [--metrics-file metrics.json --metrics-interval 60]
+#
+#Endpoints (JSON in, JSON out):
+#  POST   /sessions                  start a session, optional {"text": "..."} first description
+#  POST   /sessions/<id>/describe    {"text": "..."} free-form description of the plant
+#  POST   /sessions/<id>/answer      {"text": "..."} answer to the session's last question
+#  POST   /sessions/<id>/undo        take back the last turn
+#  POST   /sessions/<id>/retract     {"attribute": "color"} take back one attribute, e.g. to correct it
+#  GET    /sessions/<id>             current candidates and next question
+#  DELETE /sessions/<id>             end a session
+#  GET    /health
+#  GET    /metrics                   metrics in the Prometheus text exposition format
+#  GET    /metrics.json              the same metrics as JSON
+
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import AutoPlantKey
+
+DEFAULT_TTL = 900
+MAX_BODY = 64 * 1024
+
+#Content type of the Prometheus text exposition format
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+#Raised by request handlers to answer with an HTTP error
+class HttpError(Exception):
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+        self.message = message
+
+
+#In-memory sessions with time-to-live eviction
+#Entries are kept in last-used order, so expired sessions are always at the front and an eviction
+#sweep only ever looks at sessions it removes (plus one)
+class SessionStore:
+
+    def __init__(self, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        #session id -> [Session, attribute asked about last, last used time]
+        self.entries = OrderedDict()
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def create(self):
+        sessionId = secrets.token_hex(8)
+        self.entries[sessionId] = [AutoPlantKey.Session(), None, self.clock()]
+        return sessionId
+
+    #Entry for a live session, refreshing its TTL, or None if it does not exist or has expired
+    def get(self, sessionId):
+        self.evictExpired()
+        entry = self.entries.get(sessionId)
+        if entry is None:
+            return None
+        entry[2] = self.clock()
+        self.entries.move_to_end(sessionId)
+        return entry
+
+    def delete(self, sessionId):
+        return self.entries.pop(sessionId, None) is not None
+
+    def evictExpired(self):
+        deadline = self.clock() - self.ttl
+        entries = self.entries
+        while entries:
+            sessionId, entry = next(iter(entries.items()))
+            if entry[2] > deadline:
+                break
+            del entries[sessionId]
+            self.evicted += 1
+
+
+#JSON view of an identify() Result
+def resultPayload(sessionId, result):
+    question = result.nextQuestion
+    if question is not None:
+        question = " ".join(question.split())
+    return {"session": sessionId,
+            "candidates": result.candidates,
+            "guesses": result.guesses,
+            "traits": result.traits,
+            "question": question,
+            "questionAttribute": result.nextAttribute,
+            "resolved": result.resolved,
+            "ranked": [{"species": name, "score": round(score, 4)} for name, score in result.ranked]}
+
+
+#Request routing and the identification turn logic of the service
+#Requests are dispatched on one worker thread, see handle(), so the event loop keeps reading and answering
+#other connections while a description is identified, and the sessions, caches and metrics are only ever
+#changed by that one thread
+class IdentificationService:
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.sessions = SessionStore(ttl)
+        self.index = AutoPlantKey.getIndex()
+        self.worker = ThreadPoolExecutor(1)
+
+    #Awaitable result of function(*args) called on the worker thread
+    def run(self, function, *args):
+        return asyncio.get_running_loop().run_in_executor(self.worker, function, *args)
+
+    #Answer a request: health checks straight away, so they never wait behind an identification, everything
+    #else on the worker thread
+    async def handle(self, method, path, body):
+        if [p for p in path.split("?", 1)[0].split("/") if p] == ["health"]:
+            return self.dispatch(method, path, body)
+        return await self.run(self.dispatch, method, path, body)
+
+    #Run one identify() turn for a session and store the updated session
+    def turn(self, sessionId, entry, text, answering=None):
+        return self.store(sessionId, entry, AutoPlantKey.identify(text, entry[0], answering))
+
+    #Keep the session of a Result as the session's current state
+    def store(self, sessionId, entry, result):
+        entry[0] = result.session
+        entry[1] = result.nextAttribute
+        return resultPayload(sessionId, result)
+
+    #AutoPlantKey.metrics with the cache hit ratios and the session gauges of this service
+    def metricsText(self):
+        return AutoPlantKey.metrics.prometheusText(AutoPlantKey.cacheStats(), {
+            "sessions": ("Live identification sessions.", len(self.sessions)),
+            "sessions_evicted": ("Sessions dropped after their time-to-live.", self.sessions.evicted)})
+
+    def metricsSnapshot(self):
+        snapshot = AutoPlantKey.metrics.snapshot(AutoPlantKey.cacheStats())
+        snapshot["sessions"] = len(self.sessions)
+        snapshot["sessionsEvicted"] = self.sessions.evicted
+        return snapshot
+
+    def dispatch(self, method, path, body):
+        parts = [p for p in path.split("?", 1)[0].split("/") if p]
+
+        if parts == ["health"]:
+            if method != "GET":
+                raise HttpError(405, "use GET")
+            return 200, {"status": "ok", "sessions": len(self.sessions), "species": len(self.index.species),
+                         "caches": AutoPlantKey.cacheStats()}
+
+        if parts == ["metrics"] or parts == ["metrics.json"]:
+            if method != "GET":
+                raise HttpError(405, "use GET")
+            if parts == ["metrics"]:
+                return 200, self.metricsText()
+            return 200, self.metricsSnapshot()
+
+        if not parts or parts[0] != "sessions" or len(parts) > 3:
+            raise HttpError(404, "no such endpoint")
+
+        if len(parts) == 1:
+            if method != "POST":
+                raise HttpError(405, "use POST")
+            text = readText(body, required=False)
+            sessionId = self.sessions.create()
+            entry = self.sessions.get(sessionId)
+            if text:
+                return 201, self.turn(sessionId, entry, text)
+            #a session started without a description begins with the first question
+            return 201, self.store(sessionId, entry, AutoPlantKey.sessionResult(entry[0]))
+
+        sessionId = parts[1]
+        entry = self.sessions.get(sessionId)
+        if entry is None:
+            raise HttpError(404, "unknown or expired session")
+
+        if len(parts) == 2:
+            if method == "DELETE":
+                self.sessions.delete(sessionId)
+                return 200, {"session": sessionId, "deleted": True}
+            if method != "GET":
+                raise HttpError(405, "use GET or DELETE")
+            session = entry[0]
+            candidates = self.index.allSpecies if session.candidates is None else session.candidates
+            return 200, {"session": sessionId,
+                         "candidates": self.index.names(candidates),
+                         "guesses": self.index.names(session.guesses),
+                         "used": AutoPlantKey.usedAttributes(session.used),
+                         "questionAttribute": entry[1],
+                         "resolved": self.index.count(candidates) <= 1}
+
+        if method != "POST":
+            raise HttpError(405, "use POST")
+        if parts[2] == "describe":
+            return 200, self.turn(sessionId, entry, readText(body, required=True))
+        if parts[2] == "answer":
+            return 200, self.turn(sessionId, entry, readText(body, required=True), entry[1])
+        if parts[2] == "undo":
+            return 200, self.store(sessionId, entry, AutoPlantKey.undo(entry[0]))
+        if parts[2] == "retract":
+            attribute = readField(body, "attribute")
+            if attribute not in AutoPlantKey.attributeBits:
+                raise HttpError(400, "unknown attribute: " + attribute)
+            return 200, self.store(sessionId, entry, AutoPlantKey.retract(entry[0], attribute))
+        raise HttpError(404, "no such endpoint")
+
+
+#The "text" member of a JSON request body
+def readText(body, required):
+    if not body:
+        if required:
+            raise HttpError(400, "request body must be JSON with a \"text\" member")
+        return ""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise HttpError(400, "request body is not valid JSON")
+    if not isinstance(data, dict) or not isinstance(data.get("text", ""), str):
+        raise HttpError(400, "\"text\" must be a string")
+    if required and not data.get("text"):
+        raise HttpError(400, "request body must be JSON with a \"text\" member")
+    return data.get("text", "")
+
+
+#A required string member of a JSON request body
+def readField(body, field):
+    try:
+        data = json.loads(body or b"null")
+    except ValueError:
+        raise HttpError(400, "request body is not valid JSON")
+    if not isinstance(data, dict) or not isinstance(data.get(field), str) or not data[field]:
+        raise HttpError(400, "request body must be JSON with a \"%s\" member" % field)
+    return data[field]
+
+
+#payload is sent as JSON, or as the Prometheus text format when it is a string
+def encodeResponse(status, payload, keepAlive):
+    if isinstance(payload, str):
+        body = payload.encode("utf-8")
+        contentType = METRICS_CONTENT_TYPE
+    else:
+        body = json.dumps(payload).encode("utf-8")
+        contentType = "application/json"
+    head = ("HTTP/1.1 %d %s\r\n"
+            "Content-Type: %s\r\n"
+            "Content-Length: %d\r\n"
+            "Connection: %s\r\n\r\n") % (status, REASONS.get(status, ""), contentType, len(body),
+                                         "keep-alive" if keepAlive else "close")
+    return head.encode("latin-1") + body
+
+
+#Minimal HTTP/1.1 server with keep-alive, enough for JSON request/response clients
+async def handleConnection(service, reader, writer):
+    try:
+        while True:
+            requestLine = await reader.readline()
+            if not requestLine:
+                break
+            try:
+                method, target, version = requestLine.decode("latin-1").split()
+            except ValueError:
+                writer.write(encodeResponse(400, {"error": "malformed request line"}, False))
+                break
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            keepAlive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            try:
+                length = int(headers.get("content-length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                writer.write(encodeResponse(400, {"error": "invalid Content-Length"}, False))
+                break
+            if length > MAX_BODY:
+                writer.write(encodeResponse(413, {"error": "request body too large"}, False))
+                break
+            body = await reader.readexactly(length) if length else b""
+
+            try:
+                status, payload = await service.handle(method, target, body)
+            except HttpError as e:
+                status, payload = e.status, {"error": e.message}
+            except Exception as e:
+                status, payload = 500, {"error": "%s: %s" % (type(e).__name__, e)}
+
+            writer.write(encodeResponse(status, payload, keepAlive))
+            await writer.drain()
+            if not keepAlive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+#Drop expired sessions in the background as well as on access, so idle sessions do not pile up
+async def evictionLoop(service):
+    interval = max(1.0, service.sessions.ttl / 4)
+    while True:
+        await asyncio.sleep(interval)
+        await service.run(service.sessions.evictExpired)
+
+
+#Write the JSON metrics to a file every interval seconds
+async def metricsDumpLoop(service, path, interval):
+    while True:
+        await asyncio.sleep(interval)
+        await service.run(dumpMetrics, service, path)
+
+
+#Write the JSON metrics to a file atomically, so readers never see a partial file
+def dumpMetrics(service, path):
+    tmpPath = "%s.%d.tmp" % (path, os.getpid())
+    try:
+        with open(tmpPath, "w", encoding="utf-8") as f:
+            json.dump(service.metricsSnapshot(), f)
+        os.replace(tmpPath, path)
+    except OSError:
+        pass
+
+
+async def serve(host, port, ttl, ready=None, metricsFile=None, metricsInterval=60.0):
+    service = IdentificationService(ttl)
+    #load the compiled key and everything else identify() loads lazily before accepting connections
+    AutoPlantKey.warmUp()
+
+    server = await asyncio.start_server(lambda r, w: handleConnection(service, r, w), host, port)
+    tasks = [asyncio.ensure_future(evictionLoop(service))]
+    if metricsFile:
+        tasks.append(asyncio.ensure_future(metricsDumpLoop(service, metricsFile, max(1.0, metricsInterval))))
+    if ready is not None:
+        ready(server.sockets[0].getsockname())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+        service.worker.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AutoPlantKey identification service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL, help="seconds an idle session is kept")
+    parser.add_argument("--metrics-file", default=None, help="also write the JSON metrics to this file periodically")
+    parser.add_argument("--metrics-interval", type=float, default=60.0, help="seconds between metrics file writes")
+    parser.add_argument("--splitter", choices=AutoPlantKey.SPLITTERS, default=AutoPlantKey.sentenceSplitter,
+                        help="how descriptions are split into sentences")
+    args = parser.parse_args(argv)
+    AutoPlantKey.sentenceSplitter = args.splitter
+
+    def ready(address):
+        print("AutoPlantKey service listening on http://%s:%d" % address[:2], flush=True)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.ttl, ready, args.metrics_file, args.metrics_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
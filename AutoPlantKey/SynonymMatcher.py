@@ -0,0 +1,105 @@
+#Single-pass multi-pattern synonym matcher (Aho-Corasick automaton)
+#All synonyms of all attributes are compiled into one automaton, so a sentence is scanned once,
+#in time linear in its length, however many synonyms there are
+#Matches must start and end on word boundaries, so "tan" does not match inside "distant"; fragments, given
+#separately, match anywhere, so the fragment "flor" is found in "inflorescence"
+
+from collections import namedtuple
+
+#One synonym found in a text: the attribute and value it stands for and its offsets in the text
+Hit = namedtuple("Hit", ["attribute", "value", "start", "end"])
+
+#Endings allowed after a synonym, so that "cymes", "rounded", "greenish" and "bellshaped" still match
+SUFFIXES = ("s", "es", "ed", "ish", "shaped", "like")
+
+#Endings that replace the final "e" of a synonym, so that "whitish", "bluish" and "purplish" still match
+STEM_SUFFIXES = ("ish",)
+
+
+class SynonymMatcher:
+
+    #lexicon - attribute name -> {value: [synonyms]}
+    #fragments - attribute name -> {value: [fragments]}, matched without word boundaries
+    def __init__(self, lexicon, suffixes=SUFFIXES, fragments=None):
+        self.suffixes = tuple(suffixes)
+        #goto[state] maps a character to the next state, state 0 is the root
+        self.goto = [{}]
+        #outputs[state] lists (attribute, value, length, kind) of every synonym ending in that state, kind being
+        #"word", "stem" for a synonym without its final "e" or "fragment"
+        self.outputs = [[]]
+        self.fail = [0]
+
+        for attribute, values in lexicon.items():
+            for value, synonyms in values.items():
+                for synonym in synonyms:
+                    synonym = synonym.lower()
+                    self.add(synonym, (attribute, value, len(synonym), "word"))
+                    if len(synonym) > 3 and synonym.endswith("e"):
+                        self.add(synonym[:-1], (attribute, value, len(synonym) - 1, "stem"))
+        for attribute, values in (fragments or {}).items():
+            for value, words in values.items():
+                for word in words:
+                    self.add(word.lower(), (attribute, value, len(word), "fragment"))
+        self.link()
+
+    def add(self, word, output):
+        state = 0
+        for ch in word:
+            nextState = self.goto[state].get(ch)
+            if nextState is None:
+                nextState = len(self.goto)
+                self.goto.append({})
+                self.outputs.append([])
+                self.fail.append(0)
+                self.goto[state][ch] = nextState
+            state = nextState
+        if output not in self.outputs[state]:
+            self.outputs[state].append(output)
+
+    #Breadth-first pass computing failure links and merging the outputs of each failure state
+    def link(self):
+        queue = list(self.goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nextState in self.goto[state].items():
+                queue.append(nextState)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[nextState] = target if target != nextState else 0
+                self.outputs[nextState] = self.outputs[nextState] + self.outputs[self.fail[nextState]]
+
+    #True if a match ending at end is followed by a word boundary, optionally after an allowed suffix
+    #stem - the match is a synonym without its final "e", which has to be followed by one of STEM_SUFFIXES
+    def endsWord(self, text, end, stem=False):
+        if not stem and (end >= len(text) or not text[end].isalnum()):
+            return True
+        for suffix in STEM_SUFFIXES if stem else self.suffixes:
+            if text.startswith(suffix, end):
+                after = end + len(suffix)
+                if after >= len(text) or not text[after].isalnum():
+                    return True
+        return False
+
+    #Every synonym in the text, in order of where it ends
+    def scan(self, text):
+        hits = []
+        goto = self.goto
+        fail = self.fail
+        outputs = self.outputs
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if outputs[state]:
+                end = i + 1
+                for attribute, value, length, kind in outputs[state]:
+                    start = end - length
+                    if kind == "fragment" or ((start == 0 or not text[start - 1].isalnum())
+                                              and self.endsWord(text, end, kind == "stem")):
+                        hits.append(Hit(attribute, value, start, end))
+        return hits
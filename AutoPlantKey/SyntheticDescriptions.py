@@ -0,0 +1,232 @@
+#Synthetic plant descriptions generated from the ontology, for benchmarks and regression checks
+#Every species of the trait index is described from its own trait classes: synonym attributes are written
+#with a random synonym from the lexicon, measured attributes with a value inside the species' interval in a
+#random unit, as digits or number words, and petal numbers as digits or words. Sentences are shuffled and
+#padded with notes that name no trait, and some descriptions put leaves and flowers in the same sentence
+#Run from this directory: python SyntheticDescriptions.py [--per-species N] [--seed S] [--output corpus.jsonl]
+
+import argparse
+import json
+import random
+import sys
+
+import AutoPlantKey
+from Measurements import UNIT_FACTORS, parse_int
+
+#Units each measured attribute is written in
+UNITS = {"leafLength": ["cm", "mm", "centimeters", "in", "inches"],
+         "petalLength": ["mm", "cm", "millimeters"],
+         "plantSize": ["cm", "m", "centimetres", "in", "ft", "feet"]}
+
+#Phrases for each attribute, {} is the synonym or the measurement
+PHRASES = {"color": ["{}", "{}ish", "a pale {}"],
+           "cluster": ["in {} clusters", "clustered in a {}"],
+           "position": ["borne {}", "{}"],
+           "flowerShape": ["{} shaped", "{}-shaped", "{}"],
+           "flowerSymmetry": ["{} in symmetry", "with {} symmetry"],
+           "leafArrangement": ["{}", "arranged {}"],
+           "leafDivision": ["{}", "{} in outline"],
+           "leafMargin": ["{} along the edges", "{}"],
+           "leafShape": ["{} shaped", "{}"],
+           "leafLength": ["{} long", "up to {} long"],
+           "petalLength": ["{} long"],
+           "plantSize": ["{} tall", "{} high"]}
+
+#Sentences for each part of the plant, {} is the list of phrases
+FLOWER_SENTENCES = ["The flowers are {}.", "Flowers {}.", "Its flowers are {}."]
+LEAF_SENTENCES = ["The leaves are {}.", "Leaves {}.", "Its leaves are {}."]
+PETAL_NUMBER_SENTENCES = ["There are {} petals.", "Each has {} petals.", "{} petals."]
+PETAL_SENTENCES = ["Petals {}.", "The petals are {}."]
+PLANT_SENTENCES = ["The plant is {}.", "Plants grow {}.", "It stands {}."]
+
+#Hedges written in front of measurements; "ca." and "approx." also test sentence splitting
+HEDGES = ["about ", "roughly ", "ca. ", "approx. ", "around "]
+
+#Notes that name no trait, no organ and no number
+FILLERS = ["Found near the river in late summer.",
+           "Seen along a shaded trail after rain.",
+           "Growing in moist woods with ferns nearby.",
+           "Photographed on a sunny afternoon!",
+           "Several were growing together by the path.",
+           "Not sure what it is.",
+           "It has a faint sweet scent.",
+           "Bees were visiting it."]
+
+UNITS_WORDS = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven",
+               "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+TENS_WORDS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+
+
+#Number words for 0 to 999, as Measurements.parse_int reads them ("one hundred and twenty five")
+def numberWords(n):
+    if n >= 100:
+        rest = numberWords(n % 100) if n % 100 else ""
+        return UNITS_WORDS[n // 100] + " hundred" + (" and " + rest if rest else "")
+    if n < 20:
+        return UNITS_WORDS[n]
+    return TENS_WORDS[n // 10] + (" " + UNITS_WORDS[n % 10] if n % 10 else "")
+
+
+#Values of every synonym attribute, petal numbers and the interval of every measured attribute of one species
+#Returns attribute name -> list of values, or (low, high) in millimetres for measured attributes
+#Measured attributes the ontology has no data for ([0, inf)) are left out, like values with no class
+def speciesTraits(index, speciesId):
+    bit = 1 << speciesId
+    traits = {}
+    for name, label, groupNames, extractor, classes in AutoPlantKey.attributes:
+        if isinstance(classes, str):
+            low, high, speciesBit = AutoPlantKey.getIntervals()[classes].intervals[speciesId]
+            if low > 0 or high != float("inf"):
+                traits[name] = (low, high)
+            continue
+        values = [value for value, trait in classes.items() if index.speciesFor(trait) & bit]
+        if values:
+            traits[name] = values
+    return traits
+
+
+#A number written in a unit that still reads back strictly inside (low, high) millimetres, None if it does not
+def renderNumber(mm, unit, low, high, words):
+    value = mm / UNIT_FACTORS[unit]
+    if words:
+        if round(value) < 1 or round(value) > 999:
+            return None
+        text = numberWords(int(round(value)))
+    else:
+        text = ("%.0f" if value >= 10 else "%.1f" if value >= 1 else "%.2f") % value
+        text = text.rstrip("0").rstrip(".") if "." in text else text
+        if text == "0":
+            return None
+    back = (float(text) if text[0].isdigit() else float(parse_int(text))) * UNIT_FACTORS[unit]
+    if not low < back < high:
+        return None
+    return text
+
+
+#A measurement or range inside the interval of a species, in a random unit, None if none reads back inside it
+def renderMeasurement(rng, name, low, high):
+    if high == float("inf"):
+        lower, upper = low * 1.1, low * 2
+    elif low == 0:
+        lower, upper = high * 0.3, high * 0.9
+    else:
+        lower, upper = low + (high - low) * 0.15, high - (high - low) * 0.15
+    points = sorted(rng.uniform(lower, upper) for i in range(2 if rng.random() < 0.25 else 1))
+    units = rng.sample(UNITS[name], len(UNITS[name]))
+    words = rng.random() < 0.3
+    for unit in units:
+        for useWords in ((True, False) if words else (False,)):
+            texts = [renderNumber(mm, unit, low, high, useWords) for mm in points]
+            if None in texts:
+                continue
+            if len(texts) == 2 and texts[0] != texts[1]:
+                number = texts[0] + (" to " if useWords or rng.random() < 0.5 else "-") + texts[1]
+            else:
+                number = texts[0]
+            hedge = rng.choice(HEDGES) if rng.random() < 0.3 else ""
+            return hedge + number + " " + unit
+    return None
+
+
+def phrase(rng, name, text):
+    return rng.choice(PHRASES[name]).format(text)
+
+
+#"a", "a and b", "a, b and c"
+def joinPhrases(phrases):
+    if len(phrases) == 1:
+        return phrases[0]
+    return ", ".join(phrases[:-1]) + " and " + phrases[-1]
+
+
+#Description of one species as (text, names of the attributes it describes)
+#coverage - chance that each known attribute is described, noise - chance of each filler note and of
+#writing a sentence in lower case, mixed - chance that one leaf phrase goes in the flower sentence
+def describeSpecies(index, speciesId, rng, coverage=0.7, noise=0.3, mixed=0.1):
+    traits = speciesTraits(index, speciesId)
+    described = [name for name in traits if rng.random() < coverage]
+    if not described and traits:
+        described = [rng.choice(list(traits))]
+
+    groups = {"flower": [], "leaf": [], "petal": [], "plant": []}
+    petalNumber = None
+    for name in described:
+        found = traits[name]
+        if name == "petalNumber":
+            number = rng.choice(found)
+            petalNumber = numberWords(number) if rng.random() < 0.5 else str(number)
+            continue
+        if isinstance(found, tuple):
+            text = renderMeasurement(rng, name, found[0], found[1])
+            if text is None:
+                continue
+        else:
+            value = rng.choice(found)
+            text = rng.choice(AutoPlantKey.synonyms[name][value])
+        groupName = AutoPlantKey.attributeGroups[name][0]
+        groups[groupName].append((name, phrase(rng, name, text)))
+
+    sentences = []
+    if groups["flower"]:
+        sentence = rng.choice(FLOWER_SENTENCES).format(joinPhrases([p for n, p in groups["flower"]]))
+        if groups["leaf"] and rng.random() < mixed:
+            name, leafPhrase = groups["leaf"].pop(rng.randrange(len(groups["leaf"])))
+            sentence = sentence[:-1] + ", and the leaves are " + leafPhrase + "."
+        sentences.append(sentence)
+    if groups["leaf"]:
+        sentences.append(rng.choice(LEAF_SENTENCES).format(joinPhrases([p for n, p in groups["leaf"]])))
+    if petalNumber is not None:
+        sentences.append(rng.choice(PETAL_NUMBER_SENTENCES).format(petalNumber))
+    if groups["petal"]:
+        sentences.append(rng.choice(PETAL_SENTENCES).format(joinPhrases([p for n, p in groups["petal"]])))
+    if groups["plant"]:
+        sentences.append(rng.choice(PLANT_SENTENCES).format(joinPhrases([p for n, p in groups["plant"]])))
+    sentences.extend(filler for filler in FILLERS if rng.random() < noise / len(FILLERS) * 2)
+    rng.shuffle(sentences)
+
+    written = []
+    for sentence in sentences:
+        if rng.random() < noise / 3:
+            sentence = sentence.lower()
+        else:
+            sentence = sentence[0].upper() + sentence[1:]
+        written.append(sentence)
+    return (" " if rng.random() > noise / 3 else "  ").join(written), described
+
+
+#Records of a synthetic corpus as dicts of id, species, text and the attributes described, in a fixed order
+#for a given seed: perSpecies descriptions of every species of the index in turn
+def generateDescriptions(index=None, perSpecies=1, seed=0, coverage=0.7, noise=0.3, mixed=0.1):
+    if index is None:
+        index = AutoPlantKey.getIndex()
+    rng = random.Random(seed)
+    number = 0
+    for repeat in range(perSpecies):
+        for speciesId, species in enumerate(index.species):
+            number += 1
+            text, described = describeSpecies(index, speciesId, rng, coverage, noise, mixed)
+            yield {"id": number, "species": species, "text": text, "attributes": described}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic descriptions of every species of the ontology")
+    parser.add_argument("--per-species", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--coverage", type=float, default=0.7, help="chance that each known attribute is described")
+    parser.add_argument("--noise", type=float, default=0.3, help="amount of filler notes and lower-case sentences")
+    parser.add_argument("--mixed", type=float, default=0.1, help="chance of a sentence about leaves and flowers")
+    parser.add_argument("--output", default="-", help="JSONL file, - for stdout")
+    args = parser.parse_args(argv)
+
+    outStream = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for record in generateDescriptions(None, args.per_species, args.seed, args.coverage, args.noise, args.mixed):
+            outStream.write(json.dumps(record) + "\n")
+    finally:
+        if outStream is not sys.stdout:
+            outStream.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+#Opt-in tracing of the identification pipeline
+#A Tracer collects span timings (sentence splitting, normalisation, routing, each extractor, each ontology
+#query, narrowing, the next question) and counters such as queries issued and candidates eliminated
+#Nothing is traced unless a Tracer is installed with AutoPlantKey.tracing(); without one the pipeline only
+#checks a module global for None at each stage
+#A Tracer is meant for one thread at a time, like the console and the asyncio service
+
+import time
+
+
+class Tracer:
+
+    #sink - called as sink(span name, seconds) for every span as it ends, e.g. to log slow stages
+    def __init__(self, sink=None, clock=time.perf_counter):
+        self.sink = sink
+        self.clock = clock
+        #span name -> [count, total seconds, longest seconds]
+        self.spans = {}
+        #counter name -> value
+        self.counters = {}
+
+    #Start time of a span, passed back to end()
+    def start(self):
+        return self.clock()
+
+    #End a span started at started, returns the end time so that the next span can start from it
+    def end(self, name, started):
+        now = self.clock()
+        elapsed = now - started
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [1, elapsed, elapsed]
+        else:
+            span[0] += 1
+            span[1] += elapsed
+            if elapsed > span[2]:
+                span[2] = elapsed
+        if self.sink is not None:
+            self.sink(name, elapsed)
+        return now
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        self.spans.clear()
+        self.counters.clear()
+
+    #Spans as name -> {"count", "totalMs", "meanUs", "maxUs"} and the counters, for printing or JSON
+    def stats(self):
+        spans = {}
+        for name, (count, total, longest) in self.spans.items():
+            spans[name] = {"count": count, "totalMs": round(total * 1000, 3),
+                           "meanUs": round(total / count * 1e6, 2), "maxUs": round(longest * 1e6, 2)}
+        return {"spans": spans, "counters": dict(self.counters)}
+
+    #Table of the spans, longest total first, followed by the counters
+    def report(self):
+        lines = ["%-28s %8s %12s %10s %10s" % ("span", "count", "total ms", "mean us", "max us")]
+        for name, span in sorted(self.stats()["spans"].items(), key=lambda item: -item[1]["totalMs"]):
+            lines.append("%-28s %8d %12.3f %10.2f %10.2f" % (name, span["count"], span["totalMs"],
+                                                            span["meanUs"], span["maxUs"]))
+        for name, value in sorted(self.counters.items()):
+            lines.append("%-28s %8d" % (name, value))
+        return "\n".join(lines)
@@ -0,0 +1,242 @@
+#Compiled trait-to-species index for the Rubiaceae ontology
+#Every trait class is mapped to an integer bitset over species IDs, so narrowing the
+#candidate species for an attribute is a bitwise AND instead of an ontology search
+#The compiled index is persisted as a binary snapshot next to the .owl file, keyed by the
+#file's content hash, so that short-lived processes never have to parse the ontology
+
+import hashlib
+import os
+import pickle
+import sys
+
+from Bitsets import memberIds, popcount
+
+#Class under which every species in the ontology is declared
+SPECIES_ROOT = "Wildflower"
+
+#Class under which every trait (colour, cluster type, leaf length bucket...) is declared
+TRAIT_ROOT = "Characteristic"
+
+#Bumped whenever the snapshot layout changes so that stale snapshots are rebuilt
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EXTENSION = ".snapshot"
+
+#How .owl files are compiled when there is no usable snapshot
+#"stream" reads the OWL/XML directly, "owlready2" goes through the full quadstore and is only
+#needed when the ontology relies on axioms beyond plain named SubClassOf
+LOADERS = ("stream", "owlready2")
+DEFAULT_LOADER = "stream"
+
+
+class TraitIndex:
+
+    def __init__(self, species, traitBits, labels=None, closure=None, ontologyHash=None):
+        #species ID -> species class name, IDs are bit positions in every bitset
+        self.species = list(species)
+        self.speciesIds = {name: i for i, name in enumerate(self.species)}
+        #trait class name -> bitset of the species that are (transitively) subclasses of it
+        self.traitBits = dict(traitBits)
+        self.labels = dict(labels or {})
+        #class name -> tuple of all of its named superclasses
+        self.closure = dict(closure or {})
+        #content hash of the .owl file the index was compiled from
+        self.ontologyHash = ontologyHash
+        self.allSpecies = (1 << len(self.species)) - 1
+        #number of species with each trait, used to estimate how selective a trait is
+        self.traitCounts = {trait: popcount(bits) for trait, bits in self.traitBits.items()}
+
+    #Bitset of the species that have the given trait, 0 for unknown traits
+    def speciesFor(self, traitName):
+        return self.traitBits.get(traitName, 0)
+
+    #Union of the species that have any of the given traits
+    def anyOf(self, traitNames):
+        bits = 0
+        for traitName in traitNames:
+            bits |= self.traitBits.get(traitName, 0)
+        return bits
+
+    #Species class names for a bitset, in species ID order
+    def names(self, bits):
+        species = self.species
+        return [species[i] for i in memberIds(bits)]
+
+    #Number of species in a bitset
+    def count(self, bits):
+        return popcount(bits)
+
+
+#Build the index from a loaded owlready2 ontology
+#Species are all subclasses of Wildflower, traits are every other class a species descends from,
+#plus every Characteristic subclass even if no species currently has it
+def buildFromOntology(onto, ontologyHash=None):
+    speciesRoot = onto[SPECIES_ROOT]
+    speciesClasses = sorted(speciesRoot.descendants(include_self=False), key=lambda c: c.name)
+
+    species = [c.name for c in speciesClasses]
+    traitBits = {}
+    labels = {}
+
+    traitRoot = onto[TRAIT_ROOT]
+    if traitRoot is not None:
+        for trait in traitRoot.descendants(include_self=True):
+            traitBits[trait.name] = 0
+
+    for i, speciesClass in enumerate(speciesClasses):
+        bit = 1 << i
+        for ancestor in speciesClass.ancestors(include_self=False):
+            if ancestor.namespace.ontology is not onto:
+                continue
+            traitBits[ancestor.name] = traitBits.get(ancestor.name, 0) | bit
+
+    closure = {}
+    for ontoClass in onto.classes():
+        if ontoClass.label:
+            labels[ontoClass.name] = str(ontoClass.label[0])
+        closure[ontoClass.name] = tuple(sorted(a.name for a in ontoClass.ancestors(include_self=False)
+                                               if a.namespace.ontology is onto))
+
+    return TraitIndex(species, traitBits, labels, closure, ontologyHash)
+
+
+#Build the index from a plain class graph as returned by OwlXmlLoader.parseOwlXml
+#Gives the same index as buildFromOntology for ontologies made of named SubClassOf axioms
+def buildFromGraph(classes, parents, labels, ontologyHash=None):
+    closure = {}
+    for name in classes:
+        if name in closure:
+            continue
+        #iterative depth-first walk so deep hierarchies cannot hit the recursion limit
+        stack = [name]
+        while stack:
+            current = stack[-1]
+            pending = [p for p in parents.get(current, ()) if p not in closure and p != current]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if current in closure:
+                continue
+            ancestors = set()
+            for p in parents.get(current, ()):
+                if p != current:
+                    ancestors.add(p)
+                    ancestors.update(closure[p])
+            closure[current] = tuple(sorted(ancestors))
+
+    species = sorted(name for name in classes if SPECIES_ROOT in closure[name])
+
+    traitBits = {}
+    for name in classes:
+        if name == TRAIT_ROOT or TRAIT_ROOT in closure[name]:
+            traitBits[name] = 0
+
+    for i, name in enumerate(species):
+        bit = 1 << i
+        for ancestor in closure[name]:
+            traitBits[ancestor] = traitBits.get(ancestor, 0) | bit
+
+    return TraitIndex(species, traitBits, labels, closure, ontologyHash)
+
+
+#Load the .owl file through owlready2 and compile it
+def buildWithOwlready2(owlPath, ontologyHash=None):
+    from owlready2 import World
+
+    world = World()
+    onto = world.get_ontology("file://" + os.path.abspath(owlPath)).load()
+    index = buildFromOntology(onto, ontologyHash)
+    world.close()
+    return index
+
+
+#Compile an .owl file with the chosen loader
+def buildFromOwl(owlPath, ontologyHash=None, loader=DEFAULT_LOADER):
+    if loader == "stream":
+        from OwlXmlLoader import parseOwlXml
+
+        classes, parents, labels = parseOwlXml(owlPath)
+        return buildFromGraph(classes, parents, labels, ontologyHash)
+    if loader == "owlready2":
+        return buildWithOwlready2(owlPath, ontologyHash)
+    raise ValueError("Unknown ontology loader: " + str(loader))
+
+
+#SHA-256 of the .owl file contents, used to key the snapshot
+def hashOwl(owlPath):
+    digest = hashlib.sha256()
+    with open(owlPath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshotPath(owlPath):
+    return os.path.splitext(owlPath)[0] + SNAPSHOT_EXTENSION
+
+
+#Write the compiled index as a compact binary snapshot
+#The file is written to a temporary name and renamed so concurrent workers never see a partial snapshot
+def saveSnapshot(index, path):
+    data = {"version": SNAPSHOT_VERSION,
+            "ontologyHash": index.ontologyHash,
+            "species": index.species,
+            "traitBits": index.traitBits,
+            "labels": index.labels,
+            "closure": index.closure}
+    tmpPath = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmpPath, "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpPath, path)
+
+
+#Read a snapshot, returns None if it is missing, unreadable, from another layout version
+#or compiled from a different version of the ontology
+def loadSnapshot(path, ontologyHash=None):
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        return None
+
+    if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+        return None
+    if ontologyHash is not None and data.get("ontologyHash") != ontologyHash:
+        return None
+
+    return TraitIndex(data["species"], data["traitBits"], data["labels"],
+                      data["closure"], data["ontologyHash"])
+
+
+#Runtime entry point: return the compiled index for an .owl file, using the snapshot when it
+#matches the file's current content hash and rebuilding (and re-saving) it otherwise
+def loadIndex(owlPath, loader=DEFAULT_LOADER):
+    ontologyHash = hashOwl(owlPath)
+    path = snapshotPath(owlPath)
+
+    index = loadSnapshot(path, ontologyHash)
+    if index is not None:
+        return index
+
+    index = buildFromOwl(owlPath, ontologyHash, loader)
+    try:
+        saveSnapshot(index, path)
+    except OSError:
+        #read-only deployments still work, they just compile on every start
+        pass
+    return index
+
+
+#Build step: python TraitIndex.py [--loader stream|owlready2] [Rubiaceae_of_WI.owl ...]
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    loader = DEFAULT_LOADER
+    if args[:1] == ["--loader"]:
+        loader = args[1]
+        args = args[2:]
+    owlPaths = args or [os.path.join(os.path.dirname(os.path.abspath(__file__)), "Rubiaceae_of_WI.owl")]
+    for owlPath in owlPaths:
+        index = buildFromOwl(owlPath, hashOwl(owlPath), loader)
+        saveSnapshot(index, snapshotPath(owlPath))
+        print("%s: %d species, %d trait classes -> %s" % (owlPath, len(index.species),
+                                                        len(index.traitBits), snapshotPath(owlPath)))
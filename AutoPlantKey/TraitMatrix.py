@@ -0,0 +1,64 @@
+#Species x trait matrix for ranked partial matching
+#Filtering keeps only the species that agree with every described trait; ranking instead scores every
+#species by how much of the description it agrees with, so one mis-read attribute does not empty the result
+#The matrix holds one row per species and one column per trait class of the trait index, and a whole
+#description is scored with one matrix-vector product
+#numpy is imported when the matrix is first built; without numpy, rankBitsets() gives the same ranking
+
+from Bitsets import memberIds
+
+
+#Species x trait matrix of a TraitIndex
+class TraitMatrix:
+
+    def __init__(self, index):
+        import numpy
+        self.numpy = numpy
+        self.species = index.species
+        self.traits = sorted(index.traitBits)
+        self.columns = {trait: i for i, trait in enumerate(self.traits)}
+
+        #the species bitsets of the index, unpacked into columns
+        width = (len(self.species) + 7) // 8
+        packed = numpy.frombuffer(b"".join(index.traitBits[trait].to_bytes(width, "little") for trait in self.traits),
+                                  dtype=numpy.uint8).reshape(len(self.traits), width)
+        bits = numpy.unpackbits(packed, axis=1, bitorder="little")[:, :len(self.species)]
+        self.matrix = numpy.ascontiguousarray(bits.T, dtype=numpy.float32)
+
+    #Query vector for trait class -> weight, trait classes unknown to the matrix are ignored
+    def queryVector(self, traitWeights):
+        query = self.numpy.zeros(len(self.traits), dtype=self.numpy.float32)
+        for trait, weight in traitWeights.items():
+            column = self.columns.get(trait)
+            if column is not None:
+                query[column] += weight
+        return query
+
+    #Score of every species, in species ID order
+    def score(self, traitWeights):
+        return self.matrix @ self.queryVector(traitWeights)
+
+    #The k best scoring species as (species, score), best first, ties in species ID order
+    def top(self, traitWeights, k=5):
+        scores = self.score(traitWeights)
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        numpy = self.numpy
+        #k-th best score without sorting every species, then the species tied with it in ID order
+        kth = -numpy.partition(-scores, k - 1)[k - 1]
+        above = numpy.flatnonzero(scores > kth)
+        tied = numpy.flatnonzero(scores == kth)[:k - len(above)]
+        best = numpy.concatenate((above, tied))
+        best = best[numpy.lexsort((best, -scores[best]))]
+        return [(self.species[i], float(scores[i])) for i in best]
+
+
+#Ranking without numpy, straight from the species bitsets of the index
+def rankBitsets(index, traitWeights, k=5):
+    scores = [0.0] * len(index.species)
+    for trait, weight in traitWeights.items():
+        for i in memberIds(index.traitBits.get(trait, 0)):
+            scores[i] += weight
+    best = sorted(range(len(scores)), key=lambda i: (-scores[i], i))[:max(k, 0)]
+    return [(index.species[i], scores[i]) for i in best]
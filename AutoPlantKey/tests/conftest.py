@@ -0,0 +1,5 @@
+#The modules of AutoPlantKey import each other as top-level modules, so tests run with its directory on the path
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,113 @@
+#Tests of the batch identification CLI
+
+import io
+import json
+import multiprocessing
+import threading
+
+import AutoPlantKey
+import Batch
+
+DESCRIPTIONS = ["White flowers. Leaves whorled.", "Blue flowers with 4 petals.", "Yellow flowers.",
+                "Leaves opposite and linear.", "Pink bell shaped flowers."]
+
+
+def jsonlInput():
+    lines = []
+    for number, text in enumerate(DESCRIPTIONS * 4, 1):
+        lines.append(json.dumps({"id": "r%d" % number, "text": text}))
+    lines.insert(3, "not json")
+    lines.insert(7, json.dumps(["a", "list"]))
+    lines.insert(11, json.dumps({"id": "empty", "text": "  "}))
+    lines.insert(13, "")
+    return "\n".join(lines) + "\n"
+
+
+def runLines(text, inputFormat, workers):
+    output = io.StringIO()
+    count, elapsed = Batch.runBatch(io.StringIO(text), output, inputFormat, workers, 2)
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert count == len(lines)
+    return lines
+
+
+def test_jsonl_records_and_errors_in_input_order():
+    records = list(Batch.readRecords(io.StringIO(jsonlInput()), "jsonl"))
+    assert [record[0] for record in records[:5]] == ["r1", "r2", "r3", 4, "r4"]
+    assert records[3] == (4, None, "line is not valid JSON")
+    assert (8, None, "line is not a JSON object") in records
+    assert ("empty", None, "record has no \"text\" or \"description\"") in records
+    assert len(records) == len(DESCRIPTIONS) * 4 + 3
+
+
+def test_csv_records_need_a_text_column():
+    text = "id,description\nfirst,White flowers.\n,Yellow flowers.\nthird,\n"
+    records = list(Batch.readRecords(io.StringIO(text), "csv"))
+    assert records == [("first", "White flowers.", None), (2, "Yellow flowers.", None),
+                       ("third", None, "record has no \"text\" or \"description\"")]
+    assert list(Batch.readRecords(io.StringIO("id,notes\n1,White flowers.\n"), "csv"))[0][2] is not None
+
+
+def test_batch_results_keep_input_order_and_match_identify():
+    single = runLines(jsonlInput(), "jsonl", 1)
+    pooled = runLines(jsonlInput(), "jsonl", 2)
+    assert pooled == single
+    assert [line["id"] for line in single] == [record[0] for record in
+                                              Batch.readRecords(io.StringIO(jsonlInput()), "jsonl")]
+    assert single[3] == {"id": 4, "error": "line is not valid JSON"}
+    result = AutoPlantKey.identify(DESCRIPTIONS[1])
+    assert single[1]["candidates"] == result.candidates
+    assert single[1]["traits"] == result.traits
+
+
+def workerSplitter(number):
+    return AutoPlantKey.sentenceSplitter
+
+
+def test_workers_that_are_not_forked_use_the_selected_splitter(monkeypatch):
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    monkeypatch.setattr(multiprocessing, "Pool", multiprocessing.get_context("spawn").Pool)
+    monkeypatch.setattr(AutoPlantKey, "sentenceSplitter", "selected")
+    with Batch.workerPool(1) as pool:
+        assert pool.map(workerSplitter, [1, 2]) == ["selected", "selected"]
+
+
+def test_pipeline_keeps_input_order_and_count():
+    expected = runLines(jsonlInput(), "jsonl", 1)
+    for workers, window in ((1, 256), (2, 3), (2, 1)):
+        output = io.StringIO()
+        count, elapsed = Batch.runPipeline(io.StringIO(jsonlInput()), output, "jsonl", workers, window)
+        assert count == len(expected)
+        assert [json.loads(line) for line in output.getvalue().splitlines()] == expected
+
+
+#Output stream that notes the ids written, and signals once the first result is out
+class RecordingOutput:
+
+    def __init__(self):
+        self.ids = []
+        self.firstWritten = threading.Event()
+
+    def write(self, line):
+        self.ids.append(json.loads(line)["id"])
+        self.firstWritten.set()
+
+    def flush(self):
+        pass
+
+
+def test_pipeline_writes_a_result_before_the_next_record_arrives():
+    for workers in (1, 2):
+        output = RecordingOutput()
+        waited = []
+
+        #the second record only arrives once the first result was written, or after a timeout
+        def stream():
+            yield json.dumps({"id": "first", "text": DESCRIPTIONS[0]}) + "\n"
+            waited.append(output.firstWritten.wait(10))
+            yield json.dumps({"id": "second", "text": DESCRIPTIONS[1]}) + "\n"
+
+        count, elapsed = Batch.runPipeline(stream(), output, "jsonl", workers, 8)
+        assert waited == [True]
+        assert output.ids == ["first", "second"]
+        assert count == 2
@@ -0,0 +1,35 @@
+#Tests of the species bitset helpers
+
+import random
+
+from Bitsets import bitsetOf, memberIds, popcount
+
+
+def test_bitset_of_species_ids():
+    assert bitsetOf([]) == 0
+    assert bitsetOf([0, 2, 5]) == 0b100101
+    assert bitsetOf([3, 3, 3]) == 0b1000
+    assert bitsetOf(range(70)) == (1 << 70) - 1
+
+
+def test_member_ids_in_increasing_order():
+    assert memberIds(0) == []
+    assert memberIds(1) == [0]
+    assert memberIds(0b100101) == [0, 2, 5]
+    assert memberIds(1 << 200) == [200]
+
+
+def test_round_trip_on_large_bitsets():
+    rng = random.Random(0)
+    for count in (1, 63, 64, 65, 1000):
+        bits = rng.getrandbits(count)
+        ids = memberIds(bits)
+        assert ids == [i for i in range(count) if bits >> i & 1]
+        assert bitsetOf(ids) == bits
+        assert popcount(bits) == len(ids)
+
+
+def test_popcount():
+    assert popcount(0) == 0
+    assert popcount(0b1011) == 3
+    assert popcount((1 << 130) - 1) == 130
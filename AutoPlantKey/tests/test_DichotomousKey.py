@@ -0,0 +1,124 @@
+#Tests of the compiled dichotomous key and of answering its questions
+
+import pickle
+
+import AutoPlantKey
+from DichotomousKey import compileKey, loadKey, saveKey
+from TraitIndex import TraitIndex
+
+#Four species: "halves" splits them in two pairs, "other" in two other pairs, "each" tells all of them apart
+ANSWERS = {"halves": [0b0011, 0b1100], "other": [0b0101, 0b1010], "each": [0b0001, 0b0010, 0b0100, 0b1000]}
+
+
+def fourSpecies():
+    return TraitIndex(["Species%d" % i for i in range(4)], {}, ontologyHash="hash")
+
+
+#Every node of the key, walked from the root: (candidates, node)
+def walk(key):
+    seen = {}
+    stack = [key.root]
+    while stack:
+        candidates = stack.pop()
+        if candidates not in seen:
+            seen[candidates] = key.nodes[candidates]
+            if seen[candidates] is not None:
+                stack.extend(seen[candidates][1].values())
+    return seen
+
+
+def test_key_has_the_least_depth():
+    index = fourSpecies()
+    key = compileKey(index, ["halves", "other", "each"], ANSWERS)
+    assert key.question(index.allSpecies) == "each"
+    assert key.depth() == 1
+    assert key.nodeCount() == 1
+    assert key.follow(index.allSpecies, "each", 0b0100) == 0b0100
+    assert key.follow(index.allSpecies, "halves", 0b0011) is None
+    assert key.follow(index.allSpecies, "each", 0b0011) is None
+
+
+def test_ties_follow_the_order_of_attributes():
+    index = fourSpecies()
+    key = compileKey(index, ["other", "halves"], ANSWERS)
+    assert key.question(index.allSpecies) == "other"
+    assert key.question(0b0101) == "halves"
+    assert key.depth() == 2
+    assert key.nodeCount() == 3
+    assert compileKey(index, ["halves", "other"], ANSWERS).question(index.allSpecies) == "halves"
+
+
+def test_key_singles_out_species_before_keeping_shallow():
+    index = fourSpecies()
+    #"pairs" singles out two species in one question, "firstPair" then "pairs" singles out three
+    answers = {"pairs": [0b0001, 0b0010], "firstPair": [0b0011, 0b0100]}
+    key = compileKey(index, ["pairs", "firstPair"], answers)
+    assert key.question(index.allSpecies) == "firstPair"
+    assert key.question(0b0011) == "pairs"
+    assert key.question(0b0100) is None
+    assert key.depth() == 2
+    assert key.knows(0b0100)
+    assert not key.knows(0b1000)
+    assert key.question(0b0111) is None
+
+
+def test_ontology_key_narrows_at_every_node():
+    index = AutoPlantKey.getIndex()
+    key = AutoPlantKey.getKey()
+    answers = AutoPlantKey.getAnswers()
+    nodes = walk(key)
+    assert key.root == index.allSpecies
+    assert sum(1 for node in nodes.values() if node is not None) == key.nodeCount()
+    for candidates, node in nodes.items():
+        if node is None:
+            continue
+        attribute, branches = node
+        for answerBits, child in branches.items():
+            assert answerBits in answers[attribute]
+            assert child == candidates & answerBits
+            assert child and index.count(child) < index.count(candidates)
+    singledOut = sum(1 for candidates, node in nodes.items() if node is None and index.count(candidates) == 1)
+    assert singledOut > len(index.species) // 2
+
+
+def test_saved_key_loads_only_for_its_ontology_and_answers(tmp_path):
+    index = fourSpecies()
+    key = compileKey(index, ["halves", "other", "each"], ANSWERS, index.ontologyHash)
+    path = str(tmp_path / "test.key")
+    saveKey(key, path)
+    loaded = loadKey(path, "hash", ANSWERS)
+    assert (loaded.root, loaded.nodes, loaded.answers) == (key.root, key.nodes, key.answers)
+    assert loadKey(path, "other hash", ANSWERS) is None
+    assert loadKey(path, "hash", dict(ANSWERS, each=[0b1111])) is None
+    assert loadKey(str(tmp_path / "missing.key"), "hash") is None
+    with open(path, "wb") as f:
+        f.write(b"not a pickle")
+    assert loadKey(path) is None
+    with open(path, "wb") as f:
+        pickle.dump({"version": -1}, f)
+    assert loadKey(path) is None
+
+
+def test_answer_to_the_key_question_follows_its_branch():
+    index = AutoPlantKey.getIndex()
+    key = AutoPlantKey.getKey()
+    asked = key.question(index.allSpecies)
+    assert asked == "leafShape"
+    values, matched = AutoPlantKey.followKey(AutoPlantKey.normalizeSentences("Linear."), index.allSpecies, 0, asked)
+    assert values == ["linear"]
+    assert matched == AutoPlantKey.readAttribute(asked, ["linear"])[1]
+    assert key.follow(index.allSpecies, asked, matched) == index.allSpecies & matched
+
+
+def test_answers_off_the_key_are_read_like_any_other():
+    index = AutoPlantKey.getIndex()
+    asked = AutoPlantKey.getKey().question(index.allSpecies)
+    linear = AutoPlantKey.normalizeSentences("Linear.")
+    assert AutoPlantKey.followKey(linear, index.allSpecies, AutoPlantKey.attributeBits[asked], asked) is None
+    assert AutoPlantKey.followKey(AutoPlantKey.normalizeSentences("White."), index.allSpecies, 0, "color") is None
+    assert AutoPlantKey.followKey(linear, index.allSpecies & ~1, 0, asked) is None
+    assert AutoPlantKey.followKey(AutoPlantKey.normalizeSentences("Hairy."), index.allSpecies, 0, asked) is None
+    both = AutoPlantKey.normalizeSentences("Linear or wider in the middle.")
+    assert AutoPlantKey.followKey(both, index.allSpecies, 0, asked) is None
+    assert AutoPlantKey.identify("Linear or wider in the middle.", None, asked).traits["leafShape"] == ["linear",
+                                                                                                       "widerMiddle"]
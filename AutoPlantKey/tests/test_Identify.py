@@ -0,0 +1,88 @@
+#Regression tests for the identify() API and its sessions
+
+import AutoPlantKey
+
+
+def test_punctuation_only_answer_reads_nothing():
+    for text in (".", "?", "-", "!!!"):
+        for answering in ("color", "petalLength", "petalNumber"):
+            result = AutoPlantKey.identify(text, None, answering)
+            assert result.traits == {}
+            assert len(result.candidates) == len(AutoPlantKey.getIndex().species)
+
+
+def test_petal_number_ignores_empty_sentences():
+    assert AutoPlantKey.checkPetalNumbers(["", "flowers with 4 petals"]) == [4]
+
+
+def test_session_that_ruled_out_every_species_stays_empty():
+    first = AutoPlantKey.identify("Blue flowers with 5 petals.")
+    assert first.candidates == []
+    second = AutoPlantKey.identify("The leaves are opposite.", first.session)
+    assert second.candidates == []
+    assert second.resolved
+    assert {"color", "petalNumber"} <= set(AutoPlantKey.usedAttributes(second.session.used))
+
+
+def test_retracting_the_only_constraint_starts_over():
+    first = AutoPlantKey.identify("Blue flowers.")
+    result = AutoPlantKey.retract(first.session, "color")
+    assert len(result.candidates) == len(AutoPlantKey.getIndex().species)
+    assert AutoPlantKey.identify("White flowers.", result.session).candidates
+
+
+def test_answer_that_follows_the_key_keeps_the_other_traits():
+    asked = AutoPlantKey.getKey().question(AutoPlantKey.getIndex().allSpecies)
+    assert asked == "leafShape"
+    answered = AutoPlantKey.identify("Linear. The leaves are also opposite, and the flowers are white.", None, asked)
+    assert answered.traits == {"leafShape": ["linear"], "leafArrangement": ["opposite"], "color": ["white"]}
+    described = AutoPlantKey.identify("The leaves are linear and opposite, and the flowers are white.")
+    assert answered.candidates == described.candidates
+    assert len(answered.candidates) == 2
+
+
+def test_single_species_left_is_checked_against_the_rest_of_the_description():
+    assert AutoPlantKey.identify("Yellow flowers.").candidates == ["Galium_verum"]
+    for text in ("Yellow flowers. Leaves opposite.", "Yellow flowers with 5 petals.", "Yellow flowers. Leaves basal.",
+                 "Yellow flowers. Plant 300 cm tall."):
+        result = AutoPlantKey.identify(text)
+        assert result.candidates == []
+        assert result.resolved
+    assert AutoPlantKey.identify("Yellow flowers. Leaves whorled.").candidates == ["Galium_verum"]
+
+
+def test_traits_read_after_every_species_was_ruled_out_are_reported():
+    result = AutoPlantKey.identify("Yellow flowers in a spike. Leaves 3 cm long. Plant 30 cm tall.")
+    assert result.candidates == []
+    assert result.traits == {"color": ["yellow"], "cluster": ["spike"], "leafLength": [3.0], "plantSize": [30.0]}
+
+
+def test_retract_keeps_traits_left_unapplied_once_settled():
+    result = AutoPlantKey.identify("Blue flowers. Leaves hairy.")
+    assert len(result.candidates) == 1
+    retracted = AutoPlantKey.retract(result.session, "leafMargin")
+    assert retracted.candidates == AutoPlantKey.identify("Blue flowers.").candidates
+
+
+def test_retract_keeps_measurements_read_after_every_species_was_ruled_out():
+    result = AutoPlantKey.identify("Pink flowers. Leaves basal. Petals 2 mm long.")
+    assert result.candidates == []
+    assert result.traits["petalLength"] == [2.0]
+    assert "petalLength" in AutoPlantKey.usedAttributes(result.session.used)
+    retracted = AutoPlantKey.retract(result.session, "leafArrangement")
+    assert retracted.candidates == AutoPlantKey.identify("Pink flowers. Petals 2 mm long.").candidates
+    assert retracted.candidates == ["Sherardia_arvensis"]
+
+
+def test_undo_history_is_capped():
+    session = None
+    for turn in range(AutoPlantKey.UNDO_DEPTH + 5):
+        session = AutoPlantKey.identify("White flowers.", session).session
+    depth = 0
+    node = session
+    while node.previous is not None:
+        depth += 1
+        node = node.previous
+    assert depth == AutoPlantKey.UNDO_DEPTH
+    assert AutoPlantKey.sessionTurns(session) == AutoPlantKey.UNDO_DEPTH + 5
+    assert AutoPlantKey.undo(session).session.turns == AutoPlantKey.UNDO_DEPTH + 4
@@ -0,0 +1,52 @@
+#Tests of the interval index derived from numeric bucket classes
+
+from IntervalIndex import buildIntervals, parseBucketNumber
+from TraitIndex import TraitIndex
+
+INFINITY = float("inf")
+
+
+#Index of count species where species 0 has leaves at most 5 cm long, species 1 leaves between 2 and 10 cm
+#and the last species leaves at most 10 cm; the others have no leaf length data
+def leafIndex(count=3):
+    last = 1 << (count - 1)
+    traitBits = {"Leaf_MaxLengthInCM": 0b011 | last, "FiveLeaf_MaxLengthInCM": 0b001,
+                 "TenLeaf_MaxLengthInCM": 0b010 | last, "Leaf_MinLengthInCM": 0b010, "TwoLeaf_MinLengthInCM": 0b010}
+    closure = {"FiveLeaf_MaxLengthInCM": ("Characteristic", "Leaf_MaxLengthInCM"),
+               "TenLeaf_MaxLengthInCM": ("Characteristic", "Leaf_MaxLengthInCM"),
+               "TwoLeaf_MinLengthInCM": ("Characteristic", "Leaf_MinLengthInCM"),
+               "Leaf_MaxLengthInCM": ("Characteristic",), "Leaf_MinLengthInCM": ("Characteristic",)}
+    return TraitIndex(["Species%d" % i for i in range(count)], traitBits, closure=closure)
+
+
+def test_bucket_numbers():
+    assert parseBucketNumber("12") == 12.0
+    assert parseBucketNumber("Five") == 5.0
+    assert parseBucketNumber("OneHundred") == 100.0
+    assert parseBucketNumber("Tiny") is None
+    assert parseBucketNumber("five") is None
+
+
+def test_species_intervals_from_bucket_classes():
+    leaf = buildIntervals(leafIndex())["Leaf_Length"]
+    assert leaf.intervals == [(0.0, 50.0, 0b001), (20.0, 100.0, 0b010), (0.0, 100.0, 0b100)]
+    assert sorted(name for name, bound, value in leaf.buckets) == ["FiveLeaf_MaxLengthInCM", "TenLeaf_MaxLengthInCM",
+                                                                   "TwoLeaf_MinLengthInCM"]
+
+
+def test_queries_match_every_overlapping_interval():
+    leaf = buildIntervals(leafIndex())["Leaf_Length"]
+    assert leaf.query(10.0) == 0b101
+    assert leaf.query(30.0) == 0b111
+    assert leaf.query(80.0) == 0b110
+    assert leaf.query(200.0) == 0
+    assert leaf.query(5.0, 25.0) == 0b111
+    assert leaf.answers() == [0b101, 0b111, 0b110]
+    assert leaf.bucketsFor(80.0) == ["TenLeaf_MaxLengthInCM", "TwoLeaf_MinLengthInCM"]
+
+
+def test_species_without_data_are_never_ruled_out():
+    leaf = buildIntervals(leafIndex(200))["Leaf_Length"]
+    assert leaf.intervals[199] == (0.0, 100.0, 1 << 199)
+    assert leaf.intervals[100] == (0.0, INFINITY, 1 << 100)
+    assert leaf.query(1000.0) == sum(1 << i for i in range(2, 199))
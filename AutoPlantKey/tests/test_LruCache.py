@@ -0,0 +1,82 @@
+#Tests of the bounded LRU cache
+
+import AutoPlantKey
+from LruCache import MISSING, LruCache
+
+
+#Clock the test moves by hand
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LruCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert cache.evicted == 1
+
+
+def test_put_refreshes_an_entry():
+    cache = LruCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 10)
+    cache.put("c", 3)
+    assert cache.get("a") == 10
+    assert cache.get("b", "default") == "default"
+
+
+def test_entries_expire_after_their_ttl():
+    clock = FakeClock()
+    cache = LruCache(10, ttl=5.0, clock=clock)
+    cache.put("a", None)
+    clock.now = 5.0
+    assert cache.get("a", "default") is None
+    clock.now = 5.5
+    assert cache.get("a") is MISSING
+    assert len(cache) == 0
+    assert cache.expired == 1
+    cache.put("a", 1)
+    clock.now = 10.0
+    assert cache.get("a") == 1
+
+
+def test_size_zero_caches_nothing():
+    cache = LruCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is MISSING
+    assert len(cache) == 0
+
+
+def test_stats_count_hits_and_misses():
+    cache = LruCache(1)
+    assert cache.hitRate() == 0.0
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    cache.put("b", 2)
+    assert cache.stats() == {"size": 1, "maxSize": 1, "hits": 2, "misses": 1, "hitRate": 0.6667, "evicted": 1,
+                             "expired": 0}
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_repeated_descriptions_hit_the_description_cache():
+    text = "Flowers white, in a loose cluster. Leaves whorled."
+    first = AutoPlantKey.identify(text)
+    before = AutoPlantKey.cacheStats()["descriptions"]["hits"]
+    second = AutoPlantKey.identify("Flowers white,  in a loose cluster.\nLeaves whorled.")
+    assert AutoPlantKey.cacheStats()["descriptions"]["hits"] == before + 1
+    assert second.candidates == first.candidates
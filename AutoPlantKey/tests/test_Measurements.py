@@ -0,0 +1,63 @@
+#Regression tests for the measurement extraction engine and how identify() reads measurements
+
+import pytest
+
+import AutoPlantKey
+from Measurements import extractMeasurements
+
+
+def test_units_are_normalised_to_millimetres():
+    assert extractMeasurements("leaves 25mm long")[0].value == 25.0
+    assert extractMeasurements("leaves 2.5 cm long")[0].value == 25.0
+    assert extractMeasurements("a plant 3 in tall")[0].value == pytest.approx(76.2)
+    assert extractMeasurements("a plant 2 feet tall")[0].value == pytest.approx(609.6)
+
+
+def test_extractors_return_the_ontology_units():
+    assert AutoPlantKey.checkLeafLength(["leaves 25mm long"]) == [2.5]
+    assert AutoPlantKey.checkPetalLength(["petals 0.1 in long"]) == [pytest.approx(2.54)]
+    assert AutoPlantKey.checkPlantSize(["the plant is 2 ft tall"]) == [pytest.approx(60.96)]
+
+
+def test_ranges_and_number_words():
+    found = extractMeasurements("leaves 2-5 cm long")[0]
+    assert (found.low, found.high, found.value) == (20.0, 50.0, 35.0)
+    assert extractMeasurements("leaves two to four cm long")[0].value == 30.0
+
+
+def test_ranges_with_en_and_em_dashes():
+    for text in ("leaves 2\u20135 cm long", "leaves 2 \u2014 5 cm long", "leaves 2 - 5 cm long"):
+        found = extractMeasurements(text)[0]
+        assert (found.low, found.high) == (20.0, 50.0)
+    assert AutoPlantKey.identify("Leaves 2\u20135 cm long.").traits["leafLength"] == [3.5]
+
+
+def test_fractions_and_mixed_numbers():
+    assert extractMeasurements("leaves 1 1/2 inches long")[0].value == pytest.approx(38.1)
+    assert extractMeasurements("leaves 1/2 in long")[0].value == pytest.approx(12.7)
+    found = extractMeasurements("leaves 3/4 to 1 1/2 in long")[0]
+    assert (found.low, found.high) == (pytest.approx(19.05), pytest.approx(38.1))
+    assert AutoPlantKey.identify("Leaves 1 1/2 inches long.").traits["leafLength"] == [pytest.approx(3.81)]
+    assert AutoPlantKey.identify("Plant 1/2 m tall.").traits["plantSize"] == [50.0]
+
+
+def test_measurements_are_placed_by_the_nearest_organ():
+    found = extractMeasurements("leaves 3 cm long and the plant 40 cm tall")
+    assert [(m.attribute, m.value) for m in found] == [("leafLength", 30.0), ("plantSize", 400.0)]
+
+
+def test_every_measurement_after_an_organ_is_read():
+    assert AutoPlantKey.checkLeafLength(["leaves 25mm long 3 cm wide"]) == [2.5, 3.0]
+
+
+def test_sentence_with_two_organs_places_each_measurement():
+    result = AutoPlantKey.identify("Leaves 3 cm long, plant 40 cm tall.")
+    assert result.traits["leafLength"] == [3.0]
+    assert result.traits["plantSize"] == [40.0]
+
+
+def test_bare_measurement_answer_is_read_by_the_attribute_asked_about():
+    result = AutoPlantKey.identify("3 cm", None, "leafLength")
+    assert result.traits == {"leafLength": [3.0]}
+    result = AutoPlantKey.identify("4 mm", None, "petalLength")
+    assert result.traits == {"petalLength": [4.0]}
@@ -0,0 +1,119 @@
+#Tests of the runtime metrics and their Prometheus text exposition
+
+import re
+
+from Metrics import Histogram, Metrics, formatValue
+
+#One sample line of the text exposition format: name, optional labels, value
+SAMPLE = re.compile(r'^(autoplantkey_[a-z_]+)(\{(?:[a-z]+="[^"]*"(?:,|(?=\})))*\})? (\S+)$')
+
+
+#Minimal identify() result
+class Result:
+
+    def __init__(self, candidates, traits):
+        self.candidates = candidates
+        self.traits = traits
+
+
+#Clock the test moves by hand
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+#Samples of a text exposition as name{labels} -> value, checking that every metric has its HELP and TYPE first
+def parseExposition(text):
+    assert text.endswith("\n")
+    samples = {}
+    described = set()
+    for line in text.splitlines():
+        if line.startswith("# HELP ") or line.startswith("# TYPE "):
+            described.add((line[2:6], line.split()[2]))
+            continue
+        match = SAMPLE.match(line)
+        assert match is not None, line
+        #histogram samples are described under the name without their suffix
+        name = match.group(1)
+        if ("TYPE", name) not in described:
+            name = re.sub(r"_(bucket|sum|count)$", "", name)
+        assert ("HELP", name) in described and ("TYPE", name) in described, line
+        samples[match.group(1) + (match.group(2) or "")] = match.group(3)
+    return samples
+
+
+def test_histogram_buckets():
+    histogram = Histogram((1, 2, 5))
+    for value in (0.5, 1, 2, 3, 9):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.cumulative() == [(1, 2), (2, 3), (5, 4), (float("inf"), 5)]
+    assert histogram.count() == 5
+    assert histogram.sum == 15.5
+    assert histogram.quantile(0.5) == 2
+    assert histogram.quantile(0.99) == float("inf")
+    assert Histogram((1,)).quantile(0.5) == 0.0
+
+
+def test_sample_values():
+    assert formatValue(3) == "3"
+    assert formatValue(0.25) == "0.25"
+    assert formatValue(float("inf")) == "+Inf"
+
+
+def test_prometheus_text():
+    clock = FakeClock()
+    metrics = Metrics(["color", "leafShape"], clock)
+    metrics.recordIdentify(0.0003, Result(["A", "B"], {"color": ["white"]}))
+    metrics.recordIdentify(0.002, Result([], {"color": ["blue"], "leafShape": ["linear"]}))
+    metrics.recordIdentify(2.0, Result(["A"], {}))
+    metrics.recordResolution(3)
+    clock.now = 112.5
+    caches = {"descriptions": {"hits": 3, "misses": 1, "hitRate": 0.75}}
+    samples = parseExposition(metrics.prometheusText(caches, {"sessions": ("Live sessions.", 4)}))
+    assert samples['autoplantkey_identify_seconds_bucket{le="0.00025"}'] == "0"
+    assert samples['autoplantkey_identify_seconds_bucket{le="0.0005"}'] == "1"
+    assert samples['autoplantkey_identify_seconds_bucket{le="1.0"}'] == "2"
+    assert samples['autoplantkey_identify_seconds_bucket{le="+Inf"}'] == "3"
+    assert samples["autoplantkey_identify_seconds_count"] == "3"
+    assert float(samples["autoplantkey_identify_seconds_sum"]) == 2.0023
+    assert samples['autoplantkey_turns_to_resolution_bucket{le="3"}'] == "1"
+    assert samples["autoplantkey_identifications_total"] == "3"
+    assert samples["autoplantkey_empty_results_total"] == "1"
+    assert float(samples["autoplantkey_empty_result_ratio"]) == 1 / 3
+    assert samples['autoplantkey_attribute_hits_total{attribute="color"}'] == "2"
+    assert samples['autoplantkey_attribute_hits_total{attribute="leafShape"}'] == "1"
+    assert float(samples['autoplantkey_attribute_hit_ratio{attribute="leafShape"}']) == 1 / 3
+    assert samples['autoplantkey_cache_hits_total{cache="descriptions"}'] == "3"
+    assert samples['autoplantkey_cache_misses_total{cache="descriptions"}'] == "1"
+    assert samples['autoplantkey_cache_hit_ratio{cache="descriptions"}'] == "0.75"
+    assert samples["autoplantkey_sessions"] == "4"
+    assert samples["autoplantkey_uptime_seconds"] == "12.5"
+
+
+def test_bucket_counts_never_decrease():
+    metrics = Metrics([])
+    for seconds in (0.00001, 0.0004, 0.0004, 0.03, 0.3, 5.0):
+        metrics.recordIdentify(seconds, Result(["A"], {}))
+    samples = parseExposition(metrics.prometheusText())
+    buckets = [int(value) for name, value in samples.items() if name.startswith("autoplantkey_identify_seconds_bucket")]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == 6
+    assert not any(name.startswith("autoplantkey_cache_") for name in samples)
+
+
+def test_snapshot():
+    clock = FakeClock()
+    metrics = Metrics(["color"], clock)
+    metrics.recordIdentify(0.0003, Result([], {"color": ["white"]}))
+    snapshot = metrics.snapshot({"sentences": {"hits": 1, "misses": 1, "hitRate": 0.5, "size": 1}})
+    assert snapshot["identifications"] == 1
+    assert snapshot["emptyResultRate"] == 1.0
+    assert snapshot["attributeHitRates"] == {"color": 1.0}
+    assert snapshot["histograms"]["identifySeconds"]["p50"] == 0.0005
+    assert snapshot["histograms"]["identifySeconds"]["buckets"][-1] == ["+Inf", 1]
+    assert snapshot["caches"] == {"sentences": {"hits": 1, "misses": 1, "hitRate": 0.5}}
@@ -0,0 +1,67 @@
+#Tests of the query planner of identify(): skipping lookups must never change a result
+
+import random
+
+import AutoPlantKey
+from SyntheticDescriptions import generateDescriptions
+
+
+#Species bitset of one trait of a turn, looked up from scratch
+def traitMatch(name, values, matched):
+    if isinstance(AutoPlantKey.attributeClasses[name], str):
+        if isinstance(matched, frozenset):
+            return AutoPlantKey.matchAttribute(name, matched)
+        return matched
+    return AutoPlantKey.describedMatch(name, values)
+
+
+#Candidates after looking up every trait of the turn, with nothing skipped
+def fullEvaluation(result):
+    constraints = dict(result.session.constraints)
+    assert sorted(constraints) == sorted(result.traits)
+    candidates = AutoPlantKey.getIndex().allSpecies
+    for name, values in result.traits.items():
+        candidates &= traitMatch(name, values, constraints[name])
+    return AutoPlantKey.getIndex().names(candidates)
+
+
+#Synthetic descriptions, and pairs of them joined so that many describe traits no one species has
+def descriptions():
+    texts = [record["text"] for record in generateDescriptions(perSpecies=3, seed=7)]
+    rng = random.Random(7)
+    return texts + [rng.choice(texts) + " " + rng.choice(texts) for i in range(200)]
+
+
+def test_planner_matches_full_evaluation():
+    ruledOut = 0
+    for text in descriptions():
+        result = AutoPlantKey.identify(text)
+        assert result.candidates == fullEvaluation(result)
+        ruledOut += not result.candidates
+    assert ruledOut > 20
+
+
+def test_later_turns_match_full_evaluation():
+    texts = descriptions()
+    rng = random.Random(8)
+    for i in range(100):
+        result = AutoPlantKey.identify(rng.choice(texts))
+        result = AutoPlantKey.identify(rng.choice(texts), result.session)
+        constraints = dict(result.session.constraints)
+        candidates = AutoPlantKey.getIndex().allSpecies
+        for name, matched in constraints.items():
+            if isinstance(matched, frozenset):
+                matched = AutoPlantKey.matchAttribute(name, matched)
+            candidates &= matched
+        assert result.candidates == AutoPlantKey.getIndex().names(candidates)
+
+
+def test_planner_counts_skipped_lookups():
+    before = dict(AutoPlantKey.plannerCounters)
+    result = AutoPlantKey.identify("Yellow flowers. Leaves opposite. Leaves ovate.")
+    assert result.candidates == []
+    assert set(result.traits) == {"color", "leafArrangement", "leafShape"}
+    queries = AutoPlantKey.plannerCounters["queries"] - before["queries"]
+    skipped = AutoPlantKey.plannerCounters["queriesSkipped"] - before["queriesSkipped"]
+    assert queries + skipped == 3
+    assert skipped >= 1
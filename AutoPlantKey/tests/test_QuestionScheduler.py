@@ -0,0 +1,66 @@
+#Tests of the information-gain question scheduler
+
+import AutoPlantKey
+from QuestionScheduler import bestQuestion, expectedRemaining
+from TraitIndex import TraitIndex
+
+#Four species: "halves" splits them in two pairs, "each" tells all of them apart, "all" fits every species
+#and "first" only covers species 0 and 1
+ANSWERS = {"halves": [0b0011, 0b1100], "each": [0b0001, 0b0010, 0b0100, 0b1000], "all": [0b1111],
+           "first": [0b0011]}
+
+
+def fourSpecies():
+    return TraitIndex(["Species%d" % i for i in range(4)], {})
+
+
+def test_expected_remaining_candidates():
+    index = fourSpecies()
+    assert expectedRemaining(index, 0b1111, ANSWERS["halves"]) == 2
+    assert expectedRemaining(index, 0b1111, ANSWERS["each"]) == 1
+    assert expectedRemaining(index, 0b1111, ANSWERS["all"]) == 4
+    assert expectedRemaining(index, 0b0111, ANSWERS["halves"]) == (2 * 2 + 1 * 1) / 3
+    assert expectedRemaining(index, 0b0011, []) == 2
+
+
+def test_candidates_without_an_answer_keep_every_candidate():
+    index = fourSpecies()
+    assert expectedRemaining(index, 0b1111, ANSWERS["first"]) == (2 * 2 + 2 * 4) / 4
+    assert expectedRemaining(index, 0b1100, ANSWERS["first"]) == 2
+
+
+def test_species_with_several_answers_count_under_each():
+    index = fourSpecies()
+    assert expectedRemaining(index, 0b0011, [0b0011, 0b0001]) == (2 * 2 + 1 * 1) / 3
+
+
+def test_best_question_is_the_most_discriminating():
+    index = fourSpecies()
+    order = ["all", "halves", "first", "each"]
+    assert bestQuestion(index, 0b1111, order, ANSWERS) == "each"
+    assert bestQuestion(index, 0b1111, ["all", "first", "halves"], ANSWERS) == "halves"
+    assert bestQuestion(index, 0b0011, ["all", "halves", "first"], ANSWERS) is None
+    assert bestQuestion(index, 0b0001, order, ANSWERS) is None
+
+
+def test_ties_follow_the_order_of_questions():
+    index = fourSpecies()
+    answers = dict(ANSWERS, other=[0b0101, 0b1010])
+    assert bestQuestion(index, 0b1111, ["halves", "other"], answers) == "halves"
+    assert bestQuestion(index, 0b1111, ["other", "halves"], answers) == "other"
+
+
+def test_next_question_skips_attributes_already_used():
+    index = AutoPlantKey.getIndex()
+    first = AutoPlantKey.nextQuestionAttribute(0)
+    assert first is not None
+    scores = {attribute: expectedRemaining(index, index.allSpecies, AutoPlantKey.getAnswers()[attribute])
+              for attribute, question in AutoPlantKey.questions}
+    assert scores[first] == min(scores.values())
+    second = AutoPlantKey.nextQuestionAttribute(AutoPlantKey.attributeBits[first])
+    assert second not in (first, None)
+    everything = 0
+    for attribute, question in AutoPlantKey.questions:
+        everything |= AutoPlantKey.attributeBits[attribute]
+    assert AutoPlantKey.nextQuestionAttribute(everything) is None
+    assert AutoPlantKey.askQuestions(everything) is None
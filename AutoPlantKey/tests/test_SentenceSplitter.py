@@ -0,0 +1,31 @@
+#Tests of the rule-based sentence splitter
+
+import AutoPlantKey
+from SentenceSplitter import splitSentences
+
+
+def test_sentences_end_after_a_unit_whatever_follows():
+    assert splitSentences("Leaves 3 cm. flowers white.") == ["Leaves 3 cm.", "flowers white."]
+    assert splitSentences("Leaves 3 cm.Flowers white.") == ["Leaves 3 cm.", "Flowers white."]
+    assert splitSentences("Leaves 3cm. flowers white.") == ["Leaves 3cm.", "flowers white."]
+    assert splitSentences("Stems 2-5 ft.Flowers white.") == ["Stems 2-5 ft.", "Flowers white."]
+    assert splitSentences("Plants 2.5 m tall. flowers white.") == ["Plants 2.5 m tall.", "flowers white."]
+
+
+def test_abbreviations_initials_and_decimals_do_not_end_sentences():
+    assert splitSentences("Leaves ca. 3 cm long. Flowers white.") == ["Leaves ca. 3 cm long.", "Flowers white."]
+    assert splitSentences("Much like G. aparine, e.g. in woods.") == ["Much like G. aparine, e.g. in woods."]
+    assert splitSentences("Leaves 2.5 cm long.") == ["Leaves 2.5 cm long."]
+    assert splitSentences("Flowers white e.g.bright.") == ["Flowers white e.g.bright."]
+
+
+def test_unit_words_without_a_number_need_a_capital():
+    assert splitSentences("Tucked in. flowers white.") == ["Tucked in. flowers white."]
+    assert splitSentences("Tucked in. Flowers white.") == ["Tucked in.", "Flowers white."]
+    assert splitSentences("Flowers white etc. leaves opposite.") == ["Flowers white etc. leaves opposite."]
+
+
+def test_measurements_stay_with_their_organ():
+    for text in ("The plant is about 40 cm. leaves whorled.", "The plant is about 40 cm.Leaves whorled."):
+        result = AutoPlantKey.identify(text)
+        assert result.traits == {"plantSize": [40.0], "leafArrangement": ["whorled"]}
@@ -0,0 +1,113 @@
+#Tests of the HTTP identification service, run against a server on a free local port
+
+import asyncio
+import json
+import time
+
+import AutoPlantKey
+import Service
+
+
+#Run client(host, port) against a fresh server and return what it returns
+def withServer(client):
+    async def run():
+        ready = asyncio.get_running_loop().create_future()
+        server = asyncio.ensure_future(Service.serve("127.0.0.1", 0, 60, ready.set_result))
+        host, port = (await ready)[:2]
+        try:
+            return await client(host, port)
+        finally:
+            server.cancel()
+    return asyncio.run(run())
+
+
+#Send one raw HTTP request on its own connection and return the raw response
+async def send(host, port, request):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(request)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+def exchange(request):
+    return withServer(lambda host, port: send(host, port, request))
+
+
+def post(path, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    return b"POST %s HTTP/1.1\r\nConnection: close\r\nContent-Length: %d\r\n\r\n%s" % (path.encode("latin-1"),
+                                                                                       len(body), body)
+
+
+def responseJson(response):
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_new_session_without_text_asks_the_first_question():
+    status, payload = responseJson(exchange(post("/sessions")))
+    assert status == 201
+    assert payload["questionAttribute"] == AutoPlantKey.getKey().question(AutoPlantKey.getIndex().allSpecies)
+    assert payload["question"] == " ".join(AutoPlantKey.questionText[payload["questionAttribute"]].split())
+    assert len(payload["candidates"]) == len(AutoPlantKey.getIndex().species)
+
+
+def test_invalid_content_length_is_a_bad_request():
+    for length in (b"abc", b"-5"):
+        status, payload = responseJson(exchange(b"POST /sessions HTTP/1.1\r\nContent-Length: %s\r\n\r\n" % length))
+        assert status == 400
+        assert payload["error"] == "invalid Content-Length"
+
+
+def test_slow_identification_does_not_hold_up_other_connections(monkeypatch):
+    identify = AutoPlantKey.identify
+
+    def slowIdentify(text, session=None, answering=None):
+        time.sleep(0.5)
+        return identify(text, session, answering)
+
+    monkeypatch.setattr(AutoPlantKey, "identify", slowIdentify)
+
+    async def client(host, port):
+        finished = []
+
+        async def request(name, data):
+            response = await send(host, port, data)
+            finished.append(name)
+            return response
+
+        slow = asyncio.ensure_future(request("describe", post("/sessions", {"text": "White flowers."})))
+        await asyncio.sleep(0.1)
+        health = await request("health", b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n")
+        return health, await slow, finished
+
+    health, described, finished = withServer(client)
+    assert finished == ["health", "describe"]
+    assert responseJson(health)[0] == 200
+    assert responseJson(described)[1]["traits"] == {"color": ["white"]}
+
+
+def test_metrics_are_served_in_the_prometheus_text_format():
+    async def client(host, port):
+        await send(host, port, post("/sessions", {"text": "White flowers."}))
+        text = await send(host, port, b"GET /metrics HTTP/1.1\r\nConnection: close\r\n\r\n")
+        snapshot = await send(host, port, b"GET /metrics.json HTTP/1.1\r\nConnection: close\r\n\r\n")
+        return text, snapshot
+
+    before = AutoPlantKey.metrics.identifications
+    text, snapshot = withServer(client)
+    head, _, body = text.partition(b"\r\n\r\n")
+    assert head.split()[1] == b"200"
+    assert b"Content-Type: " + Service.METRICS_CONTENT_TYPE.encode("ascii") in head
+    samples = dict(line.rsplit(" ", 1) for line in body.decode("utf-8").splitlines() if not line.startswith("#"))
+    assert int(samples["autoplantkey_identifications_total"]) >= before + 1
+    assert samples["autoplantkey_sessions"] == "1"
+    assert samples["autoplantkey_identify_seconds_count"] == samples["autoplantkey_identifications_total"]
+    assert 'autoplantkey_cache_hits_total{cache="descriptions"}' in samples
+    assert "# TYPE autoplantkey_identify_seconds histogram" in body.decode("utf-8")
+    status, payload = responseJson(snapshot)
+    assert status == 200
+    assert payload["sessions"] == 1
+    assert payload["identifications"] == int(samples["autoplantkey_identifications_total"])
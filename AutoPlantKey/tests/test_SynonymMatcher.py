@@ -0,0 +1,45 @@
+#Regression tests for the synonym matcher and the normalisation in front of it
+
+import AutoPlantKey
+from SynonymMatcher import SynonymMatcher
+
+
+def values(text, attribute):
+    return AutoPlantKey.synonymValues([AutoPlantKey.normalizeSentence(text)], attribute)
+
+
+def test_scan_returns_attribute_value_and_offsets():
+    matcher = SynonymMatcher({"color": {"white": ["white"]}, "cluster": {"few": ["cyme"]}})
+    hits = matcher.scan("white flowers in a cyme")
+    assert [(hit.attribute, hit.value, hit.start, hit.end) for hit in hits] == [("color", "white", 0, 5),
+                                                                                 ("cluster", "few", 19, 23)]
+
+
+def test_synonyms_do_not_match_inside_words():
+    assert values("Leaves distant along the stem", "color") == []
+    assert values("Asymmetrical leaves", "leafArrangement") == []
+
+
+def test_synonyms_match_with_suffixes():
+    assert values("Flowers in cymes", "cluster") == ["few"]
+    assert values("Greenish flowers", "color") == ["green"]
+    assert values("Whitish flowers", "color") == ["white"]
+    assert values("Bluish flowers", "color") == ["blue"]
+    assert values("Bell-shaped flowers", "flowerShape") == ["bell"]
+
+
+def test_hyphens_and_slashes_separate_words():
+    assert values("White-pink flowers", "color") == ["white", "pink"]
+    assert values("White/yellow flowers", "color") == ["white", "yellow"]
+    assert values("Greenish-white flowers", "color") == ["green", "white"]
+    assert values("Ovate-lanceolate leaves", "leafShape") == ["widerMiddle", "linear"]
+    assert values("Oblong/linear leaves", "leafShape") == ["linear", "linear"]
+
+
+def test_normalisation_keeps_decimals_and_ranges():
+    assert AutoPlantKey.normalizeSentence("Leaves 2.5-3 cm, ovate.") == "leaves 2.5-3 cm ovate"
+
+
+def test_fragments_match_inside_words():
+    matcher = SynonymMatcher({}, fragments={"organ": {"flower": ["flor"]}})
+    assert [hit.value for hit in matcher.scan("inflorescence")] == ["flower"]
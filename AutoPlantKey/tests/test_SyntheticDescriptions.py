@@ -0,0 +1,51 @@
+#Tests of the synthetic description corpus
+
+import json
+
+import AutoPlantKey
+from Measurements import parse_int
+from SyntheticDescriptions import generateDescriptions, main, numberWords, renderNumber, speciesTraits
+
+
+def test_corpus_is_the_same_for_a_seed():
+    first = list(generateDescriptions(perSpecies=2, seed=3))
+    assert first == list(generateDescriptions(perSpecies=2, seed=3))
+    assert first != list(generateDescriptions(perSpecies=2, seed=4))
+    species = AutoPlantKey.getIndex().species
+    assert [record["species"] for record in first] == species * 2
+    assert [record["id"] for record in first] == list(range(1, 2 * len(species) + 1))
+
+
+def test_number_words_read_back():
+    assert numberWords(7) == "seven"
+    assert numberWords(40) == "forty"
+    assert numberWords(125) == "one hundred and twenty five"
+    for n in (1, 13, 20, 99, 100, 110, 999):
+        assert parse_int(numberWords(n)) == n
+
+
+def test_measurements_read_back_inside_the_interval():
+    assert renderNumber(25.0, "cm", 10.0, 50.0, False) == "2.5"
+    assert renderNumber(30.0, "cm", 10.0, 50.0, True) == "three"
+    assert renderNumber(2.0, "cm", 1.0, 50.0, True) is None
+    assert renderNumber(49.9, "cm", 10.0, 50.0, False) is None
+
+
+def test_full_coverage_describes_every_known_trait():
+    index = AutoPlantKey.getIndex()
+    for record in generateDescriptions(coverage=1.0, noise=0.0, mixed=0.0):
+        traits = speciesTraits(index, index.speciesIds[record["species"]])
+        assert set(record["attributes"]) == set(traits)
+        assert record["text"] == record["text"].strip()
+
+
+def test_described_species_is_among_the_candidates():
+    for record in generateDescriptions(perSpecies=3, seed=1):
+        assert record["species"] in AutoPlantKey.identify(record["text"]).candidates
+
+
+def test_main_writes_jsonl(tmp_path):
+    path = tmp_path / "corpus.jsonl"
+    assert main(["--per-species", "1", "--seed", "3", "--output", str(path)]) == 0
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert records == list(generateDescriptions(perSpecies=1, seed=3))
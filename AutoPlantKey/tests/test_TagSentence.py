@@ -0,0 +1,58 @@
+#Tests of organ and synonym tagging: each synonym is read from the organ mention it describes
+
+import AutoPlantKey
+
+
+#tagSentence() of the first sentence of a text, with hits as (attribute, value, group)
+def tag(text):
+    sent = AutoPlantKey.normalizeSentences(text)[0]
+    groups, hits, organs = AutoPlantKey.tagSentence(sent)
+    return groups, [(hit.attribute, hit.value, group) for hit, group in hits], organs
+
+
+def test_hits_are_read_from_the_organ_they_describe():
+    assert tag("White flowers and opposite leaves.")[1] == [("color", "white", "flower"),
+                                                           ("leafArrangement", "opposite", "leaf")]
+    assert tag("Leaves opposite, flowers white.")[1] == [("leafArrangement", "opposite", "leaf"),
+                                                        ("color", "white", "flower")]
+    assert tag("The flowers are white, and the leaves are linear.")[1] == [("color", "white", "flower"),
+                                                                          ("leafShape", "linear", "leaf")]
+
+
+def test_organs_an_attribute_is_not_read_from_are_passed_over():
+    assert tag("Leaves whorled with white flowers.")[1] == [("leafArrangement", "whorled", "leaf"),
+                                                           ("color", "white", "flower")]
+    assert tag("Petals white, leaves hairy.")[1] == [("color", "white", "petal"), ("leafMargin", "hairy", "leaf")]
+
+
+def test_groups_in_order_of_first_mention():
+    groups, hits, organs = tag("Flowers bell shaped, leaves linear, petals 4.")
+    assert groups == ("flower", "leaf", "petal")
+    assert [organ[2] for organ in organs] == [None, "leafLength", "petalLength"]
+    assert hits == [("flowerShape", "bell", "flower"), ("leafShape", "linear", "leaf")]
+
+
+def test_sentence_without_organs_is_about_the_plant():
+    assert tag("White.") == (("plant",), [("color", "white", "plant")], None)
+
+
+def test_plant_words_only_place_measurements():
+    groups, hits, organs = tag("Plant 30 cm tall with leaves 3 cm long.")
+    assert groups == ("leaf", "plant")
+    assert [organ[2] for organ in organs] == ["plantSize", "plantSize", "leafLength"]
+    assert [organ[0] for organ in organs] == sorted(organ[0] for organ in organs)
+    traits = AutoPlantKey.identify("Leaves 3 cm long, petals 2 mm long, plant 30 cm tall.").traits
+    assert traits == {"leafLength": [3.0], "petalLength": [2.0], "plantSize": [30.0]}
+
+
+def test_overlapping_hits_go_to_the_closer_context():
+    groups, hits, organs = tag("Flowers at the bottom of the stem.")
+    assert ("position", "axillary", "flower") in hits
+    assert ("leafArrangement", "basal", "plant") in hits
+
+
+def test_identify_reads_multi_organ_sentences():
+    assert AutoPlantKey.identify("White flowers and opposite leaves.").traits == {"color": ["white"],
+                                                                                 "leafArrangement": ["opposite"]}
+    assert AutoPlantKey.identify("Leaves opposite, flowers white.").candidates == \
+        AutoPlantKey.identify("Leaves opposite. Flowers white.").candidates
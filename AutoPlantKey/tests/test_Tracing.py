@@ -0,0 +1,94 @@
+#Tests of the opt-in tracing of the identification pipeline
+
+import AutoPlantKey
+from Tracing import Tracer
+
+TEXT = "White flowers in a loose cluster. Leaves whorled, 3 cm long."
+
+
+#Clock that moves on by step seconds every time it is read
+class SteppingClock:
+
+    def __init__(self, step):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+def test_spans_and_counters_add_up():
+    ended = []
+    tracer = Tracer(lambda name, seconds: ended.append(name), SteppingClock(0.001))
+    started = tracer.start()
+    started = tracer.end("split", started)
+    tracer.end("query", started)
+    tracer.end("query", tracer.start())
+    tracer.count("queries")
+    tracer.count("queries", 2)
+    stats = tracer.stats()
+    assert ended == ["split", "query", "query"]
+    assert stats["spans"]["split"] == {"count": 1, "totalMs": 1.0, "meanUs": 1000.0, "maxUs": 1000.0}
+    assert stats["spans"]["query"]["count"] == 2
+    assert stats["spans"]["query"]["totalMs"] == 2.0
+    assert stats["counters"] == {"queries": 3}
+    lines = tracer.report().splitlines()
+    assert lines[0].split() == ["span", "count", "total", "ms", "mean", "us", "max", "us"]
+    assert [line.split()[0] for line in lines[1:]] == ["query", "split", "queries"]
+    tracer.reset()
+    assert tracer.stats() == {"spans": {}, "counters": {}}
+
+
+def test_tracing_times_every_stage_of_identify():
+    AutoPlantKey.identify(TEXT)
+    ended = []
+    with AutoPlantKey.tracing(lambda name, seconds: ended.append(name)) as tracer:
+        result = AutoPlantKey.identify(TEXT)
+    spans = tracer.stats()["spans"]
+    for name in ("route", "plan", "narrow", "question", "identify", "query:color", "query:cluster",
+                 "query:leafArrangement", "extract:leafLength", "query:leafLength"):
+        assert spans[name]["count"] == 1
+    assert ended[-1] == "identify"
+    assert sorted(ended) == sorted(spans)
+    counters = tracer.counters
+    #the class lookups were memoised by the first call, the leaf length is looked up again
+    assert counters["queries"] == 1
+    assert counters["candidatesEliminated"] == len(AutoPlantKey.getIndex().species) - len(result.candidates)
+    assert counters["candidatesEliminated"] == sum(value for name, value in counters.items()
+                                                   if name.startswith("eliminated:"))
+
+
+def test_tracing_splits_new_descriptions_and_ranks_when_nothing_is_left():
+    with AutoPlantKey.tracing() as tracer:
+        result = AutoPlantKey.identify("Yellow flowers, seen on the 17th of a cold month. Leaves opposite. Leaves ovate.")
+    assert result.candidates == []
+    assert {"tokenize", "normalize", "rank"} <= set(tracer.spans)
+    assert "question" not in tracer.spans
+
+
+#Profiler stand-in that records when it runs
+class RecordingProfiler:
+
+    def __init__(self):
+        self.calls = []
+
+    def enable(self):
+        self.calls.append("enable")
+
+    def disable(self):
+        self.calls.append("disable")
+
+
+def test_tracing_is_scoped_to_the_block():
+    profiler = RecordingProfiler()
+    assert AutoPlantKey.tracer is None
+    with AutoPlantKey.tracing(profiler=profiler) as outer:
+        with AutoPlantKey.tracing() as inner:
+            assert AutoPlantKey.tracer is inner
+        assert AutoPlantKey.tracer is outer
+        assert profiler.calls == ["enable"]
+    assert AutoPlantKey.tracer is None
+    assert profiler.calls == ["enable", "disable"]
+    AutoPlantKey.identify(TEXT)
+    assert outer.spans == {}
@@ -0,0 +1,43 @@
+#Tests of ranked partial matching: the numpy matrix and the bitset fallback must rank alike
+
+import random
+
+import AutoPlantKey
+from TraitIndex import TraitIndex
+from TraitMatrix import TraitMatrix, rankBitsets
+
+
+#Random trait weights, binary fractions so float32 and float64 sums are exact and ties stay ties
+def randomWeights(rng, traits, count):
+    return {trait: rng.choice((0.25, 0.5, 1.0)) for trait in rng.sample(traits, count)}
+
+
+def assertSameRanking(index, weights, k):
+    ranked = TraitMatrix(index).top(weights, k)
+    assert ranked == rankBitsets(index, weights, k)
+
+
+def test_matrix_and_bitsets_rank_the_ontology_alike():
+    index = AutoPlantKey.getIndex()
+    rng = random.Random(0)
+    traits = sorted(index.traitBits)
+    for i in range(50):
+        assertSameRanking(index, randomWeights(rng, traits, rng.randint(1, 8)), rng.choice((1, 5, 20)))
+
+
+def test_matrix_and_bitsets_rank_a_large_flora_alike():
+    rng = random.Random(1)
+    count = 300
+    traitBits = {"Trait%d" % t: rng.getrandbits(count) for t in range(40)}
+    index = TraitIndex(["Species%d" % i for i in range(count)], traitBits)
+    for i in range(20):
+        assertSameRanking(index, randomWeights(rng, sorted(traitBits), rng.randint(1, 10)), 10)
+    assert rankBitsets(index, {"Unknown": 1.0}, 3) == [("Species0", 0.0), ("Species1", 0.0), ("Species2", 0.0)]
+
+
+def test_rank_species_without_numpy(monkeypatch):
+    traits = {"color": ["white"], "leafArrangement": ["whorled"], "leafLength": [3.0], "petalNumber": [5]}
+    ranked = AutoPlantKey.rankSpecies(traits)
+    monkeypatch.setattr(AutoPlantKey, "getMatrix", lambda: None)
+    assert AutoPlantKey.rankSpecies(traits) == ranked
+    assert ranked[0][1] <= 1.0